@@ -119,7 +119,13 @@ try:
 
     # 関数を実行
     replace_columns_and_write(input_file, output_file, new_data)
-    
+
+    # 最小二乗の B-スプラインで近似したもの (位置と姿勢の 7 列) も書き出す場合は内部ノットの数を指定する
+    bspline_knots = None  # 例: 40
+    if bspline_knots is not None:
+        from trajcore.smoothing import smooth_csv_bspline
+        smooth_csv_bspline(input_file, f"File/Exp1_Model/bspline{bspline_knots}.csv", n_knots=bspline_knots)
+
     
     plt.tight_layout()
     plt.show()
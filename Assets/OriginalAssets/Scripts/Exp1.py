@@ -6,6 +6,9 @@ import seaborn as sns
 import random
 import matplotlib.pyplot as plt
 
+from trajcore.loader import LOAD_COLUMNS, iter_trials
+from trajcore.plotting import plot_alignment, plot_costmatrix
+
 # Auxiliary functions
 def get_mirror(s, ws):
     
@@ -89,175 +92,6 @@ def align_sequences(ref, s, path):
     return ns
 
 
-# Visualization
-def plot_alignment(ref_signal, estimated_signal, path, **kwargs):
-    """
-    This functions plots the resulted alignment of two sequences given the path
-    calculated by the Dynamic Time Warping algorithm.
-
-    :param ref_signal: (array-like)
-                     The reference sequence.
-    :param estimated_signal: (array-like)
-                     The estimated sequence.
-    :param path: (array-like)
-                     A 2D array congaing the path resulted from the algorithm
-    :param \**kwargs:
-        See below:
-
-        * *offset* (``double``) --
-            The offset used to move the reference signal to an upper position for
-            visualization purposes.
-            (default: ``2``)
-
-        * *linewidths* (``list``) --
-            A list containing the linewidth for the reference, estimated and connection
-            plots, respectively.
-            (default: ``[3, 3, 0.5]``)
-
-        * *step* (``int``) --
-            The step for
-          (default: ``2``)
-
-        * *colors* (``list``) --
-          A list containing the colors for the reference, estimated and connection
-          plots, respectively.
-          (default: ``[sns.color_palette()[0], sns.color_palette()[1], 'k', 'k', 'k', 'k']``)
-    """
-
-    step = kwargs.get('step', 2)
-    offset = kwargs.get('offset', 2)
-    linewidths = kwargs.get('linewidths', [3, 3, 0.5])
-    colors = kwargs.get('colors', [sns.color_palette()[0], sns.color_palette()[1], 'k', 'k', 'k', 'k'])
-
-    # 上下に分割して実際の値を表示するために、Y軸の範囲を設定
-    ref_min = min(np.nanmin(ref_signal), np.nanmin(estimated_signal))
-    ref_max = max(np.nanmax(ref_signal), np.nanmax(estimated_signal))
-    est_min, est_max = ref_min, ref_max
-    # ref_min, ref_max = -1, 1
-    # est_min, est_max = -1, 1
-    
-    # Y軸の範囲を計算（余白を含む）- ゼロ除算を防ぐ
-    range_ref = ref_max - ref_min
-    #range_ref = 2
-    range_est = est_max - est_min
-    #range_est = 2
-    
-    # 範囲がゼロまたは無効な場合のデフォルト値
-    if np.isnan(range_ref) or range_ref <= 1e-10:
-        range_ref = 1.0
-    if np.isnan(range_est) or range_est <= 1e-10:
-        range_est = 1.0
-    
-    # 中心線の位置を0とする
-    center_line = 0
-    
-    # 参照信号を上半分に配置 - 値が大きいほど上に表示
-    ref_signal_shifted = center_line + (ref_signal - ref_min) / range_ref * range_ref + range_ref * 0.1
-    
-    # 推定信号を下半分に配置 - 値が大きいほど下から上に表示（反転しない）
-    est_signal_shifted = center_line - range_est * 1.1 + (estimated_signal - est_min) / range_est * range_est
-
-    # 実際のプロット
-    pl.axhline(y=center_line, color='gray', linestyle='--', alpha=0.5)  # 中心線を表示
-    
-    # 実際の値を表示
-    pl.plot(ref_signal_shifted, color=sns.color_palette()[1], lw=linewidths[0], label='model')
-    pl.plot(est_signal_shifted, color=sns.color_palette()[0], lw=linewidths[1], label='user')
-    pl.legend(fontsize=5)
-    
-    # Y軸ラベルを両側に表示
-    ax = pl.gca()
-    ax2 = ax.twinx()
-    
-    # 元のY軸範囲に戻すための変換関数
-    def ref_to_orig(y):
-        return (y - center_line - range_ref * 0.1) * range_ref / range_ref + ref_min
-    
-    def est_to_orig(y):
-        return ((y - center_line + range_est * 1.1) * range_est / range_est) + est_min
-    
-    # Y軸の設定 - NaNやInfを防ぐ
-    y_min = center_line - range_est * 1.5
-    y_max = center_line + range_ref * 1.5
-    
-    # NaNやInfをチェック
-    if np.isnan(y_min) or np.isinf(y_min):
-        y_min = -1.0
-    if np.isnan(y_max) or np.isinf(y_max):
-        y_max = 1.0
-        
-    ax.set_ylim(y_min, y_max)
-    ax2.set_ylim(y_min, y_max)
-    
-    try:
-        # 元の範囲に対応するY軸目盛りを設定
-        ref_ticks = np.linspace(ref_min, ref_max, 5)
-        est_ticks = np.linspace(est_min, est_max, 5)
-        
-        # 目盛り位置の計算 - userも値が大きいほど上になるよう修正
-        ref_tick_pos = [center_line + (t - ref_min) / range_ref * range_ref + range_ref * 0.1 for t in ref_ticks]
-        est_tick_pos = [center_line - range_est * 1.1 + (t - est_min) / range_est * range_est for t in est_ticks]
-        
-        # 目盛りにNaNが含まれていないか確認
-        if not np.any(np.isnan(ref_tick_pos)) and not np.any(np.isnan(est_tick_pos)):
-            # 左側のY軸はuserの値
-            ax.set_yticks(est_tick_pos)
-            ax.set_yticklabels([f"{t:.2f}" for t in est_ticks])
-            ax.set_ylabel('User', color=sns.color_palette()[0])
-            ax.tick_params(axis='y', colors=sns.color_palette()[0])
-            
-            # 右側のY軸はmodelの値
-            ax2.set_yticks(ref_tick_pos)
-            ax2.set_yticklabels([f"{t:.2f}" for t in ref_ticks])
-            ax2.set_ylabel('Model', color=sns.color_palette()[1])
-            ax2.tick_params(axis='y', colors=sns.color_palette()[1])
-    except Exception as e:
-        print(f"Y軸目盛りの設定でエラーが発生しました: {e}")
-        # デフォルトの目盛りを使用
-    
-    # DTWパスの描画
-    try:
-        for i in range(len(path[0]))[step * 0::step * 4]:
-            if path[0][i] < len(ref_signal_shifted) and path[1][i] < len(est_signal_shifted):
-                pl.plot([path[0][i], path[1][i]], 
-                        [ref_signal_shifted[path[0][i]], est_signal_shifted[path[1][i]]], 
-                        color=colors[2], lw=linewidths[2])
-        for i in range(len(path[0]))[step * 1::step * 4]:
-            if path[0][i] < len(ref_signal_shifted) and path[1][i] < len(est_signal_shifted):
-                pl.plot([path[0][i], path[1][i]], 
-                        [ref_signal_shifted[path[0][i]], est_signal_shifted[path[1][i]]], 
-                        color=colors[3], lw=linewidths[2])
-        for i in range(len(path[0]))[step * 2::step * 4]:
-            if path[0][i] < len(ref_signal_shifted) and path[1][i] < len(est_signal_shifted):
-                pl.plot([path[0][i], path[1][i]], 
-                        [ref_signal_shifted[path[0][i]], est_signal_shifted[path[1][i]]], 
-                        color=colors[4], lw=linewidths[2])
-        for i in range(len(path[0]))[step * 3::step * 4]:
-            if path[0][i] < len(ref_signal_shifted) and path[1][i] < len(est_signal_shifted):
-                pl.plot([path[0][i], path[1][i]], 
-                        [ref_signal_shifted[path[0][i]], est_signal_shifted[path[1][i]]], 
-                        color=colors[5], lw=linewidths[2])
-    except Exception as e:
-        print(f"DTWパスの描画でエラーが発生しました: {e}")
-
-    
-def plot_costmatrix(matrix, path):
-    """
-    This functions overlays the optimal warping path and the cost matrices
-    :param matrix: (ndarray-like)
-                The cost matrix (local cost or accumulated)
-    :param path:   (ndarray-like)
-                The optimal warping path
-    :return: (void)
-                Plots the optimal warping path with an overlay of the cost matrix.
-    """
-    pl.imshow(matrix.T, cmap='viridis', origin='lower', interpolation='None')
-    pl.colorbar()
-    #pl.plot(path[0], path[1], 'w.-')
-    pl.xlim((-0.5, matrix.shape[0] - 0.5))
-    pl.ylim((-0.5, matrix.shape[1] - 0.5))
-    
-    
 def dtw_sw(Ax, Ay, Az, Bx, By, Bz, winlen, alpha=0.5, **kwargs):
     """
     Computes Dynamic Time Warping (DTW) of two time series.
@@ -679,14 +513,8 @@ def calculate_vector_dot_product(df_model, df_test, mode='dtw_path', dtw_path=No
 
 # CSVファイルを読み込む
 df_model = pd.read_csv('Assets/OriginalAssets/File/Exp7_Model/6_pos_linear_rot_slerp.csv')
-df_test_file = pd.read_csv('Assets/OriginalAssets/File/Exp7_6/_Te3.csv')
-df_t = pd.read_csv('Assets/OriginalAssets/File/Exp7_6/_Te3.csv', dtype=str)
-
-# "Time"列に0.01111111がある行のインデックスを取得
-indices = df_t[df_t["time"] == "0.01111111"].index
-
-# インデックスを表示
-print(indices.tolist())
+# テストファイルは trial ごとに読み込む (time が巻き戻った行が trial の区切り)
+test_trials = iter_trials('Assets/OriginalAssets/File/Exp7_6/_Te3.csv')
 
 # plt.figure(figsize=(12, 15))
 # for i in range(0, 1):
@@ -717,11 +545,8 @@ print(indices.tolist())
 # plt.show()
 
 plt.figure(figsize=(12, 15))
-for i in range(0, 1):
-    if i < 0:
-        df_test = df_test_file.loc[indices[i]:indices[i+1]-1]
-    else:
-        df_test = df_test_file.loc[indices[i]:]
+for i, trial in zip(range(0, 1), test_trials):
+    df_test = pd.DataFrame(trial, columns=LOAD_COLUMNS)
     
     #1. 与えられたDTWパスを使用する場合
     # dtw_path = dtwsw_result[3]  # dtw_swの結果からパスを取得
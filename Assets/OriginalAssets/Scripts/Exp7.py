@@ -1,11 +1,7 @@
 import numpy as np
 import pandas as pd
-import pylab as pl
-import scipy.interpolate as it
-import seaborn as sns
-import random
-import matplotlib.pyplot as plt
-import os
+
+from trajcore.sink import ResultSink
 
 # Auxiliary functions
 def get_mirror(s, ws):
@@ -84,181 +80,13 @@ def align_sequences(ref, s, path):
             A rank 2 array containing the optimal warping path between the two signals.
     :return:
     """
+    import scipy.interpolate as it
     nt = np.linspace(0, len(ref) - 1, len(ref))
     ns = it.interp1d(path[0], s[path[1]])(nt)
 
     return ns
 
 
-# Visualization
-def plot_alignment(ref_signal, estimated_signal, path, **kwargs):
-    """
-    This functions plots the resulted alignment of two sequences given the path
-    calculated by the Dynamic Time Warping algorithm.
-
-    :param ref_signal: (array-like)
-                     The reference sequence.
-    :param estimated_signal: (array-like)
-                     The estimated sequence.
-    :param path: (array-like)
-                     A 2D array congaing the path resulted from the algorithm
-    :param \**kwargs:
-        See below:
-
-        * *offset* (``double``) --
-            The offset used to move the reference signal to an upper position for
-            visualization purposes.
-            (default: ``2``)
-
-        * *linewidths* (``list``) --
-            A list containing the linewidth for the reference, estimated and connection
-            plots, respectively.
-            (default: ``[3, 3, 0.5]``)
-
-        * *step* (``int``) --
-            The step for
-          (default: ``2``)
-
-        * *colors* (``list``) --
-          A list containing the colors for the reference, estimated and connection
-          plots, respectively.
-          (default: ``[sns.color_palette()[0], sns.color_palette()[1], 'k', 'k', 'k', 'k']``)
-    """
-
-    step = kwargs.get('step', 2)
-    offset = kwargs.get('offset', 2)
-    linewidths = kwargs.get('linewidths', [3, 3, 0.5])
-    colors = kwargs.get('colors', [sns.color_palette()[0], sns.color_palette()[1], 'k', 'k', 'k', 'k'])
-
-    # 上下に分割して実際の値を表示するために、Y軸の範囲を設定
-    ref_min = min(np.nanmin(ref_signal), np.nanmin(estimated_signal))
-    ref_max = max(np.nanmax(ref_signal), np.nanmax(estimated_signal))
-    est_min, est_max = ref_min, ref_max
-    # ref_min, ref_max = -1, 1
-    # est_min, est_max = -1, 1
-    
-    # Y軸の範囲を計算（余白を含む）- ゼロ除算を防ぐ
-    range_ref = ref_max - ref_min
-    #range_ref = 2
-    range_est = est_max - est_min
-    #range_est = 2
-    
-    # 範囲がゼロまたは無効な場合のデフォルト値
-    if np.isnan(range_ref) or range_ref <= 1e-10:
-        range_ref = 1.0
-    if np.isnan(range_est) or range_est <= 1e-10:
-        range_est = 1.0
-    
-    # 中心線の位置を0とする
-    center_line = 0
-    
-    # 参照信号を上半分に配置 - 値が大きいほど上に表示
-    ref_signal_shifted = center_line + (ref_signal - ref_min) / range_ref * range_ref + range_ref * 0.1
-    
-    # 推定信号を下半分に配置 - 値が大きいほど下から上に表示（反転しない）
-    est_signal_shifted = center_line - range_est * 1.1 + (estimated_signal - est_min) / range_est * range_est
-
-    # 実際のプロット
-    pl.axhline(y=center_line, color='gray', linestyle='--', alpha=0.5)  # 中心線を表示
-    
-    # 実際の値を表示
-    pl.plot(ref_signal_shifted, color=sns.color_palette()[1], lw=linewidths[0], label='model')
-    pl.plot(est_signal_shifted, color=sns.color_palette()[0], lw=linewidths[1], label='user')
-    pl.legend(fontsize=5)
-    
-    # Y軸ラベルを両側に表示
-    ax = pl.gca()
-    ax2 = ax.twinx()
-    
-    # 元のY軸範囲に戻すための変換関数
-    def ref_to_orig(y):
-        return (y - center_line - range_ref * 0.1) * range_ref / range_ref + ref_min
-    
-    def est_to_orig(y):
-        return ((y - center_line + range_est * 1.1) * range_est / range_est) + est_min
-    
-    # Y軸の設定 - NaNやInfを防ぐ
-    y_min = center_line - range_est * 1.5
-    y_max = center_line + range_ref * 1.5
-    
-    # NaNやInfをチェック
-    if np.isnan(y_min) or np.isinf(y_min):
-        y_min = -1.0
-    if np.isnan(y_max) or np.isinf(y_max):
-        y_max = 1.0
-        
-    ax.set_ylim(y_min, y_max)
-    ax2.set_ylim(y_min, y_max)
-    
-    try:
-        # 元の範囲に対応するY軸目盛りを設定
-        ref_ticks = np.linspace(ref_min, ref_max, 5)
-        est_ticks = np.linspace(est_min, est_max, 5)
-        
-        # 目盛り位置の計算 - userも値が大きいほど上になるよう修正
-        ref_tick_pos = [center_line + (t - ref_min) / range_ref * range_ref + range_ref * 0.1 for t in ref_ticks]
-        est_tick_pos = [center_line - range_est * 1.1 + (t - est_min) / range_est * range_est for t in est_ticks]
-        
-        # 目盛りにNaNが含まれていないか確認
-        if not np.any(np.isnan(ref_tick_pos)) and not np.any(np.isnan(est_tick_pos)):
-            # 左側のY軸はuserの値
-            ax.set_yticks(est_tick_pos)
-            ax.set_yticklabels([f"{t:.2f}" for t in est_ticks])
-            ax.set_ylabel('User', color=sns.color_palette()[0])
-            ax.tick_params(axis='y', colors=sns.color_palette()[0])
-            
-            # 右側のY軸はmodelの値
-            ax2.set_yticks(ref_tick_pos)
-            ax2.set_yticklabels([f"{t:.2f}" for t in ref_ticks])
-            ax2.set_ylabel('Model', color=sns.color_palette()[1])
-            ax2.tick_params(axis='y', colors=sns.color_palette()[1])
-    except Exception as e:
-        print(f"Y軸目盛りの設定でエラーが発生しました: {e}")
-        # デフォルトの目盛りを使用
-    
-    # DTWパスの描画
-    try:
-        for i in range(len(path[0]))[step * 0::step * 4]:
-            if path[0][i] < len(ref_signal_shifted) and path[1][i] < len(est_signal_shifted):
-                pl.plot([path[0][i], path[1][i]], 
-                        [ref_signal_shifted[path[0][i]], est_signal_shifted[path[1][i]]], 
-                        color=colors[2], lw=linewidths[2])
-        for i in range(len(path[0]))[step * 1::step * 4]:
-            if path[0][i] < len(ref_signal_shifted) and path[1][i] < len(est_signal_shifted):
-                pl.plot([path[0][i], path[1][i]], 
-                        [ref_signal_shifted[path[0][i]], est_signal_shifted[path[1][i]]], 
-                        color=colors[3], lw=linewidths[2])
-        for i in range(len(path[0]))[step * 2::step * 4]:
-            if path[0][i] < len(ref_signal_shifted) and path[1][i] < len(est_signal_shifted):
-                pl.plot([path[0][i], path[1][i]], 
-                        [ref_signal_shifted[path[0][i]], est_signal_shifted[path[1][i]]], 
-                        color=colors[4], lw=linewidths[2])
-        for i in range(len(path[0]))[step * 3::step * 4]:
-            if path[0][i] < len(ref_signal_shifted) and path[1][i] < len(est_signal_shifted):
-                pl.plot([path[0][i], path[1][i]], 
-                        [ref_signal_shifted[path[0][i]], est_signal_shifted[path[1][i]]], 
-                        color=colors[5], lw=linewidths[2])
-    except Exception as e:
-        print(f"DTWパスの描画でエラーが発生しました: {e}")
-
-    
-def plot_costmatrix(matrix, path):
-    """
-    This functions overlays the optimal warping path and the cost matrices
-    :param matrix: (ndarray-like)
-                The cost matrix (local cost or accumulated)
-    :param path:   (ndarray-like)
-                The optimal warping path
-    :return: (void)
-                Plots the optimal warping path with an overlay of the cost matrix.
-    """
-    pl.imshow(matrix.T, cmap='viridis', origin='lower', interpolation='None')
-    pl.colorbar()
-    #pl.plot(path[0], path[1], 'w.-')
-    pl.xlim((-0.5, matrix.shape[0] - 0.5))
-    pl.ylim((-0.5, matrix.shape[1] - 0.5))
-    
-    
 def dtw_sw(Ax, Ay, Az, Bx, By, Bz, winlen, alpha=0.5, **kwargs):
     """
     Computes Dynamic Time Warping (DTW) of two time series.
@@ -687,6 +515,8 @@ def calculate_vector_dot_product(df_model, df_test, mode='dtw_path', dtw_path=No
         raise ValueError("mode must be one of 'dtw_path', 'dtw_calc', 'same_time', 'relative_time', or 'raw_dot_product_same_time'")
 
      # プロット (dtw_pathが存在する場合のみ)
+     # import matplotlib.pyplot as plt
+     # from trajcore.plotting import plot_alignment
      # if dtw_path:
      #     plt.subplot(5, 3, 3 * call - 2)
      #     plot_alignment(model_vectors[:, 0], test_vectors[:, 0], dtw_path, step = 10)
@@ -778,12 +608,7 @@ def calculate_position_euclidean_distance(df_model, df_test, mode='same_time', n
             
             # DTWパスに沿ってユークリッド距離を計算
             distances = np.linalg.norm(model_pos[path0] - test_pos[path1], axis=1)
-
-            # DTWパスを描画
-            plt.figure(figsize=(10, 8))
-            plot_alignment(model_pos[:, 0], test_pos[:, 0], path)
-            plt.title("DTW Alignment")
-            plt.show()
+            # DTWパスの図は描かない (必要なら visualize_dtw でファイルに保存する)
 
         except Exception as e:
             print(f"Error during DTW calculation for Euclidean distance: {e}")
@@ -801,8 +626,9 @@ def calculate_position_euclidean_distance(df_model, df_test, mode='same_time', n
         return total_distance
 
 # DTWの結果を可視化する関数
-# DTWの結果を可視化する関数
-def visualize_dtw(df_model, df_test, winlen=12, alpha=0.5):
+# DTWの結果を可視化する関数 (GUI は使わず、画像ファイルに保存する)
+def visualize_dtw(df_model, df_test, winlen=12, alpha=0.5, out_prefix='dtw'):
+    from trajcore.plotting import save_alignment, save_costmatrix
     # モデルとテストデータから座標を取得
     Ax = df_model["PositionX"].to_numpy()
     Ay = df_model["PositionY"].to_numpy()
@@ -816,24 +642,19 @@ def visualize_dtw(df_model, df_test, winlen=12, alpha=0.5):
     
     # コスト行列を描画
     cost_matrix = dtw_result[1]
-    plt.figure(figsize=(10, 8))
-    plot_costmatrix(cost_matrix, dtw_path)
-    plt.title("Cost Matrix with DTW Path")
-    plt.show()
+    save_costmatrix(f"{out_prefix}_costmatrix.png", cost_matrix, dtw_path, title="Cost Matrix with DTW Path")
     
     # DTWパスを描画
-    plt.figure(figsize=(10, 8))
-    plot_alignment(Ax, Bx, dtw_path)
-    plt.title("DTW Alignment")
-    plt.show()
+    save_alignment(f"{out_prefix}_alignment.png", Ax, Bx, dtw_path, title="DTW Alignment", figsize=(10, 8))
 
 
 
-euclidean_results = []
-
 # 出力ファイルパス
 euclidean_output_csv = 'Assets/OriginalAssets/File/Demo/abcd2.csv'
 
+# 結果は計算するたびに追記する
+euclidean_sink = ResultSink(euclidean_output_csv, key_columns=['ExpNum', 'TestNum', 'Normalized'])
+
 
 # モデルファイルパスを生成
 model_file = f'Assets/OriginalAssets/File/Exp7_Model/1.csv'
@@ -856,7 +677,6 @@ test_file_path = base_path + test_file_name
 try:
     # テストデータを読み込む
     df_test_file = pd.read_csv(test_file_path)
-    df_t = pd.read_csv(test_file_path, dtype=str) # time列の読み込み用に残す場合
 except FileNotFoundError:
     print(f"  Test file not found: {test_file_path}. Skipping this test.")
 
@@ -865,37 +685,24 @@ df_test = df_test_file
 
 # --- 2. 座標ユークリッド距離の計算 --- 
 print("  Calculating Position Euclidean Distances...")
-try:
-    result_total = calculate_position_euclidean_distance(df_model, df_test, mode='dtw_calc', normalize=True)
-    euclidean_results.append({
-        'ExpNum': exp_num, 'TestNum': test_num,
-        'Normalized': False, 'Result': result_total # False = Total
-    })
-except Exception as e:
-    print(f"    Error (Euclidean, Total): {e}")
-    euclidean_results.append({
-        'ExpNum': exp_num, 'TestNum': test_num,
-        'Normalized': False, 'Result': np.nan
-    })
-# --- 全ての処理が終わったらDataFrameに変換してCSVに出力 --- 
-
-def save_results_to_csv(results_list, output_path):
-    if results_list:
-        results_df = pd.DataFrame(results_list)
-        try:
-            output_dir = os.path.dirname(output_path)
-            if output_dir and not os.path.exists(output_dir): # output_dirが空でないことも確認
-                os.makedirs(output_dir)
-                print(f"Created directory: {output_dir}")
-            results_df.to_csv(output_path, index=False, encoding='utf-8-sig')
-            print(f"\nResults successfully saved to {output_path}")
-        except Exception as e:
-            print(f"\nError saving results to {output_path}: {e}")
-    else:
-        print(f"\nNo results were generated for {output_path}.")
-
-# 各結果を保存
-save_results_to_csv(euclidean_results, euclidean_output_csv)
+if euclidean_sink.done(ExpNum=exp_num, TestNum=test_num, Normalized=False):
+    # 前回途中で止まったときに計算済みの結果は飛ばす
+    print(f"    Skip (Euclidean, Total): ExpNum={exp_num}, TestNum={test_num} は計算済み")
+else:
+    try:
+        result_total = calculate_position_euclidean_distance(df_model, df_test, mode='dtw_calc', normalize=True)
+        euclidean_sink.append({
+            'ExpNum': exp_num, 'TestNum': test_num,
+            'Normalized': False, 'Result': result_total # False = Total
+        })
+    except Exception as e:
+        print(f"    Error (Euclidean, Total): {e}")
+        euclidean_sink.append({
+            'ExpNum': exp_num, 'TestNum': test_num,
+            'Normalized': False, 'Result': np.nan
+        })
+# --- 全ての処理が終わったら、追記してきた結果を出力ファイルに置き換える ---
+euclidean_sink.finalize()
 
 # 使用例
 # ここでdf_modelとdf_testを引数として渡す
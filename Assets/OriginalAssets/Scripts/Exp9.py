@@ -1,389 +1,12 @@
 import numpy as np
-import pandas as pd
-import pylab as pl
-import scipy.interpolate as it
-import seaborn as sns
-import random
-import matplotlib.pyplot as plt
-import os
-
-# Auxiliary functions
-def get_mirror(s, ws):
-    
-    """
-    Performs a signal windowing based on a double inversion from the start and end segments.
-    :param s: (array-like)
-            the input-signal.
-    :param ws: (integer)
-            window size.
-    :return:
-    """
-
-    return np.r_[2 * s[0] - s[ws:0:-1], s, 2 * s[-1] - s[-2:-ws - 2:-1]]
-
-
-def normalize_signal(s):
-    """
-    Normalizes a given signal by subtracting the mean and dividing by the standard deviation.
-    :param s: (array_like)
-            The input signal.
-    :return:
-            The normalized input signal.
-    """
-    return (s - np.mean(s)) / np.std(s)
-
-def sliding_dist(Axw, Ayw, Azw, Bxw, Byw, Bzw, dAxw, dAyw, dAzw, dBxw, dByw, dBzw, a, win):
-    dw = np.sqrt(np.sum(((dAxw - dBxw) * win) ** 2.) + np.sum(((dAyw - dByw) * win) ** 2.) + np.sum(((dAzw - dBzw) * win) ** 2.))
-    w = np.sqrt(np.sum(((Axw - Bxw) * win) ** 2.) + np.sum(((Ayw - Byw) * win) ** 2.) + np.sum(((Azw - Bzw) * win) ** 2.))
-    return (1 - a) * dw + a * w
-
-
-def _traceback(D):
-    i, j = np.array(D.shape) - 2
-    p, q = [i], [j]
-    while (i > 0) or (j > 0):
-        tb = np.argmin((D[i, j], D[i, j + 1], D[i + 1, j]))
-        if tb == 0:
-            i -= 1
-            j -= 1
-        elif tb == 1:
-            i -= 1
-        else:  # (tb == 2):
-            j -= 1
-        p.insert(0, i)
-        q.insert(0, j)
-        
-    return np.array(p), np.array(q)
-
 
-def align_sequences(ref, s, path):
-    """
-    This functions aligns two time-series. The alignment is performed
-    for a given reference signal and a vector containing the alignment.
-    :param ref: (array-like)
-            The reference signal.
-    :param s: (array-like)
-            The signal to be aligned.
-    :param path: (ndarray)
-            A rank 2 array containing the optimal warping path between the two signals.
-    :return:
-    """
-    nt = np.linspace(0, len(ref) - 1, len(ref))
-    ns = it.interp1d(path[0], s[path[1]])(nt)
-
-    return ns
-
-# Visualization
-def plot_alignment(ref_signal, estimated_signal, path, **kwargs):
-    """
-    This functions plots the resulted alignment of two sequences given the path
-    calculated by the Dynamic Time Warping algorithm.
-
-    :param ref_signal: (array-like)
-                     The reference sequence.
-    :param estimated_signal: (array-like)
-                     The estimated sequence.
-    :param path: (array-like)
-                     A 2D array congaing the path resulted from the algorithm
-    :param \**kwargs:
-        See below:
-
-        * *offset* (``double``) --
-            The offset used to move the reference signal to an upper position for
-            visualization purposes.
-            (default: ``2``)
-
-        * *linewidths* (``list``) --
-            A list containing the linewidth for the reference, estimated and connection
-            plots, respectively.
-            (default: ``[3, 3, 0.5]``)
-
-        * *step* (``int``) --
-            The step for
-          (default: ``2``)
-
-        * *colors* (``list``) --
-          A list containing the colors for the reference, estimated and connection
-          plots, respectively.
-          (default: ``[sns.color_palette()[0], sns.color_palette()[1], 'k', 'k', 'k', 'k']``)
-    """
-
-    step = kwargs.get('step', 2)
-    offset = kwargs.get('offset', 2)
-    linewidths = kwargs.get('linewidths', [3, 3, 0.5])
-    colors = kwargs.get('colors', [sns.color_palette()[0], sns.color_palette()[1], 'k', 'k', 'k', 'k'])
-
-    # 上下に分割して実際の値を表示するために、Y軸の範囲を設定
-    ref_min = min(np.nanmin(ref_signal), np.nanmin(estimated_signal))
-    ref_max = max(np.nanmax(ref_signal), np.nanmax(estimated_signal))
-    est_min, est_max = ref_min, ref_max
-    # ref_min, ref_max = -1, 1
-    # est_min, est_max = -1, 1
-    
-    # Y軸の範囲を計算（余白を含む）- ゼロ除算を防ぐ
-    range_ref = ref_max - ref_min
-    #range_ref = 2
-    range_est = est_max - est_min
-    #range_est = 2
-    
-    # 範囲がゼロまたは無効な場合のデフォルト値
-    if np.isnan(range_ref) or range_ref <= 1e-10:
-        range_ref = 1.0
-    if np.isnan(range_est) or range_est <= 1e-10:
-        range_est = 1.0
-    
-    # 中心線の位置を0とする
-    center_line = 0
-    
-    # 参照信号を上半分に配置 - 値が大きいほど上に表示
-    ref_signal_shifted = center_line + (ref_signal - ref_min) / range_ref * range_ref + range_ref * 0.1
-    
-    # 推定信号を下半分に配置 - 値が大きいほど下から上に表示（反転しない）
-    est_signal_shifted = center_line - range_est * 1.1 + (estimated_signal - est_min) / range_est * range_est
+from trajcore.dtw import dtw_sw
+from trajcore.loader import columns_for_metrics, expand_columns, load_recording
+from trajcore.metrics import compute_score
+from trajcore.plotting import plot_job, render_plots
+from trajcore.prefetch import prefetch
+from trajcore.sink import ResultSink
 
-    # 実際のプロット
-    pl.axhline(y=center_line, color='gray', linestyle='--', alpha=0.5)  # 中心線を表示
-    
-    # 実際の値を表示
-    pl.plot(ref_signal_shifted, color=sns.color_palette()[1], lw=linewidths[0], label='model')
-    pl.plot(est_signal_shifted, color=sns.color_palette()[0], lw=linewidths[1], label='user')
-    pl.legend(fontsize=5)
-    
-    # Y軸ラベルを両側に表示
-    ax = pl.gca()
-    ax2 = ax.twinx()
-    
-    # 元のY軸範囲に戻すための変換関数
-    def ref_to_orig(y):
-        return (y - center_line - range_ref * 0.1) * range_ref / range_ref + ref_min
-    
-    def est_to_orig(y):
-        return ((y - center_line + range_est * 1.1) * range_est / range_est) + est_min
-    
-    # Y軸の設定 - NaNやInfを防ぐ
-    y_min = center_line - range_est * 1.5
-    y_max = center_line + range_ref * 1.5
-    
-    # NaNやInfをチェック
-    if np.isnan(y_min) or np.isinf(y_min):
-        y_min = -1.0
-    if np.isnan(y_max) or np.isinf(y_max):
-        y_max = 1.0
-        
-    ax.set_ylim(y_min, y_max)
-    ax2.set_ylim(y_min, y_max)
-    
-    try:
-        # 元の範囲に対応するY軸目盛りを設定
-        ref_ticks = np.linspace(ref_min, ref_max, 5)
-        est_ticks = np.linspace(est_min, est_max, 5)
-        
-        # 目盛り位置の計算 - userも値が大きいほど上になるよう修正
-        ref_tick_pos = [center_line + (t - ref_min) / range_ref * range_ref + range_ref * 0.1 for t in ref_ticks]
-        est_tick_pos = [center_line - range_est * 1.1 + (t - est_min) / range_est * range_est for t in est_ticks]
-        
-        # 目盛りにNaNが含まれていないか確認
-        if not np.any(np.isnan(ref_tick_pos)) and not np.any(np.isnan(est_tick_pos)):
-            # 左側のY軸はuserの値
-            ax.set_yticks(est_tick_pos)
-            ax.set_yticklabels([f"{t:.2f}" for t in est_ticks])
-            ax.set_ylabel('User', color=sns.color_palette()[0])
-            ax.tick_params(axis='y', colors=sns.color_palette()[0])
-            
-            # 右側のY軸はmodelの値
-            ax2.set_yticks(ref_tick_pos)
-            ax2.set_yticklabels([f"{t:.2f}" for t in ref_ticks])
-            ax2.set_ylabel('Model', color=sns.color_palette()[1])
-            ax2.tick_params(axis='y', colors=sns.color_palette()[1])
-    except Exception as e:
-        print(f"Y軸目盛りの設定でエラーが発生しました: {e}")
-        # デフォルトの目盛りを使用
-    
-    # DTWパスの描画
-    try:
-        for i in range(len(path[0]))[step * 0::step * 4]:
-            if path[0][i] < len(ref_signal_shifted) and path[1][i] < len(est_signal_shifted):
-                pl.plot([path[0][i], path[1][i]], 
-                        [ref_signal_shifted[path[0][i]], est_signal_shifted[path[1][i]]], 
-                        color=colors[2], lw=linewidths[2])
-        for i in range(len(path[0]))[step * 1::step * 4]:
-            if path[0][i] < len(ref_signal_shifted) and path[1][i] < len(est_signal_shifted):
-                pl.plot([path[0][i], path[1][i]], 
-                        [ref_signal_shifted[path[0][i]], est_signal_shifted[path[1][i]]], 
-                        color=colors[3], lw=linewidths[2])
-        for i in range(len(path[0]))[step * 2::step * 4]:
-            if path[0][i] < len(ref_signal_shifted) and path[1][i] < len(est_signal_shifted):
-                pl.plot([path[0][i], path[1][i]], 
-                        [ref_signal_shifted[path[0][i]], est_signal_shifted[path[1][i]]], 
-                        color=colors[4], lw=linewidths[2])
-        for i in range(len(path[0]))[step * 3::step * 4]:
-            if path[0][i] < len(ref_signal_shifted) and path[1][i] < len(est_signal_shifted):
-                pl.plot([path[0][i], path[1][i]], 
-                        [ref_signal_shifted[path[0][i]], est_signal_shifted[path[1][i]]], 
-                        color=colors[5], lw=linewidths[2])
-    except Exception as e:
-        print(f"DTWパスの描画でエラーが発生しました: {e}")
-
-    
-def plot_costmatrix(matrix, path):
-    """
-    This functions overlays the optimal warping path and the cost matrices
-    :param matrix: (ndarray-like)
-                The cost matrix (local cost or accumulated)
-    :param path:   (ndarray-like)
-                The optimal warping path
-    :return: (void)
-                Plots the optimal warping path with an overlay of the cost matrix.
-    """
-    pl.imshow(matrix.T, cmap='viridis', origin='lower', interpolation='None')
-    pl.colorbar()
-    #pl.plot(path[0], path[1], 'w.-')
-    pl.xlim((-0.5, matrix.shape[0] - 0.5))
-    pl.ylim((-0.5, matrix.shape[1] - 0.5))
-    
-    
-def dtw_sw(Ax, Ay, Az, Bx, By, Bz, winlen, alpha=0.5, **kwargs):
-    """
-    Computes Dynamic Time Warping (DTW) of two time series.
-    :param x: (array_like)
-            The reference signal.
-    :param y: (array_like)
-            The estimated signal.
-    :param winlen: (int)
-            The sliding window length
-    :param alpha: (float)
-            A factor between 0 and 1 which weights the amplitude and derivative contributions.
-            A higher value will favor amplitude and a lower value will favor the first derivative.
-
-    :param \**kwargs:
-        See below:
-
-        * *do_sign_norm* (``bool``) --
-          If ``True`` the signals will be normalized before computing the DTW,
-          (default: ``False``)
-
-        * *do_dist_norm* (``bool``) --
-          If ``True`` the DTW distance will be normalized by dividing the summation of the path dimension.
-          (default: ``True``)
-
-        * *window* (``String``) --
-          Selects the global window constrains. Available options are ``None`` and ``sakoe-chiba``.
-          (default: ``None``)
-
-        * *factor* (``Float``) --
-          Selects the global constrain factor.
-          (default: ``min(xl, yl) * .50``)
-
-
-    :return:
-           d: (float)
-            The SW-DTW distance.
-           C: (array_like)
-            The local cost matrix.
-           ac: (array_like)
-            The accumulated cost matrix.
-           path (array_like)
-            The optimal warping path between the two sequences.
-    """
-    Axl, Bxl = len(Ax), len(Bx)
-
-    do_sign_norm = kwargs.get('normalize', False)
-    do_dist_norm = kwargs.get('dist_norm', True)
-    window = kwargs.get('window', None)
-    factor = kwargs.get('factor', np.min((Axl, Bxl)) * .50)
-
-    if do_sign_norm:
-        Ax, Ay, Az, Bx, By, Bz= normalize_signal(Ax), normalize_signal(Ay), normalize_signal(Az), normalize_signal(Bx), normalize_signal(By), normalize_signal(Bz)
-
-    ac = np.zeros((Axl + 1, Bxl + 1))
-    ac[0, 1:] = np.inf
-    ac[1:, 0] = np.inf
-    tmp_ac = ac[1:, 1:]
-
-    nAx = get_mirror(Ax, winlen)
-    nAy = get_mirror(Ay, winlen)
-    nAz = get_mirror(Az, winlen)
-    nBx = get_mirror(Bx, winlen)
-    nBy = get_mirror(By, winlen)
-    nBz = get_mirror(Bz, winlen)
-
-    dnAx = np.diff(nAx, axis = 0)
-    dnAy = np.diff(nAy, axis = 0)
-    dnAz = np.diff(nAz, axis = 0)
-    dnBx = np.diff(nBx, axis = 0)
-    dnBy = np.diff(nBy, axis = 0)
-    dnBz = np.diff(nBz, axis = 0)
-
-    nAx = nAx[:-1]
-    nAy = nAy[:-1]
-    nAz = nAz[:-1]
-    nBx = nBx[:-1]
-    nBy = nBy[:-1]
-    nBz = nBz[:-1]
-
-    # Workaround to deal with even window sizes
-    if winlen % 2 == 0:
-        winlen -= 1
-
-    swindow = np.hamming(winlen)
-    swindow = swindow / np.sum(swindow)
-
-    for i in range(Axl):
-        for j in range(Bxl):
-            pad_i, pad_j = i + winlen, j + winlen
-            # No window selected
-            if window is None:
-                tmp_ac[i, j] = sliding_dist(nAx[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                        nAy[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                        nAz[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                        nBx[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
-                                        nBy[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
-                                        nBz[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
-                                        dnAx[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                        dnAy[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                        dnAz[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                        dnBx[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
-                                        dnBy[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
-                                        dnBz[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1], alpha, swindow)
-
-            # Sakoe-Chiba band
-            elif window == 'sakoe-chiba':
-                if abs(i - j) < factor:
-                    tmp_ac[i, j] = sliding_dist(nAx[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                            nAy[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                            nAz[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                            nBx[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
-                                            nBy[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
-                                            nBz[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
-                                            dnAx[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                            dnAy[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                            dnAz[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                            dnBx[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
-                                            dnBy[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
-                                            dnBz[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1], alpha, swindow)
-                else:
-                    tmp_ac[i, j] = np.inf
-
-            # As last resource, the complete window is calculated
-            else:
-                tmp_ac[i, j] = sliding_dist(nAx[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                        nBx[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
-                                        dnAx[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
-                                        dnBx[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1], alpha, swindow)
-    c = tmp_ac.copy()
-
-    for i in range(Axl):
-        for j in range(Bxl):
-            tmp_ac[i, j] += min([ac[i, j], ac[i, j + 1], ac[i + 1, j]]) #ac[i, j] == tmp_ac[i-1, j-1]のため。
-
-    path = _traceback(ac)
-
-    if do_dist_norm:
-        d = ac[-1, -1] / np.sum(np.shape(path))
-    else:
-        d = ac[-1, -1]
-
-    return d, c, ac, path
 
 def dtwDistance(Ax, Ay, Az, Bx, By, Bz, pathA, pathB):
     i = 0
@@ -670,6 +293,8 @@ def calculate_vector_dot_product(df_model, df_test, mode='dtw_path', dtw_path=No
         raise ValueError("mode must be one of 'dtw_path', 'dtw_calc', 'same_time', 'relative_time', or 'raw_dot_product_same_time'")
 
      # プロット (dtw_pathが存在する場合のみ)
+     # import matplotlib.pyplot as plt
+     # from trajcore.plotting import plot_alignment
      # if dtw_path:
      #     plt.subplot(5, 3, 3 * call - 2)
      #     plot_alignment(model_vectors[:, 0], test_vectors[:, 0], dtw_path, step = 10)
@@ -761,12 +386,7 @@ def calculate_position_euclidean_distance(df_model, df_test, mode='same_time', n
             
             # DTWパスに沿ってユークリッド距離を計算
             distances = np.linalg.norm(model_pos[path0] - test_pos[path1], axis=1)
-
-            # DTWパスを描画
-            plt.figure(figsize=(10, 8))
-            plot_alignment(model_pos[:, 0], test_pos[:, 0], path)
-            plt.title("DTW Alignment")
-            plt.show()
+            # DTWパスの図は描かない (必要なら visualize_dtw でファイルに保存する)
 
         except Exception as e:
             print(f"Error during DTW calculation for Euclidean distance: {e}")
@@ -783,8 +403,9 @@ def calculate_position_euclidean_distance(df_model, df_test, mode='same_time', n
     else:
         return total_distance
 
-# DTWの結果を可視化する関数
-def visualize_dtw(df_model, df_test, winlen=12, alpha=0.5):
+# DTWの結果を可視化する関数 (GUI は使わず、画像ファイルに保存する)
+def visualize_dtw(df_model, df_test, winlen=12, alpha=0.5, out_prefix='dtw'):
+    from trajcore.plotting import save_alignment, save_costmatrix
     # モデルとテストデータから座標を取得
     Ax = df_model["PositionX"].to_numpy()
     Ay = df_model["PositionY"].to_numpy()
@@ -798,198 +419,90 @@ def visualize_dtw(df_model, df_test, winlen=12, alpha=0.5):
     
     # コスト行列を描画
     cost_matrix = dtw_result[1]
-    plt.figure(figsize=(10, 8))
-    plot_costmatrix(cost_matrix, dtw_path)
-    plt.title("Cost Matrix with DTW Path")
-    plt.show()
+    save_costmatrix(f"{out_prefix}_costmatrix.png", cost_matrix, dtw_path, title="Cost Matrix with DTW Path")
     
     # DTWパスを描画
-    plt.figure(figsize=(10, 8))
-    plot_alignment(Ax, Bx, dtw_path)
-    plt.title("DTW Alignment")
-    plt.show()
-
-def resize_to_720(arr):
-    """arr: shape=(N, 3)のnumpy配列を720フレームにリサイズ"""
-    n = arr.shape[0]
-    if n == 720:
-        return arr
-    elif n < 2:
-        # 1フレームしかない場合は全て同じ値で埋める
-        return np.tile(arr, (720, 1))
-    elif n < 720:
-        # 線形補間
-        x_old = np.linspace(0, 1, n)
-        x_new = np.linspace(0, 1, 720)
-        arr_interp = np.zeros((720, 3))
-        for i in range(3):
-            arr_interp[:, i] = np.interp(x_new, x_old, arr[:, i])
-        return arr_interp
-    else:
-        # 間引き
-        idxs = np.linspace(0, n-1, 720).astype(int)
-        return arr[idxs]
-
-def calc_euclidean_score(model_arr, test_arr):
-    """
-    2つの配列（shape=(N,3)）のユークリッド距離の平均を計算する。
-    長さが異なる場合は短い方の長さに合わせて計算する。
-    """
-    test_arr_resize = resize_to_720(test_arr)
-    min_len = min(len(model_arr), len(test_arr_resize))
-    if min_len == 0:
-        return np.nan
-    dists = np.linalg.norm(model_arr[:min_len] - test_arr_resize[:min_len], axis=1)
-    return np.mean(dists)
-
-def calc_dtw_euclidean_score(model_arr, test_arr):
-    """
-    2つのshape=(720,3)配列について、dtw_sw()で得られたパスに沿って
-    ユークリッド距離を計算し、その平均を返す
-    """
-    # 各軸を抽出
-    Ax, Ay, Az = model_arr[:, 0], model_arr[:, 1], model_arr[:, 2]
-    Bx, By, Bz = test_arr[:, 0], test_arr[:, 1], test_arr[:, 2]
-    # DTW計算
-    _, _, _, path = dtw_sw(Ax, Ay, Az, Bx, By, Bz, winlen=12, alpha=0.5)
-    path0, path1 = path
-    # パスに沿ってユークリッド距離を計算
-    dists = np.linalg.norm(model_arr[path0] - test_arr[path1], axis=1)
-
-    # # 可視化
-    # plt.figure(figsize=(10, 4))
-    # plot_alignment(Ax, Bx, path)
-    # plt.title(f"{model_name} - Te{te_num} DTW Alignment")
-    # plt.show()
-
-    return np.mean(dists)
-
-def get_length_of_array(arr):
-    """
-    入力配列arrの行数（長さ）を返す関数
-    arr: shape=(N, 3)などのnumpy配列
-    return: int, 配列の行数
-    """
-    return arr.shape[0]
-
-def calc_dtw_quaternion_score(df_model, df_test):
-    """
-    位置情報でDTWパスを求め、そのパスに従ってクォータニオンの内積の絶対値の平均を返す
-    """
-    # 位置情報を取得
-    model_pos = df_model[['PositionX', 'PositionY', 'PositionZ']].to_numpy()
-    test_pos = df_test[['PositionX', 'PositionY', 'PositionZ']].to_numpy()
-
-    # クォータニオンを取得
-    model_quat = df_model[['RotationQX', 'RotationQY', 'RotationQZ', 'RotationQW']].to_numpy()
-    test_quat = df_test[['RotationQX', 'RotationQY', 'RotationQZ', 'RotationQW']].to_numpy()
-
-    # DTWパスを位置情報で計算
-    Ax, Ay, Az = model_pos[:, 0], model_pos[:, 1], model_pos[:, 2]
-    Bx, By, Bz = test_pos[:, 0], test_pos[:, 1], test_pos[:, 2]
-    _, _, _, path = dtw_sw(Ax, Ay, Az, Bx, By, Bz, winlen=12, alpha=0.5, window='sakoe-chiba', factor=300)
-    path0, path1 = path
-
-    # パスに従ってクォータニオンの内積の絶対値を計算
-    dot_products = []
-    for i in range(len(path0)):
-        idx_model = path0[i]
-        idx_test = path1[i]
-        q_model = model_quat[idx_model]
-        q_test = test_quat[idx_test]
-        dot = np.abs(np.dot(q_model, q_test))
-        dot_products.append(dot)
-
-    # 平均値を返す
-    if len(dot_products) == 0:
-        return np.nan
-    return np.mean(dot_products)
-
-def get_dtw_path_length_with_resized_test(df_model, df_test, winlen=12, alpha=0.5):
-    """
-    df_modelとdf_testを受け取り、test_posを720にリサイズし、DTWを計算し、そのパスの長さを返す関数。
-    """
-    # モデルとテストデータから座標を取得
-    model_pos = df_model[['PositionX', 'PositionY', 'PositionZ']].to_numpy()
-    test_pos = df_test[['PositionX', 'PositionY', 'PositionZ']].to_numpy()
-    
-    # test_posを720フレームにリサイズ
-    test_pos_resized = resize_to_720(test_pos)
-    # model_posはリサイズしない（必要なら同様にリサイズ可能）
-
-    # 各軸を抽出
-    Ax, Ay, Az = model_pos[:, 0], model_pos[:, 1], model_pos[:, 2]
-    Bx, By, Bz = test_pos_resized[:, 0], test_pos_resized[:, 1], test_pos_resized[:, 2]
-
-    # DTW計算
-    _, _, _, path = dtw_sw(Ax, Ay, Az, Bx, By, Bz, winlen=winlen, alpha=alpha)
-    path0, path1 = path
-
-    # # 可視化
-    # plt.figure(figsize=(10, 4))
-    # plot_alignment(Ax, Bx, path)
-    # plt.title(f"{model_name} - Tr{te_num} DTW Alignment")
-    # plt.show()
-
-    # パスの長さを返す
-    return len(path0)
-
-# モデル・テストファイルのリスト
-model_names = ['Traj1', 'Traj2', 'Traj3', 'Traj4', 'Auto1', 'Auto2', 'Auto3', 'Auto4']
-
-model_dir = 'Assets/OriginalAssets/File/Exp9_Model'
-test_dir = 'Assets/OriginalAssets/File/Exp9_User'
-
-# スコアをテスト番号ごとにまとめる
-test_scores = {f'Test{te_num}': {} for te_num in range(1, 26)}
-
-for model_name in model_names:
-    model_path = f'{model_dir}/{model_name}.csv'
-    try:
-        df_model = pd.read_csv(model_path)
-        model_arr = df_model[['PositionX', 'PositionY', 'PositionZ']].to_numpy()
-    except Exception as e:
-        print(f"モデルファイル読み込み失敗: {model_path} ({e})")
-        continue
-
-    for te_num in range(1, 26):
-    #for te_num in [1, 5, 10, 15, 20]:
-        test_name = f'{model_name}_Te{te_num}'
-        test_path = f'{test_dir}/{test_name}.csv'
+    save_alignment(f"{out_prefix}_alignment.png", Ax, Bx, dtw_path, title="DTW Alignment", figsize=(10, 8))
+
+if __name__ == "__main__":
+    # モデル・テストファイルのリスト
+    model_names = ['Traj1', 'Traj2', 'Traj3', 'Traj4', 'Auto1', 'Auto2', 'Auto3', 'Auto4']
+
+    model_dir = 'Assets/OriginalAssets/File/Exp9_Model'
+    test_dir = 'Assets/OriginalAssets/File/Exp9_User'
+
+    # 使うスコア関数 (trajcore.metrics.METRICS の名前。読み込む列もこのスコア関数に必要な列だけになる)
+    #score_func = 'calc_euclidean_score'
+    score_func = 'calc_dtw_euclidean_score'
+    #score_func = 'calc_dtw_quaternion_score'
+    #score_func = 'get_dtw_path_length_with_resized_test'
+    #score_func = 'get_length_of_array'
+    load_columns = columns_for_metrics([score_func])
+
+    def load_for_score(path):
+        data, _ = load_recording(path, load_columns)
+        return expand_columns(data, load_columns)
+
+    # 出力ファイル名を変更
+    #output_csv = 'Assets/OriginalAssets/File/Exp9_Result/resize_douzikoku_score.csv'
+    output_csv = 'Assets/OriginalAssets/File/Exp9_Result/dtw_score2.csv'
+    #output_csv = 'Assets/OriginalAssets/File/Exp9_Result/dtw_path_length.csv'
+    #output_csv = 'Assets/OriginalAssets/File/Exp9_Result/user_length.csv'
+    #output_csv = 'Assets/OriginalAssets/File/Exp9_Result/quaternion_dtw_score.csv'
+
+    # スコアは計算するたびに (Test, Model, Score) の形で追記し、最後にワイド形式にして保存する
+    # (途中で止まった場合は、計算済みのテストとモデルの組を飛ばして再開する)
+    test_names = [f'Test{te_num}' for te_num in range(1, 26)]
+    score_sink = ResultSink(output_csv, key_columns=['Test', 'Model'])
+
+    # DTWの整列図はスコアの計算中には描かず、最後にまとめて画像ファイルに保存する (描かない場合は None)
+    plot_dir = None
+    plot_jobs = []
+
+    for model_name in model_names:
+        model_path = f'{model_dir}/{model_name}.csv'
         try:
-            df_test = pd.read_csv(test_path)
-            test_arr = df_test[['PositionX', 'PositionY', 'PositionZ']].to_numpy()
-            
-            
-            #score = calc_euclidean_score(model_arr, test_arr)
-            score = calc_dtw_euclidean_score(model_arr, test_arr)
-            #score = calc_dtw_quaternion_score(df_model, df_test)
-            #score = get_dtw_path_length_with_resized_test(df_model, df_test)
-            #score = get_length_of_array(test_arr)
-
-            print(f"Test{te_num} {model_name}のスコア: {score}")
+            model = load_for_score(model_path)
         except Exception as e:
-            print(f"テストファイル読み込み失敗: {test_path} ({e})")
-            score = np.nan
-
-        test_scores[f'Test{te_num}'][model_name] = score
-
-# DataFrameをワイド形式で作成
-df_out = pd.DataFrame([
-    {'Test': test_name, **scores}
-    for test_name, scores in test_scores.items()
-])
-
-# 1行目に「Test」, 2列目以降にモデル名
-df_out = df_out[['Test'] + model_names]
-
-# 出力ファイル名を変更
-#output_csv = 'Assets/OriginalAssets/File/Exp9_Result/resize_douzikoku_score.csv'
-output_csv = 'Assets/OriginalAssets/File/Exp9_Result/dtw_score2.csv'
-#output_csv = 'Assets/OriginalAssets/File/Exp9_Result/dtw_path_length.csv'
-#output_csv = 'Assets/OriginalAssets/File/Exp9_Result/user_length.csv'
-#output_csv = 'Assets/OriginalAssets/File/Exp9_Result/quaternion_dtw_score.csv'
-os.makedirs(os.path.dirname(output_csv), exist_ok=True)
-df_out.to_csv(output_csv, index=False, encoding='utf-8-sig')
-print(f"全スコアを{output_csv}に保存しました")
-
+            print(f"モデルファイル読み込み失敗: {model_path} ({e})")
+            continue
+
+        # テストファイルを先読みしながら、順にスコアを計算する
+        te_nums = range(1, 26)
+        #te_nums = [1, 5, 10, 15, 20]
+
+        def test_path_of(te_num):
+            test_name = f'{model_name}_Te{te_num}'
+            return f'{test_dir}/{test_name}.csv'
+
+        if plot_dir is not None:
+            plot_jobs += [plot_job(model_path, test_path_of(te_num), f'{plot_dir}/{model_name}_Te{te_num}.png',
+                                   title=f"{model_name} - Te{te_num} DTW Alignment")
+                          for te_num in te_nums]
+        te_nums = [te_num for te_num in te_nums if not score_sink.done(Test=f'Test{te_num}', Model=model_name)]
+
+        for te_num, test, error in prefetch(te_nums, lambda te_num: load_for_score(test_path_of(te_num))):
+            test_path = test_path_of(te_num)
+            try:
+                if error is not None:
+                    raise error
+                score = compute_score(score_func, model, test)
+
+                print(f"Test{te_num} {model_name}のスコア: {score}")
+            except Exception as e:
+                print(f"テストファイル読み込み失敗: {test_path} ({e})")
+                score = np.nan
+
+            score_sink.append({'Test': f'Test{te_num}', 'Model': model_name, 'Score': score})
+
+    def to_wide(df_scores):
+        # 1行目に「Test」, 2列目以降にモデル名
+        df_out = df_scores.pivot(index='Test', columns='Model', values='Score')
+        df_out = df_out.reindex(index=test_names, columns=model_names)
+        return df_out.rename_axis(index='Test', columns=None).reset_index()
+
+    if score_sink.finalize(reshape=to_wide):
+        print(f"全スコアを{output_csv}に保存しました")
+
+    if plot_dir is not None:
+        render_plots(plot_jobs, workers=4)
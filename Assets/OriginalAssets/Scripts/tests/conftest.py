@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# tests/ から trajcore を import できるようにする (Scripts をパスに加える)
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+FILE_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), 'File')
+
+
+@pytest.fixture
+def file_dir():
+    """実験データ (Assets/OriginalAssets/File) のフォルダ"""
+    return FILE_DIR
@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+import pytest
+
+from trajcore.codec import save_quantized
+from trajcore.store import PackedStore, pack_recordings
+
+
+def _pack(file_dir, tmp_path, names):
+    root = os.path.join(file_dir, 'Demo')
+    return pack_recordings(root, str(tmp_path / 'demo'), paths=[os.path.join(root, name) for name in names])
+
+
+def test_save_quantized_with_empty_last_record(file_dir, tmp_path):
+    # jhuv_* は読み込むと 0 行になる。最後の記録が空でも量子化できること
+    store = _pack(file_dir, tmp_path, ['dtfk_Te1.csv', 'jhuv_Te1.csv'])
+    assert store.records[-1]['length'] == 0
+    assert store.records[-1]['offset'] == len(store.data)
+
+    errors = save_quantized(store, str(tmp_path / 'demo_q'))
+    quantized = PackedStore(str(tmp_path / 'demo_q'))
+    assert quantized.get(1).shape == (0, len(store.columns))
+    original = np.asarray(store.get(0), dtype=float)
+    assert np.abs(quantized.get(0)[:, 2:5] - original[:, 2:5]).max() <= errors['position'] + 1e-9
+
+
+def test_save_quantized_rejects_quantized_store(file_dir, tmp_path):
+    store = _pack(file_dir, tmp_path, ['dtfk_Te1.csv'])
+    save_quantized(store, str(tmp_path / 'demo_q'))
+    with pytest.raises(ValueError, match='量子化済み'):
+        save_quantized(PackedStore(str(tmp_path / 'demo_q')), str(tmp_path / 'demo_qq'))
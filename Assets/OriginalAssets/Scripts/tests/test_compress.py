@@ -0,0 +1,44 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from trajcore.compress import SUMMARY_FILE, compress_models
+
+
+def test_rerun_in_model_folder_skips_outputs(file_dir, tmp_path, capsys):
+    # KeyFrame.py のバッチ処理と同じく、出力先を見本のフォルダにして 2 回実行する
+    for name in ['1.csv', '2.csv']:
+        shutil.copy(os.path.join(file_dir, 'Exp7', 'Exp7_Model', name), tmp_path / name)
+    shutil.copy(os.path.join(file_dir, 'Exp1', 'Exp1_Model', 'smoothing200.csv'), tmp_path / 'smoothing200.csv')
+
+    first = compress_models(str(tmp_path), str(tmp_path))
+    assert (tmp_path / SUMMARY_FILE).exists()
+    second = compress_models(str(tmp_path), str(tmp_path))
+
+    assert sorted(first['Model']) == ['1', '2']
+    assert sorted(second['Model']) == ['1', '2']
+    assert second.equals(first)
+    # 要約の表を見本として読み込もうとして失敗していないこと
+    assert '失敗' not in capsys.readouterr().out
+    assert sorted(os.listdir(tmp_path)) == sorted([
+        '1.csv', '2.csv', 'smoothing200.csv', SUMMARY_FILE,
+        '1_optimal_pos_linear_rot_slerp.csv', '2_optimal_pos_linear_rot_slerp.csv'])
+
+
+def test_separator_rows_are_not_frames(file_dir, tmp_path):
+    # FileOperation.cs が trial の区切りに書く ',,,,' の行や空行は、NaN のフレームとして扱わない
+    with open(os.path.join(file_dir, 'Exp7', 'Exp7_Model', '1.csv'), encoding='utf-8-sig') as f:
+        lines = f.read().splitlines()
+    n_frames = len(lines) - 1
+    with open(tmp_path / '1.csv', 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines[:301] + [',' * 12, ''] + lines[301:] + [',' * 12]) + '\n')
+
+    summary = compress_models(str(tmp_path), str(tmp_path / 'out'))
+
+    assert summary['Frames'].tolist() == [n_frames]
+    assert np.isfinite(summary[['MaxError', 'MeanError', 'MaxRotationDeg']].to_numpy()).all()
+    df = pd.read_csv(tmp_path / 'out' / '1_optimal_pos_linear_rot_slerp.csv')
+    assert len(df) == n_frames
+    assert not df[['PositionX', 'RotationQW']].isna().any().any()
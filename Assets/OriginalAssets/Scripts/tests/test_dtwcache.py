@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+import pytest
+
+from trajcore.dtw import dtw_sw
+from trajcore.dtwcache import DTWCache, cached_dtw, dtw_key
+
+
+def _series(n, phase):
+    t = np.linspace(0, 2 * np.pi, n)
+    return np.sin(t + phase), np.cos(t + phase), 0.1 * t
+
+
+@pytest.mark.parametrize('corrupt', [
+    lambda data: data[:len(data) // 2],   # 書き込みの途中で切れた
+    lambda data: b'not a zip file',       # 中身が壊れた
+])
+def test_corrupt_entry_is_recomputed(tmp_path, corrupt):
+    cache = DTWCache(str(tmp_path))
+    A, B = _series(60, 0.0), _series(50, 0.3)
+    d, path = cached_dtw(dtw_sw, *A, *B, 12, 0.5, cache=cache)
+
+    key = dtw_key(dtw_sw, [*A, *B], {'winlen': 12, 'alpha': 0.5})
+    entry = cache._entry_path(key)
+    with open(entry, 'rb') as f:
+        data = f.read()
+    with open(entry, 'wb') as f:
+        f.write(corrupt(data))
+
+    assert cache.get(key) is None
+    assert not os.path.exists(entry)
+
+    d2, path2 = cached_dtw(dtw_sw, *A, *B, 12, 0.5, cache=cache)
+    assert d2 == d
+    assert np.array_equal(path2[0], path[0]) and np.array_equal(path2[1], path[1])
+    assert cache.get(key) is not None
@@ -0,0 +1,37 @@
+import os
+
+import numpy as np
+import pytest
+
+from trajcore.dtwcache import DTWCache
+from trajcore.loader import LOAD_COLUMNS, columns_for_metrics, expand_columns, load_recording
+from trajcore.metrics import METRICS, compute_score
+from trajcore.runner import _metric_specs, run_pair
+
+
+@pytest.mark.parametrize('name', sorted(METRICS))
+def test_compute_score_with_metric_columns(tmp_path, file_dir, name):
+    # Exp*.py のようにスコアに必要な列だけを読み込んでも、全ての列を読み込んだ場合と同じスコアになる
+    model_path = os.path.join(file_dir, 'Exp9', 'Exp9_Model', 'Traj1.csv')
+    test_path = os.path.join(file_dir, 'Exp9', 'Exp9_User', 'Traj1_Te1.csv')
+    cache = DTWCache(str(tmp_path))
+    columns = columns_for_metrics([name])
+    model = expand_columns(load_recording(model_path, columns)[0], columns)[:80]
+    test = expand_columns(load_recording(test_path, columns)[0], columns)[:70]
+    full_model = load_recording(model_path)[0][:80]
+    full_test = load_recording(test_path)[0][:70]
+
+    assert model.shape == (80, len(LOAD_COLUMNS))
+    assert compute_score(name, model, test, cache=cache) == compute_score(name, full_model, full_test, cache=cache)
+
+
+def test_compute_score_matches_runner(file_dir):
+    # runner と同じスコアになる (Exp9 の Traj1 と Te1 の組)
+    model_path = os.path.join(file_dir, 'Exp9', 'Exp9_Model', 'Traj1.csv')
+    test_path = os.path.join(file_dir, 'Exp9', 'Exp9_User', 'Traj1_Te1.csv')
+    names = ['calc_euclidean_score', 'get_length_of_array']
+    scores = run_pair(model_path, test_path, _metric_specs({}, names))
+    model, _ = load_recording(model_path)
+    test, _ = load_recording(test_path)
+    for name in names:
+        assert compute_score(name, model, test) == scores[name]
@@ -0,0 +1,33 @@
+import os
+
+import numpy as np
+from matplotlib.figure import Figure
+
+import trajcore.dtw
+import trajcore.plotting
+from trajcore.plotting import plot_costmatrix, plot_job, render_plot
+
+
+def test_plot_costmatrix_draws_full_matrix_by_default():
+    # Exp*.py から直接呼んだ場合は、元の plot_costmatrix と同じく行列全体を描く
+    matrix = np.random.default_rng(0).random((1500, 1200))
+    path = (np.arange(1200), np.arange(1200))
+    ax = Figure(figsize=(4, 3)).add_subplot()
+    plot_costmatrix(matrix, path, ax=ax)
+    assert ax.images[0].get_array().shape == (1200, 1500)
+
+
+def test_render_plot_pools_cost_matrix(monkeypatch, file_dir, tmp_path):
+    # render_plots でまとめて描く図は、mode を指定しなければ pooled で描く
+    calls = []
+    matrix = np.zeros((3, 3))
+    monkeypatch.setattr(trajcore.dtw, 'dtw_sw', lambda *args, **kwargs: (0.0, matrix, matrix, ([0], [0])))
+    monkeypatch.setattr(trajcore.plotting, 'save_costmatrix', lambda *args, **kwargs: calls.append(kwargs))
+    model_path = os.path.join(file_dir, 'Exp9', 'Exp9_Model', 'Traj1.csv')
+    test_path = os.path.join(file_dir, 'Exp9', 'Exp9_User', 'Traj1_Te1.csv')
+
+    render_plot(plot_job(model_path, test_path, str(tmp_path / 'a.png'), kind='costmatrix'))
+    render_plot(plot_job(model_path, test_path, str(tmp_path / 'b.png'), kind='costmatrix',
+                         options={'mode': 'band'}))
+
+    assert [kwargs['mode'] for kwargs in calls] == ['pooled', 'band']
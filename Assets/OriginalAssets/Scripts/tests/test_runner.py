@@ -0,0 +1,31 @@
+import glob
+import os
+
+import pytest
+
+from trajcore.runner import check_inputs, load_config, plan
+
+from conftest import FILE_DIR, SCRIPTS_DIR
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(FILE_DIR)))
+
+
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(SCRIPTS_DIR, 'configs', '*.json'))))
+def test_shipped_configs_find_their_files(monkeypatch, path):
+    # 設定のパスはリポジトリのルートからの相対パス
+    monkeypatch.chdir(REPO_ROOT)
+    config = load_config(path)
+    check_inputs(config, plan(config))
+
+
+def test_missing_tests_fail_loudly(monkeypatch):
+    monkeypatch.chdir(REPO_ROOT)
+    config = {
+        'datasets': [{'name': 'Ozaki', 'model_dir': 'Assets/OriginalAssets/File/Ozaki/Model',
+                      'test_dir': 'Assets/OriginalAssets/File/Ozaki/User', 'models': ['1'],
+                      'test_pattern': '{model}_Te{num}', 'test_range': [1, 4]}],
+        'metrics': ['get_length_of_array'],
+        'output': {'path': 'unused.csv'},
+    }
+    with pytest.raises(ValueError, match='テストのファイルが 1 つも見つかりません'):
+        check_inputs(config, plan(config))
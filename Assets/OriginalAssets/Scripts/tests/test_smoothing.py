@@ -0,0 +1,80 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from trajcore.loader import POSITION_SLICE, TIME_COL, load_recording
+from trajcore.smoothing import fit_pose_spline, smooth_csv_bspline, smooth_files, spline_to_recording
+
+
+def _load(path):
+    return load_recording(path)[0]
+
+
+def test_fit_pose_spline_with_repeated_first_row(file_dir):
+    # FileOperation.cs が書く見本は最初の行が time=0 で 2 回ある
+    recording = _load(os.path.join(file_dir, 'Ozaki', 'Model', '1.csv'))
+    assert recording[0, TIME_COL] == recording[1, TIME_COL]
+
+    spline = fit_pose_spline(recording, n_knots=40)
+    smoothed = spline_to_recording(spline, recording)
+    assert smoothed.shape == recording.shape
+    assert np.all(np.isfinite(smoothed))
+    errors = np.linalg.norm(smoothed[:, POSITION_SLICE] - recording[:, POSITION_SLICE], axis=1)
+    assert errors.max() < 0.05
+
+
+def test_fit_pose_spline_rejects_decreasing_time(file_dir):
+    recording = _load(os.path.join(file_dir, 'Ozaki', 'Model', '1.csv'))
+    with pytest.raises(ValueError):
+        fit_pose_spline(np.concatenate([recording, recording]))
+
+
+def test_smooth_csv_bspline_on_model_folder_file(file_dir, tmp_path):
+    out_path = tmp_path / 'bspline.csv'
+    smooth_csv_bspline(os.path.join(file_dir, 'Exp10_originModel', '1.csv'), str(out_path))
+    df = pd.read_csv(out_path)
+    assert len(df) == len(pd.read_csv(os.path.join(file_dir, 'Exp10_originModel', '1.csv')))
+
+
+def test_smooth_files_skips_derived_files(file_dir, tmp_path):
+    # 見本のフォルダにある補間や平滑化の結果は平滑化しない (2 回目は前回の *_sigma*.csv も除く)
+    shutil.copy(os.path.join(file_dir, 'Exp7', 'Exp7_Model', '1.csv'), tmp_path / '1.csv')
+    for name in ['1_optimal_pos_linear_rot_slerp.csv', 'keyframe_summary.csv', 'smoothing200.csv', 'bspline40.csv']:
+        shutil.copy(os.path.join(file_dir, 'Exp7', 'Exp7_Model', '1.csv'), tmp_path / name)
+
+    first = smooth_files(str(tmp_path), str(tmp_path), sigmas=[5, 60])
+    second = smooth_files(str(tmp_path), str(tmp_path), sigmas=[5, 60])
+
+    expected = [str(tmp_path / '1_sigma5.csv'), str(tmp_path / '1_sigma60.csv')]
+    assert first == expected
+    assert second == expected
+
+
+def test_separator_rows_are_dropped_before_fitting(file_dir, tmp_path):
+    # trial の区切りの ',,,,' の行や空行があっても NaN の行として近似に入れない
+    with open(os.path.join(file_dir, 'Ozaki', 'Model', '1.csv'), encoding='utf-8-sig') as f:
+        lines = f.read().splitlines()
+    in_path = tmp_path / '1.csv'
+    with open(in_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines[:301] + [',' * 10, ''] + lines[301:]) + '\n')
+
+    out_path = tmp_path / 'bspline.csv'
+    smooth_csv_bspline(str(in_path), str(out_path))
+    df = pd.read_csv(out_path)
+    assert len(df) == len(lines) - 1
+    assert not df[['PositionX', 'RotationQW']].isna().any().any()
+
+    written = smooth_files(str(tmp_path), str(tmp_path / 'out'), sigmas=[5])
+    df = pd.read_csv(written[0])
+    assert len(df) == len(lines) - 1
+    assert not df[['PositionX', 'RotationQW']].isna().any().any()
+
+
+def test_fit_pose_spline_rejects_nan_rows(file_dir):
+    recording = _load(os.path.join(file_dir, 'Ozaki', 'Model', '1.csv'))
+    recording[300] = np.nan
+    with pytest.raises(ValueError):
+        fit_pose_spline(recording)
@@ -0,0 +1,68 @@
+"""
+Exp*.py / KeyFrame.py から共通で使う軌跡解析の処理をまとめたパッケージ。
+
+Exp*.py はファイル名にハイフンを含んだり、import 時に実験が走ったりするため
+ライブラリとして import できない。再利用したい処理はここに置く。
+
+どのモジュールも import 時には何も計算せず、pandas / matplotlib / scipy は使う関数の中で import する。
+よく使う関数は `trajcore.dtw_sw` のようにパッケージから直接参照でき、
+そのときに初めて該当するモジュールを読み込む (ワーカープロセスの起動を軽くするため)。
+"""
+import importlib
+
+# 名前 -> 定義しているモジュール
+_EXPORTS = {
+    'load_recording': 'trajcore.loader',
+    'load_frame': 'trajcore.loader',
+    'iter_trials': 'trajcore.loader',
+    'split_trials': 'trajcore.loader',
+    'columns_for_metrics': 'trajcore.loader',
+    'expand_columns': 'trajcore.loader',
+    'load_recording_cached': 'trajcore.cache',
+    'RecordingCache': 'trajcore.cache',
+    'DatasetCatalog': 'trajcore.catalog',
+    'PackedStore': 'trajcore.store',
+    'pack_recordings': 'trajcore.store',
+    'ResultSink': 'trajcore.sink',
+    'prefetch': 'trajcore.prefetch',
+    'dtw_sw': 'trajcore.dtw',
+    'cached_dtw': 'trajcore.dtwcache',
+    'DTWCache': 'trajcore.dtwcache',
+    'METRICS': 'trajcore.metrics',
+    'align': 'trajcore.metrics',
+    'compute_score': 'trajcore.metrics',
+    'resize_to_720': 'trajcore.resample',
+    'resample_linear': 'trajcore.resample',
+    'segment_vector_cosines': 'trajcore.segments',
+    'extract_keyframes': 'trajcore.keyframes',
+    'keyframe_curve': 'trajcore.keyframes',
+    'select_keyframes': 'trajcore.keyframes',
+    'pose_segment_errors': 'trajcore.keyframes',
+    'interpolate_positions': 'trajcore.keyframes',
+    'interpolate_quaternions': 'trajcore.keyframes',
+    'project_positions': 'trajcore.keyframes',
+    'compress_models': 'trajcore.compress',
+    'KeyframeTrack': 'trajcore.keytrack',
+    'load_track': 'trajcore.keytrack',
+    'evaluate': 'trajcore.keytrack',
+    'fit_pose_spline': 'trajcore.smoothing',
+    'pose_velocities': 'trajcore.smoothing',
+    'smooth_files': 'trajcore.smoothing',
+    'render_plots': 'trajcore.plotting',
+    'plot_job': 'trajcore.plotting',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module 'trajcore' has no attribute '{name}'")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,158 @@
+import glob
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from trajcore.loader import TIME_COL, TRIAL_COL, column_selector, find_trial_starts, load_recording
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'TRAJCORE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'trajcore', 'recordings'))
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class RecordingCache:
+    """
+    load_recording の結果を .npy としてキャッシュし、2回目以降は memmap で読み込むクラス。
+
+    キャッシュは「元ファイルの絶対パス」のハッシュのディレクトリに、
+    「元ファイルの mtime・サイズ」のハッシュを名前にして保存するため、元の CSV が更新されると自動的に読み直す。
+    合計サイズが max_bytes を超えたら、最後に使われた時刻 (キャッシュファイルの mtime) が古いものから削除する。
+
+    Parameters:
+    -----------
+    cache_dir : str, optional
+        キャッシュの保存先 (default: 環境変数 TRAJCORE_CACHE_DIR または ~/.cache/trajcore/recordings)
+    max_bytes : int, optional
+        キャッシュの合計サイズの上限 (default: 512MB)
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self._total_bytes = None  # 初回の書き込み時にディレクトリを走査して求める
+        self._lock = threading.Lock()  # prefetch などで複数スレッドから使うため
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_dir(self, path):
+        path_key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.cache_dir, path_key)
+
+    def _entry_path(self, path, st):
+        state = f'{st.st_mtime_ns}-{st.st_size}'
+        state_key = hashlib.sha1(state.encode('utf-8')).hexdigest()[:12]
+        return os.path.join(self._entry_dir(path), f'{state_key}.npy')
+
+    def load(self, path, columns=None):
+        """
+        キャッシュがあれば memmap で、なければ CSV を読み込んでキャッシュに保存してから返す。
+        キャッシュには常に全列を保存し、columns を指定した場合はその列だけを取り出して返す。
+
+        Returns:
+        --------
+        data : ndarray (読み取り専用の memmap), shape=(N, len(columns))
+        trial_starts : ndarray of int
+        """
+        data, trial_starts = self._load_all(path)
+        if columns is not None:
+            data = data[:, column_selector(columns)]
+        return data, trial_starts
+
+    def _load_all(self, path):
+        st = os.stat(path)
+        entry = self._entry_path(path, st)
+
+        if os.path.exists(entry):
+            try:
+                data = np.load(entry, mmap_mode='r')
+                os.utime(entry)  # LRU 用に最終使用時刻を更新
+                return data, find_trial_starts(data[:, TRIAL_COL], data[:, TIME_COL])
+            except (OSError, ValueError):
+                # 壊れたキャッシュは読み直す
+                self._remove(entry)
+
+        data, trial_starts = load_recording(path)
+        self._store(path, entry, data)
+        return data, trial_starts
+
+    def _store(self, path, entry, data):
+        with self._lock:
+            self._store_locked(path, entry, data)
+
+    def _store_locked(self, path, entry, data):
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self.entries())
+
+        # 同じ元ファイルの古いキャッシュを削除
+        entry_dir = os.path.dirname(entry)
+        os.makedirs(entry_dir, exist_ok=True)
+        for stale in glob.glob(os.path.join(entry_dir, '*.npy')):
+            if stale != entry:
+                self._remove(stale)
+
+        tmp = f'{entry}.{os.getpid()}.tmp'
+        try:
+            with open(tmp, 'wb') as f:
+                np.save(f, np.ascontiguousarray(data))
+            os.replace(tmp, entry)
+        except OSError as e:
+            print(f"キャッシュの書き込みに失敗しました: {entry} ({e})")
+            self._remove(tmp)
+            return
+        self._total_bytes += os.path.getsize(entry)
+        if self._total_bytes > self.max_bytes:
+            self.evict()
+
+    def _remove(self, entry):
+        try:
+            size = os.path.getsize(entry)
+            os.remove(entry)
+        except OSError:
+            return
+        if self._total_bytes is not None:
+            self._total_bytes -= size
+
+    def entries(self):
+        """キャッシュファイルの (パス, サイズ, 最終使用時刻) のリスト"""
+        result = []
+        for entry in glob.glob(os.path.join(self.cache_dir, '*', '*.npy')):
+            try:
+                st = os.stat(entry)
+            except OSError:
+                continue
+            result.append((entry, st.st_size, st.st_mtime))
+        return result
+
+    def evict(self):
+        """合計サイズが max_bytes 以下になるまで、最後に使われた時刻が古いキャッシュから削除する"""
+        entries = self.entries()
+        self._total_bytes = sum(size for _, size, _ in entries)
+        if self._total_bytes <= self.max_bytes:
+            return
+        for entry, _, _ in sorted(entries, key=lambda e: e[2]):
+            self._remove(entry)
+            if self._total_bytes <= self.max_bytes:
+                break
+
+    def clear(self):
+        for entry, _, _ in self.entries():
+            self._remove(entry)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def load_recording_cached(path, cache=None, columns=None):
+    """
+    load_recording のキャッシュ付き版。cache を省略した場合は既定の RecordingCache を使う。
+    返り値の data は読み取り専用なので、書き換える場合は np.array(data) でコピーすること。
+    """
+    global _default_cache
+    if cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = RecordingCache()
+        cache = _default_cache
+    return cache.load(path, columns)
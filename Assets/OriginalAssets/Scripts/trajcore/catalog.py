@@ -0,0 +1,128 @@
+import json
+import os
+
+from trajcore.naming import parse_recording_name
+
+# ドットで始まるファイルは Unity に取り込まれない
+CATALOG_FILE_NAME = '.trajcore_catalog.json'
+CATALOG_VERSION = 1
+
+
+class DatasetCatalog:
+    """
+    File/ 以下の記録ファイルを一度だけ走査し、命名規則から作った索引で検索できるようにするクラス。
+
+    ファイルの有無を FileNotFoundError で確かめる代わりに、find() で存在するファイルだけを列挙する。
+    索引は root/.trajcore_catalog.json に保存し、どのディレクトリの mtime も変わっていなければ
+    次回はディレクトリを走査せずにそれを読み込む。
+
+    Examples:
+    ---------
+    >>> catalog = DatasetCatalog('Assets/OriginalAssets/File')
+    >>> catalog.numbers(condition='Exp7_3', kind='Te')
+    [1, 2, 3, 4, 5, 6]
+    >>> catalog.path(condition='Exp8_User', participant='Auto1', kind='Te', number=3)
+    'Assets/OriginalAssets/File/Exp8/Exp8_User/Auto1_Te3.csv'
+    """
+
+    def __init__(self, root, use_cache=True):
+        self.root = root
+        self.cache_path = os.path.join(root, CATALOG_FILE_NAME)
+        self.entries = None
+        self._dir_mtimes = None
+
+        if use_cache:
+            self._load_cache()
+        if self.entries is None:
+            self.rescan()
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return
+        if cached.get('version') != CATALOG_VERSION:
+            return
+
+        # ディレクトリの mtime が変わっていればファイルが追加・削除されているので読み直す
+        for rel_dir, mtime in cached['dir_mtimes'].items():
+            try:
+                if os.stat(os.path.join(self.root, rel_dir)).st_mtime_ns != mtime:
+                    return
+            except OSError:
+                return
+        self.entries = cached['entries']
+        self._dir_mtimes = cached['dir_mtimes']
+
+    def rescan(self):
+        """root 以下を走査して索引を作り直し、キャッシュに保存する"""
+        # キャッシュファイルを新しく作ると root の mtime が変わるため、走査の前に作っておく
+        try:
+            open(self.cache_path, 'a', encoding='utf-8').close()
+        except OSError:
+            pass
+
+        entries = []
+        dir_mtimes = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            dir_mtimes[os.path.relpath(dirpath, self.root).replace('\\', '/')] = os.stat(dirpath).st_mtime_ns
+            for filename in sorted(filenames):
+                if not filename.endswith('.csv'):  # .meta などは対象外
+                    continue
+                rel = os.path.relpath(os.path.join(dirpath, filename), self.root).replace('\\', '/')
+                info = parse_recording_name(rel, '.')
+                info['path'] = rel
+                entries.append(info)
+
+        self.entries = entries
+        self._dir_mtimes = dir_mtimes
+        self._save_cache()
+
+    def _save_cache(self):
+        # 既存ファイルの上書きはディレクトリの mtime を変えないので、その場で書き込む。
+        # 途中で壊れた場合は次回の読み込みで ValueError になり、走査し直す。
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': CATALOG_VERSION, 'dir_mtimes': self._dir_mtimes, 'entries': self.entries},
+                          f, ensure_ascii=False)
+        except OSError as e:
+            print(f"カタログの保存に失敗しました: {self.cache_path} ({e})")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def full_path(self, entry):
+        return os.path.join(self.root, entry['path']).replace('\\', '/')
+
+    def find(self, **criteria):
+        """
+        索引の項目 (study, condition, participant, kind, number, suffix) で絞り込む。
+        結果は kind, number の順に並べて返す。
+        例: catalog.find(condition='Exp7_6', kind='Te')
+        """
+        matched = [e for e in self.entries
+                   if all(e.get(key) == value for key, value in criteria.items())]
+        return sorted(matched, key=lambda e: (e['kind'], e['number'] if e['number'] is not None else -1, e['path']))
+
+    def paths(self, **criteria):
+        """find() に一致するファイルのパス (root を含む) のリスト"""
+        return [self.full_path(e) for e in self.find(**criteria)]
+
+    def path(self, **criteria):
+        """find() に一致するファイルが 1 つだけならそのパス、なければ None を返す"""
+        matched = self.find(**criteria)
+        if not matched:
+            return None
+        if len(matched) > 1:
+            raise ValueError(f"条件 {criteria} に一致するファイルが複数あります: {[e['path'] for e in matched]}")
+        return self.full_path(matched[0])
+
+    def numbers(self, **criteria):
+        """find() に一致するファイルの Tr/Te 番号を昇順で返す"""
+        return sorted({e['number'] for e in self.find(**criteria) if e['number'] is not None})
+
+    def values(self, field, **criteria):
+        """find() に一致するファイルの field の値の一覧 (例: catalog.values('participant', condition='Exp8_User'))"""
+        return sorted({e[field] for e in self.find(**criteria) if e[field] is not None})
@@ -0,0 +1,239 @@
+import json
+import os
+
+import numpy as np
+
+from trajcore.loader import LOAD_COLUMNS, POSITION_SLICE, ROTATION_SLICE, TIME_COL, TRIAL_COL
+
+DEFAULT_POSITION_STEP = 1e-3  # 1mm
+DEFAULT_TIME_STEP = 1e-6
+QUATERNION_MODES = ('int16', 'smallest3')
+
+_INT16_MAX = np.iinfo(np.int16).max
+_SMALLEST3_RANGE = 1 / np.sqrt(2)  # 最大の成分を除いた残りの成分は ±1/√2 に収まる
+
+
+def codec_params(position_step=DEFAULT_POSITION_STEP, time_step=DEFAULT_TIME_STEP, quaternion='int16'):
+    """量子化のパラメータ。ストアの索引に保存し、復元のときに使う。"""
+    if quaternion not in QUATERNION_MODES:
+        raise ValueError(f"quaternion は {QUATERNION_MODES} のいずれかを指定してください: {quaternion}")
+    return {'position_step': position_step, 'time_step': time_step, 'quaternion': quaternion}
+
+
+def max_errors(params):
+    """
+    量子化による誤差の上限。
+
+    Returns:
+    --------
+    dict
+        'position' : 座標の各成分の誤差の上限 (m)
+        'time'     : time の誤差の上限 (s)
+        'quaternion' : クォータニオンの (符号を除いた) 各成分の誤差の上限。
+                       smallest3 の場合、復元する最大成分の誤差は他の成分の誤差の数倍になりうる。
+    """
+    if params['quaternion'] == 'int16':
+        quat_error = 0.5 / _INT16_MAX
+    else:
+        quat_error = float(0.5 * _SMALLEST3_RANGE / _INT16_MAX)
+    return {'position': params['position_step'] / 2, 'time': params['time_step'] / 2, 'quaternion': quat_error}
+
+
+def _delta(q, starts):
+    # 記録の先頭は絶対値、それ以外は直前の行との差分にする (整数のオーバーフローは復元時に打ち消し合う)
+    # 行数 0 の記録の先頭は次の記録の先頭か配列の末尾を指すので、末尾のものは除く
+    starts = starts[starts < len(q)]
+    d = np.empty_like(q)
+    d[0] = q[0]
+    d[1:] = q[1:] - q[:-1]
+    d[starts] = q[starts]
+    return d
+
+
+def _undelta(d):
+    return np.cumsum(d, axis=0, dtype=d.dtype)
+
+
+def _quantize_quaternions(quat, mode):
+    if mode == 'int16':
+        return {'quat': np.round(np.clip(quat, -1, 1) * _INT16_MAX).astype(np.int16)}
+
+    # smallest-three: 絶対値が最大の成分を正にして省き、残り 3 成分だけを保存する
+    largest = np.argmax(np.abs(quat), axis=1)
+    rows = np.arange(len(quat))
+    sign = np.where(quat[rows, largest] < 0, -1.0, 1.0)
+    quat = quat * sign[:, None]
+    keep = np.ones(quat.shape, dtype=bool)
+    keep[rows, largest] = False
+    rest = quat[keep].reshape(len(quat), 3)
+    scaled = np.clip(rest / _SMALLEST3_RANGE, -1, 1) * _INT16_MAX
+    return {'quat': np.round(scaled).astype(np.int16), 'quat_largest': largest.astype(np.uint8)}
+
+
+def _dequantize_quaternions(codes, largest, mode, start, stop):
+    quat_codes = _undelta(codes[start:stop]).astype(np.float64)
+    if mode == 'int16':
+        return quat_codes / _INT16_MAX
+
+    rest = quat_codes / _INT16_MAX * _SMALLEST3_RANGE
+    largest = largest[start:stop]
+    n = len(rest)
+    quat = np.empty((n, 4))
+    keep = np.ones((n, 4), dtype=bool)
+    keep[np.arange(n), largest] = False
+    quat[keep] = rest.ravel()
+    quat[np.arange(n), largest] = np.sqrt(np.clip(1 - np.sum(rest ** 2, axis=1), 0, None))
+    return quat
+
+
+def encode(data, starts=(0,), params=None):
+    """
+    LOAD_COLUMNS の順の配列を固定小数点の整数に量子化し、記録ごとに差分符号化する関数。
+
+        Trial      : int16
+        time       : time_step 単位の int32
+        Position   : position_step 単位の int16 (範囲を超える場合は int32)
+        Rotation   : int16 (quaternion='int16') または smallest-three の int16 x 3 と最大成分の番号
+
+    smallest3 では q と -q を同じ回転として扱うため、復元したクォータニオンの符号が元と逆になる行がある。
+    単位クォータニオンを前提とする。
+
+    Parameters:
+    -----------
+    data : ndarray, shape=(N, 9)
+        LOAD_COLUMNS の順の値 (PackedStore.data など)
+    starts : sequence of int, optional
+        各記録の先頭の行。差分はこの行で区切るので、記録ごとに復元できる。
+    params : dict, optional
+        codec_params() の返り値 (default: 1mm, 1us, int16)
+
+    Returns:
+    --------
+    dict of ndarray
+        np.savez_compressed でそのまま保存できる整数配列
+    """
+    if params is None:
+        params = codec_params()
+    data = np.asarray(data, dtype=np.float64)
+    starts = np.asarray(starts, dtype=int)
+    if len(data) == 0:
+        starts = starts[:0]
+
+    trial = np.round(data[:, TRIAL_COL]).astype(np.int16)
+    time = np.round(data[:, TIME_COL] / params['time_step']).astype(np.int32)
+    pos = np.round(data[:, POSITION_SLICE] / params['position_step'])
+    pos_dtype = np.int16 if pos.size == 0 or np.abs(pos).max() <= _INT16_MAX else np.int32
+    pos = pos.astype(pos_dtype)
+
+    codes = {'trial': trial, 'time': time, 'pos': pos}
+    codes.update(_quantize_quaternions(data[:, ROTATION_SLICE], params['quaternion']))
+    if len(data):
+        for name in ('trial', 'time', 'pos', 'quat'):
+            codes[name] = _delta(codes[name], starts)
+    return codes
+
+
+def decode(codes, params, start=0, stop=None):
+    """
+    encode() の結果から start 行目から stop 行目までを復元する。
+    start は記録の先頭 (encode の starts のいずれか) で、start から stop までが 1 つの記録に収まること。
+
+    Returns:
+    --------
+    ndarray, shape=(stop - start, 9), dtype=float64
+        LOAD_COLUMNS の順の値
+    """
+    if stop is None:
+        stop = len(codes['trial'])
+    out = np.empty((stop - start, len(LOAD_COLUMNS)))
+    out[:, TRIAL_COL] = _undelta(codes['trial'][start:stop])
+    out[:, TIME_COL] = _undelta(codes['time'][start:stop]) * params['time_step']
+    out[:, POSITION_SLICE] = _undelta(codes['pos'][start:stop]) * params['position_step']
+    out[:, ROTATION_SLICE] = _dequantize_quaternions(
+        codes['quat'], codes.get('quat_largest'), params['quaternion'], start, stop)
+    return out
+
+
+def load_codes(path):
+    """save_quantized で保存した整数配列をすべてメモリに読み込む"""
+    with np.load(path, allow_pickle=False) as f:
+        return {name: f[name] for name in f.files}
+
+
+def save_quantized(store, out_base, params=None):
+    """
+    PackedStore を量子化して保存する関数。
+
+    出力:
+        {out_base}.npz        : encode() の整数配列 (zlib 圧縮)
+        {out_base}.index.json : 元のストアの索引に量子化のパラメータ ('codec') を加えたもの
+
+    PackedStore(out_base) で元のストアと同じように読み込める。
+
+    Parameters:
+    -----------
+    store : PackedStore
+        量子化するストア (pack_recordings で作った float のストア。量子化済みのストアは ValueError)
+    out_base : str
+        出力ファイル名 (拡張子なし)
+    params : dict, optional
+        codec_params() の返り値
+
+    Returns:
+    --------
+    dict
+        各列の実際の最大誤差 ('position', 'time', 'quaternion')
+    """
+    if store.codec is not None:
+        raise ValueError(f"{store.base} は量子化済みのストアです (codec: {store.codec})。"
+                         f"量子化する前の float のストアを指定してください")
+    if params is None:
+        params = codec_params()
+    data = np.asarray(store.data)
+    starts = [rec['offset'] for rec in store.records]
+    codes = encode(data, starts, params)
+
+    # 実際の誤差を確かめる (smallest3 は符号が反転しうるので q と -q の近い方と比べる)
+    decoded = np.empty((0, len(LOAD_COLUMNS)))
+    if store.records:
+        decoded = np.concatenate([decode(codes, params, rec['offset'], rec['offset'] + rec['length'])
+                                  for rec in store.records])
+    quat, quat_dec = data[:, ROTATION_SLICE], decoded[:, ROTATION_SLICE]
+    quat_error = np.minimum(np.abs(quat - quat_dec).max(axis=1, initial=0),
+                            np.abs(quat + quat_dec).max(axis=1, initial=0))
+    errors = {
+        'position': float(np.abs(data[:, POSITION_SLICE] - decoded[:, POSITION_SLICE]).max(initial=0)),
+        'time': float(np.abs(data[:, TIME_COL] - decoded[:, TIME_COL]).max(initial=0)),
+        'quaternion': float(quat_error.max(initial=0)),
+    }
+
+    index = {'columns': store.columns, 'root': store.root, 'recordings': store.records, 'codec': params}
+    out_dir = os.path.dirname(out_base)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tmp_npz = f'{out_base}.npz.tmp'
+    tmp_index = f'{out_base}.index.json.tmp'
+    with open(tmp_npz, 'wb') as f:
+        np.savez_compressed(f, **codes)
+    with open(tmp_index, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp_npz, f'{out_base}.npz')
+    os.replace(tmp_index, f'{out_base}.index.json')
+
+    size = os.path.getsize(f'{out_base}.npz')
+    print(f"{len(store)} 件の記録を {out_base}.npz に量子化して保存しました "
+          f"({data.nbytes / 1e6:.1f} MB -> {size / 1e6:.1f} MB, 最大誤差: {errors})")
+    return errors
+
+
+if __name__ == "__main__":
+    # 使い方: python -m trajcore.codec Assets/OriginalAssets/File/Ozaki_User Assets/OriginalAssets/File/Ozaki_User_q smallest3
+    import sys
+
+    from trajcore.store import PackedStore
+
+    if len(sys.argv) not in (3, 4):
+        print("usage: python -m trajcore.codec <store_base> <out_base> [int16|smallest3]")
+        sys.exit(1)
+    quaternion = sys.argv[3] if len(sys.argv) == 4 else 'int16'
+    save_quantized(PackedStore(sys.argv[1]), sys.argv[2], codec_params(quaternion=quaternion))
@@ -0,0 +1,205 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from trajcore.keyframes import (DEFAULT_ROTATION_WEIGHT, extract_keyframes, interpolate_positions,
+                                interpolate_quaternions, project_positions, select_keyframes,
+                                slerp_deviation)
+from trajcore.keytrack import make_track, save_track
+from trajcore.loader import (POSITION_COLUMNS, POSITION_SLICE, ROTATION_COLUMNS, ROTATION_SLICE, load_recording,
+                             load_table)
+from trajcore.naming import is_derived_file
+
+# KeyFrame.py のキーフレーム抽出と補間を、フォルダ内の見本全体にまとめて行うもの。
+# 各見本は 1 回だけ読み込み、図は描かずに補間した CSV と要約の表 (キーフレーム数と誤差) だけを書き出す。
+
+POSITION_METHODS = {'linear': interpolate_positions, 'projection': project_positions}
+INITIAL_INTERVAL = 90  # 最初のキーフレームの間隔 (KeyFrame.py の [0, 90, ..., 630, 719] と同じ)
+SUMMARY_COLUMNS = ['Model', 'Frames', 'Keyframes', 'MaxError', 'MeanError', 'MaxRotationDeg']
+SUMMARY_FILE = 'keyframe_summary.csv'
+
+
+def initial_keyframes_for(n_frames, interval=INITIAL_INTERVAL):
+    """0 から interval ごとのフレームと最後のフレーム"""
+    return sorted(set(range(0, n_frames, interval)) | {n_frames - 1})
+
+
+def output_path_for(model_path, out_dir, position_method='linear'):
+    """KeyFrame.py と同じ名前 ({見本}_optimal_pos_{位置の補間}_rot_slerp.csv)"""
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(out_dir, f"{stem}_optimal_pos_{position_method}_rot_slerp.csv")
+
+
+def track_path_for(model_path, out_dir):
+    """キーフレームだけを保存するファイル ({見本}_keyframes.npz, trajcore.keytrack.load_track で読む)"""
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(out_dir, f"{stem}_keyframes.npz")
+
+
+def compress_job(model_path, out_path, threshold=0.05, max_depth=1, budget=None, error_target=None,
+                 rotation_weight=None, position_method='linear', initial_interval=INITIAL_INTERVAL,
+                 track_path=None):
+    """
+    compress_models に渡す見本 1 つ分の指定を作る。
+
+    Parameters:
+    -----------
+    model_path : str
+        見本の CSV
+    out_path : str
+        補間した CSV の保存先
+    threshold, max_depth : optional
+        extract_keyframes の閾値と深さ (KeyFrame.py の __main__ と同じ 0.05, 1 が既定)
+    budget, error_target : optional
+        どちらかを指定すると、threshold, max_depth の代わりに select_keyframes で選ぶ
+    rotation_weight : float, optional
+        指定すると、姿勢のずれも誤差に含めてキーフレームを選ぶ
+    position_method : str
+        'linear' または 'projection'
+    initial_interval : int
+        最初のキーフレームの間隔
+    track_path : str, optional
+        指定すると、キーフレームだけの軌跡 (trajcore.keytrack.KeyframeTrack) もここに保存する
+    """
+    if position_method not in POSITION_METHODS:
+        raise ValueError(f"不明な位置の補間方法です: {position_method} (使えるもの: {sorted(POSITION_METHODS)})")
+    return {'model_path': model_path, 'out_path': out_path, 'threshold': threshold, 'max_depth': max_depth,
+            'budget': budget, 'error_target': error_target, 'rotation_weight': rotation_weight,
+            'position_method': position_method, 'initial_interval': initial_interval,
+            'track_path': track_path}
+
+
+def compress_model(job):
+    """
+    compress_job で作った指定に従って、見本 1 つのキーフレームを選び、補間した CSV を書き出す。
+    ワーカープロセスから呼ばれる。
+
+    Returns:
+    --------
+    dict or None
+        要約の 1 行 (SUMMARY_COLUMNS)。失敗した場合は None。
+        MaxError, MeanError は補間した位置と元の位置の距離、MaxRotationDeg は姿勢のずれの最大値 [度]。
+    """
+    try:
+        # 数値は他の処理と同じく load_recording で読み (区切りの空行は除かれる)、
+        # 書き出す CSV には元の全ての列を残す
+        recording, _ = load_recording(job['model_path'])
+        df = load_table(job['model_path'])
+        positions = recording[:, POSITION_SLICE]
+        quaternions = recording[:, ROTATION_SLICE]
+        n_frames = len(positions)
+        initial = initial_keyframes_for(n_frames, job['initial_interval'])
+        weight = job['rotation_weight']
+        pose = dict(quaternions=quaternions if weight is not None else None,
+                    rotation_weight=weight if weight is not None else DEFAULT_ROTATION_WEIGHT)
+
+        if job['budget'] is not None or job['error_target'] is not None:
+            keyframes, _ = select_keyframes(positions, budget=job['budget'], error_target=job['error_target'],
+                                            initial_keyframes=initial, **pose)
+        else:
+            keyframes = extract_keyframes(positions, initial, threshold=job['threshold'],
+                                          max_depth=job['max_depth'], **pose)
+
+        interpolated_positions = POSITION_METHODS[job['position_method']](positions, keyframes)
+        interpolated_rotations = interpolate_quaternions(quaternions, keyframes)
+
+        df_output = df.copy()
+        df_output[POSITION_COLUMNS] = interpolated_positions
+        df_output[ROTATION_COLUMNS] = interpolated_rotations
+        os.makedirs(os.path.dirname(job['out_path']) or '.', exist_ok=True)
+        tmp_path = f"{job['out_path']}.{os.getpid()}.tmp"
+        df_output.to_csv(tmp_path, index=False, float_format='%.6f')
+        os.replace(tmp_path, job['out_path'])
+        if job['track_path'] is not None:
+            save_track(job['track_path'], make_track(recording, keyframes))
+
+        errors = np.linalg.norm(interpolated_positions - positions, axis=1)
+        max_rotation = max((slerp_deviation(quaternions, s, e).max()
+                            for s, e in zip(keyframes[:-1], keyframes[1:]) if e - s > 1), default=0.0)
+    except Exception as e:
+        print(f"キーフレームの処理に失敗: {job['model_path']} ({e})")
+        return None
+    return {'Model': os.path.splitext(os.path.basename(job['model_path']))[0], 'Frames': n_frames,
+            'Keyframes': len(keyframes), 'MaxError': errors.max(), 'MeanError': errors.mean(),
+            'MaxRotationDeg': np.degrees(max_rotation)}
+
+
+def compress_models(model_dir, out_dir, pattern='*.csv', workers=1, summary_path=None, tracks=False, **params):
+    """
+    model_dir の全ての見本のキーフレームを選んで補間し、out_dir に CSV と要約の表を書き出す。
+
+    Parameters:
+    -----------
+    model_dir : str
+        見本のフォルダ
+    out_dir : str
+        補間した CSV の保存先 (ファイル名は output_path_for)
+    pattern : str, optional
+        見本のファイル名のパターン (default: '*.csv')。
+        見本から作ったファイル (trajcore.naming.DERIVED_PATTERNS と要約の表) は一致しても除く。
+    workers : int, optional
+        並列に処理するプロセス数 (default: 1)
+    summary_path : str, optional
+        要約の表の保存先 (default: out_dir/SUMMARY_FILE)
+    tracks : bool, optional
+        True の場合、キーフレームだけの軌跡も out_dir に保存する (ファイル名は track_path_for)
+    **params
+        compress_job のパラメータ (threshold, max_depth, budget, error_target, rotation_weight,
+        position_method, initial_interval)
+
+    Returns:
+    --------
+    pandas.DataFrame
+        要約の表 (SUMMARY_COLUMNS)
+    """
+    import pandas as pd
+
+    position_method = params.get('position_method', 'linear')
+    if summary_path is None:
+        summary_path = os.path.join(out_dir, SUMMARY_FILE)
+    # 出力先が同じフォルダでも、前回書き出した CSV や要約、平滑化の結果などは見本として扱わない
+    model_paths = [p for p in sorted(glob.glob(os.path.join(model_dir, pattern)))
+                   if not is_derived_file(p, extra_patterns=[os.path.basename(summary_path)])]
+    jobs = [compress_job(p, output_path_for(p, out_dir, position_method),
+                         track_path=track_path_for(p, out_dir) if tracks else None, **params)
+            for p in model_paths]
+    print(f"見本 {len(jobs)} 件のキーフレームを {workers} プロセスで求めます")
+    if workers <= 1 or len(jobs) <= 1:
+        rows = [compress_model(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rows = list(executor.map(compress_model, jobs))
+
+    summary = pd.DataFrame([row for row in rows if row is not None], columns=SUMMARY_COLUMNS)
+    os.makedirs(os.path.dirname(summary_path) or '.', exist_ok=True)
+    summary.to_csv(summary_path, index=False)
+    print(f"{len(summary)} 件の補間結果と要約を {out_dir}, {summary_path} に保存しました")
+    return summary
+
+
+if __name__ == "__main__":
+    # 使い方 (リポジトリのルートで実行):
+    #   PYTHONPATH=Assets/OriginalAssets/Scripts python -m trajcore.compress Assets/OriginalAssets/File/Exp7/Exp7_Model Assets/OriginalAssets/File/Exp7/Exp7_Keyframe --workers 4
+    import argparse
+
+    parser = argparse.ArgumentParser(description="フォルダ内の全ての見本をキーフレームで間引いて補間する")
+    parser.add_argument('model_dir', help="見本のフォルダ")
+    parser.add_argument('out_dir', help="補間した CSV と要約の保存先")
+    parser.add_argument('--pattern', default='*.csv', help="見本のファイル名のパターン")
+    parser.add_argument('--workers', type=int, default=1, help="並列に処理するプロセス数")
+    parser.add_argument('--threshold', type=float, default=0.05, help="キーフレームを追加する距離の閾値")
+    parser.add_argument('--max-depth', type=int, default=1, help="キーフレームを追加する最大の深さ")
+    parser.add_argument('--budget', type=int, default=None, help="キーフレームの数 (指定すると閾値の代わりに使う)")
+    parser.add_argument('--error-target', type=float, default=None, help="最大誤差の目標 (指定すると閾値の代わりに使う)")
+    parser.add_argument('--rotation-weight', type=float, default=None, help="姿勢のずれ [rad] の重み")
+    parser.add_argument('--position-method', default='linear', choices=sorted(POSITION_METHODS),
+                        help="位置の補間方法")
+    parser.add_argument('--tracks', action='store_true', help="キーフレームだけの軌跡 (.npz) も保存する")
+    args = parser.parse_args()
+
+    compress_models(args.model_dir, args.out_dir, pattern=args.pattern, workers=args.workers, tracks=args.tracks,
+                    threshold=args.threshold, max_depth=args.max_depth, budget=args.budget,
+                    error_target=args.error_target, rotation_weight=args.rotation_weight,
+                    position_method=args.position_method)
@@ -0,0 +1,215 @@
+import numpy as np
+
+# Exp8.py / Exp9.py / Exp10.py の sliding-window DTW (dtw_sw) とその補助関数。
+# 実装は同じで、import 時に解析を始めないモジュール (runner など) から使えるようにしたもの。
+
+
+def get_mirror(s, ws):
+    
+    """
+    Performs a signal windowing based on a double inversion from the start and end segments.
+    :param s: (array-like)
+            the input-signal.
+    :param ws: (integer)
+            window size.
+    :return:
+    """
+
+    return np.r_[2 * s[0] - s[ws:0:-1], s, 2 * s[-1] - s[-2:-ws - 2:-1]]
+
+
+def normalize_signal(s):
+    """
+    Normalizes a given signal by subtracting the mean and dividing by the standard deviation.
+    :param s: (array_like)
+            The input signal.
+    :return:
+            The normalized input signal.
+    """
+    return (s - np.mean(s)) / np.std(s)
+
+def sliding_dist(Axw, Ayw, Azw, Bxw, Byw, Bzw, dAxw, dAyw, dAzw, dBxw, dByw, dBzw, a, win):
+    dw = np.sqrt(np.sum(((dAxw - dBxw) * win) ** 2.) + np.sum(((dAyw - dByw) * win) ** 2.) + np.sum(((dAzw - dBzw) * win) ** 2.))
+    w = np.sqrt(np.sum(((Axw - Bxw) * win) ** 2.) + np.sum(((Ayw - Byw) * win) ** 2.) + np.sum(((Azw - Bzw) * win) ** 2.))
+    return (1 - a) * dw + a * w
+
+
+def _traceback(D):
+    i, j = np.array(D.shape) - 2
+    p, q = [i], [j]
+    while (i > 0) or (j > 0):
+        tb = np.argmin((D[i, j], D[i, j + 1], D[i + 1, j]))
+        if tb == 0:
+            i -= 1
+            j -= 1
+        elif tb == 1:
+            i -= 1
+        else:  # (tb == 2):
+            j -= 1
+        p.insert(0, i)
+        q.insert(0, j)
+        
+    return np.array(p), np.array(q)
+
+
+def align_sequences(ref, s, path):
+    """
+    This functions aligns two time-series. The alignment is performed
+    for a given reference signal and a vector containing the alignment.
+    :param ref: (array-like)
+            The reference signal.
+    :param s: (array-like)
+            The signal to be aligned.
+    :param path: (ndarray)
+            A rank 2 array containing the optimal warping path between the two signals.
+    :return:
+    """
+    import scipy.interpolate as it
+    nt = np.linspace(0, len(ref) - 1, len(ref))
+    ns = it.interp1d(path[0], s[path[1]])(nt)
+
+    return ns
+
+
+def dtw_sw(Ax, Ay, Az, Bx, By, Bz, winlen, alpha=0.5, **kwargs):
+    r"""
+    Computes Dynamic Time Warping (DTW) of two time series.
+    :param x: (array_like)
+            The reference signal.
+    :param y: (array_like)
+            The estimated signal.
+    :param winlen: (int)
+            The sliding window length
+    :param alpha: (float)
+            A factor between 0 and 1 which weights the amplitude and derivative contributions.
+            A higher value will favor amplitude and a lower value will favor the first derivative.
+
+    :param \**kwargs:
+        See below:
+
+        * *do_sign_norm* (``bool``) --
+          If ``True`` the signals will be normalized before computing the DTW,
+          (default: ``False``)
+
+        * *do_dist_norm* (``bool``) --
+          If ``True`` the DTW distance will be normalized by dividing the summation of the path dimension.
+          (default: ``True``)
+
+        * *window* (``String``) --
+          Selects the global window constrains. Available options are ``None`` and ``sakoe-chiba``.
+          (default: ``None``)
+
+        * *factor* (``Float``) --
+          Selects the global constrain factor.
+          (default: ``min(xl, yl) * .50``)
+
+
+    :return:
+           d: (float)
+            The SW-DTW distance.
+           C: (array_like)
+            The local cost matrix.
+           ac: (array_like)
+            The accumulated cost matrix.
+           path (array_like)
+            The optimal warping path between the two sequences.
+    """
+    Axl, Bxl = len(Ax), len(Bx)
+
+    do_sign_norm = kwargs.get('normalize', False)
+    do_dist_norm = kwargs.get('dist_norm', True)
+    window = kwargs.get('window', None)
+    factor = kwargs.get('factor', np.min((Axl, Bxl)) * .50)
+
+    if do_sign_norm:
+        Ax, Ay, Az, Bx, By, Bz= normalize_signal(Ax), normalize_signal(Ay), normalize_signal(Az), normalize_signal(Bx), normalize_signal(By), normalize_signal(Bz)
+
+    ac = np.zeros((Axl + 1, Bxl + 1))
+    ac[0, 1:] = np.inf
+    ac[1:, 0] = np.inf
+    tmp_ac = ac[1:, 1:]
+
+    nAx = get_mirror(Ax, winlen)
+    nAy = get_mirror(Ay, winlen)
+    nAz = get_mirror(Az, winlen)
+    nBx = get_mirror(Bx, winlen)
+    nBy = get_mirror(By, winlen)
+    nBz = get_mirror(Bz, winlen)
+
+    dnAx = np.diff(nAx, axis = 0)
+    dnAy = np.diff(nAy, axis = 0)
+    dnAz = np.diff(nAz, axis = 0)
+    dnBx = np.diff(nBx, axis = 0)
+    dnBy = np.diff(nBy, axis = 0)
+    dnBz = np.diff(nBz, axis = 0)
+
+    nAx = nAx[:-1]
+    nAy = nAy[:-1]
+    nAz = nAz[:-1]
+    nBx = nBx[:-1]
+    nBy = nBy[:-1]
+    nBz = nBz[:-1]
+
+    # Workaround to deal with even window sizes
+    if winlen % 2 == 0:
+        winlen -= 1
+
+    swindow = np.hamming(winlen)
+    swindow = swindow / np.sum(swindow)
+
+    for i in range(Axl):
+        for j in range(Bxl):
+            pad_i, pad_j = i + winlen, j + winlen
+            # No window selected
+            if window is None:
+                tmp_ac[i, j] = sliding_dist(nAx[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                        nAy[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                        nAz[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                        nBx[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
+                                        nBy[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
+                                        nBz[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
+                                        dnAx[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                        dnAy[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                        dnAz[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                        dnBx[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
+                                        dnBy[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
+                                        dnBz[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1], alpha, swindow)
+
+            # Sakoe-Chiba band
+            elif window == 'sakoe-chiba':
+                if abs(i - j) < factor:
+                    tmp_ac[i, j] = sliding_dist(nAx[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                            nAy[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                            nAz[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                            nBx[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
+                                            nBy[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
+                                            nBz[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
+                                            dnAx[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                            dnAy[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                            dnAz[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                            dnBx[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
+                                            dnBy[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
+                                            dnBz[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1], alpha, swindow)
+                else:
+                    tmp_ac[i, j] = np.inf
+
+            # As last resource, the complete window is calculated
+            else:
+                tmp_ac[i, j] = sliding_dist(nAx[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                        nBx[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1],
+                                        dnAx[pad_i - (winlen // 2):pad_i + (winlen // 2) + 1],
+                                        dnBx[pad_j - (winlen // 2):pad_j + (winlen // 2) + 1], alpha, swindow)
+    c = tmp_ac.copy()
+
+    for i in range(Axl):
+        for j in range(Bxl):
+            tmp_ac[i, j] += min([ac[i, j], ac[i, j + 1], ac[i + 1, j]]) #ac[i, j] == tmp_ac[i-1, j-1]のため。
+
+    path = _traceback(ac)
+
+    if do_dist_norm:
+        d = ac[-1, -1] / np.sum(np.shape(path))
+    else:
+        d = ac[-1, -1]
+
+    return d, c, ac, path
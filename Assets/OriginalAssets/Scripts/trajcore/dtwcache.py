@@ -0,0 +1,231 @@
+import glob
+import hashlib
+import json
+import os
+import threading
+import types
+import zipfile
+
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.environ.get(
+    'TRAJCORE_DTW_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'trajcore', 'dtw'))
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def _code_fingerprint(code):
+    # 関数の中身が変わったら別のキーになるよう、バイトコードと定数からハッシュを作る
+    h = hashlib.sha1(code.co_code)
+    h.update(repr(code.co_names).encode('utf-8'))
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            h.update(_code_fingerprint(const).encode('utf-8'))
+        else:
+            h.update(repr(const).encode('utf-8'))
+    return h.hexdigest()
+
+
+def dtw_key(dtw_func, arrays, params):
+    """
+    DTW の結果のキャッシュキー。
+    入力配列の中身 (float64 としてのバイト列と shape)、DTW 関数の名前と中身、パラメータから作る。
+
+    Parameters:
+    -----------
+    dtw_func : callable
+        DTW を計算する関数 (例: dtw_sw)
+    arrays : list of array_like
+        DTW 関数に渡す系列 (例: [Ax, Ay, Az, Bx, By, Bz])
+    params : dict
+        DTW 関数に渡すパラメータ (例: {'winlen': 12, 'alpha': 0.5, 'window': 'sakoe-chiba', 'factor': 300})
+
+    Returns:
+    --------
+    str
+        40 文字の16進数
+    """
+    h = hashlib.sha1()
+    h.update(getattr(dtw_func, '__name__', repr(dtw_func)).encode('utf-8'))
+    code = getattr(dtw_func, '__code__', None)
+    if code is not None:
+        h.update(_code_fingerprint(code).encode('utf-8'))
+    for a in arrays:
+        a = np.ascontiguousarray(a, dtype=np.float64)
+        h.update(repr(a.shape).encode('utf-8'))
+        h.update(a.tobytes())
+    h.update(repr(sorted(params.items())).encode('utf-8'))
+    return h.hexdigest()
+
+
+class DTWCache:
+    """
+    DTW の距離・パス・要約統計量を、入力とパラメータのハッシュをキーにしてディスクに保存するクラス。
+
+    同じ見本・テスト・パラメータの組み合わせはスクリプトを実行し直しても計算し直さずに済む。
+    パスは系列の長さに応じて uint16 / int32 で保存する (720 フレーム同士で 1 件あたり数KB)。
+    局所コスト行列と累積コスト行列は大きいため保存しない。
+    合計サイズが max_bytes を超えたら、最後に使われた時刻が古いものから削除する。
+
+    Parameters:
+    -----------
+    cache_dir : str, optional
+        キャッシュの保存先 (default: 環境変数 TRAJCORE_DTW_CACHE_DIR または ~/.cache/trajcore/dtw)
+    max_bytes : int, optional
+        キャッシュの合計サイズの上限 (default: 256MB)
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self._total_bytes = None  # 初回の書き込み時にディレクトリを走査して求める
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.npz')
+
+    def get(self, key):
+        """
+        キャッシュがあれば {'distance', 'path', 'stats'} を返し、なければ None を返す。
+        path は (path0, path1) の int の配列のタプル。
+        """
+        entry = self._entry_path(key)
+        if not os.path.exists(entry):
+            return None
+        try:
+            with np.load(entry, allow_pickle=False) as f:
+                path = f['path'].astype(int)
+                result = {
+                    'distance': float(f['distance']),
+                    'path': (path[0], path[1]),
+                    'stats': json.loads(str(f['stats'])),
+                }
+            os.utime(entry)  # LRU 用に最終使用時刻を更新
+            return result
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            # 壊れたキャッシュ (途中で切れた .npz など) は削除して計算し直す
+            self._remove(entry)
+            return None
+
+    def put(self, key, distance, path, stats=None):
+        """
+        DTW の結果を保存する。
+
+        Parameters:
+        -----------
+        key : str
+            dtw_key() で作ったキー
+        distance : float
+            DTW 距離
+        path : tuple of array_like
+            (path0, path1)
+        stats : dict, optional
+            一緒に保存する要約統計量 (JSON にできる値のみ)
+        """
+        path = np.asarray(path)
+        dtype = np.uint16 if path.size == 0 or path.max() < np.iinfo(np.uint16).max else np.int32
+        stats = dict(stats or {})
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self.entries())
+
+            entry = self._entry_path(key)
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            if os.path.exists(entry):
+                self._remove(entry)
+            tmp = f'{entry}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                with open(tmp, 'wb') as f:
+                    np.savez(f, distance=np.float64(distance), path=path.astype(dtype),
+                             stats=np.array(json.dumps(stats)))
+                os.replace(tmp, entry)
+            except OSError as e:
+                print(f"DTW キャッシュの書き込みに失敗しました: {entry} ({e})")
+                self._remove(tmp)
+                return
+            self._total_bytes += os.path.getsize(entry)
+            if self._total_bytes > self.max_bytes:
+                self.evict()
+
+    def _remove(self, entry):
+        try:
+            size = os.path.getsize(entry)
+            os.remove(entry)
+        except OSError:
+            return
+        if self._total_bytes is not None:
+            self._total_bytes -= size
+
+    def entries(self):
+        """キャッシュファイルの (パス, サイズ, 最終使用時刻) のリスト"""
+        result = []
+        for entry in glob.glob(os.path.join(self.cache_dir, '*', '*.npz')):
+            try:
+                st = os.stat(entry)
+            except OSError:
+                continue
+            result.append((entry, st.st_size, st.st_mtime))
+        return result
+
+    def evict(self):
+        """合計サイズが max_bytes 以下になるまで、最後に使われた時刻が古いキャッシュから削除する"""
+        entries = self.entries()
+        self._total_bytes = sum(size for _, size, _ in entries)
+        if self._total_bytes <= self.max_bytes:
+            return
+        for entry, _, _ in sorted(entries, key=lambda e: e[2]):
+            self._remove(entry)
+            if self._total_bytes <= self.max_bytes:
+                break
+
+    def clear(self):
+        for entry, _, _ in self.entries():
+            self._remove(entry)
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def cached_dtw(dtw_func, Ax, Ay, Az, Bx, By, Bz, winlen, alpha=0.5, cache=None, **kwargs):
+    """
+    dtw_func (dtw_sw と同じ引数と返り値の関数) のキャッシュ付き版。
+
+    同じ入力とパラメータで計算済みならディスクから読み込み、なければ計算して保存する。
+    dtw_func 自体の中身もキーに含めるが、dtw_func から呼ばれる関数 (sliding_dist など) を
+    変更した場合は cache.clear() で古い結果を消すこと。
+
+    Parameters:
+    -----------
+    dtw_func : callable
+        dtw_func(Ax, Ay, Az, Bx, By, Bz, winlen, alpha, **kwargs) -> (d, C, ac, path)
+    cache : DTWCache, optional
+        使うキャッシュ (default: 既定の DTWCache)
+    **kwargs
+        dtw_func にそのまま渡す (window, factor など)
+
+    Returns:
+    --------
+    d : float
+        DTW 距離
+    path : tuple of ndarray
+        (path0, path1)
+    """
+    global _default_cache
+    if cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = DTWCache()
+        cache = _default_cache
+
+    params = dict(kwargs, winlen=winlen, alpha=alpha)
+    key = dtw_key(dtw_func, [Ax, Ay, Az, Bx, By, Bz], params)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached['distance'], cached['path']
+
+    d, _, _, path = dtw_func(Ax, Ay, Az, Bx, By, Bz, winlen, alpha, **kwargs)
+    stats = {'path_length': int(len(path[0])), 'len_a': int(len(Ax)), 'len_b': int(len(Bx))}
+    cache.put(key, d, path, stats)
+    return d, path
@@ -0,0 +1,380 @@
+import heapq
+from collections import namedtuple
+from functools import partial
+
+import numpy as np
+
+# KeyFrame.py のキーフレーム抽出 (Ramer-Douglas-Peucker 法) を配列演算で行うもの。
+
+# 配列演算の距離は np.dot (BLAS) を使う 1 点ずつの計算と最後の桁が違うことがあるので、
+# 最大値からこの幅以内の点だけを 1 点ずつの計算で求め直して、元と同じ点を選ぶ
+_REFINE_TOLERANCE = 1e-9
+
+# 姿勢の誤差 [rad] を位置の誤差 [m] に足すときの重み (1 rad のずれを 10 cm の位置のずれと同じに扱う)
+DEFAULT_ROTATION_WEIGHT = 0.1
+
+
+def distance_point_to_line_segment(point, line_start, line_end):
+    """点から線分への最短距離を計算する"""
+    line_vec = line_end - line_start
+    point_vec = point - line_start
+    line_length = np.linalg.norm(line_vec)
+
+    # 線分の長さがほぼ0の場合は、点から始点への距離を返す
+    if line_length < 1e-6:
+        return np.linalg.norm(point_vec)
+
+    # 射影の割合を計算（線分のパラメータ t）
+    t = np.dot(point_vec, line_vec) / (line_length * line_length)
+    t = max(0, min(1, t))  # tを[0,1]の範囲に制限
+
+    # 射影点を計算
+    projection = line_start + t * line_vec
+
+    # 点から射影点までの距離を返す
+    return np.linalg.norm(point - projection)
+
+
+def segment_distances(positions, start_idx, end_idx):
+    """
+    start_idx と end_idx の間の各点 (start_idx+1 .. end_idx-1) から、両端を結ぶ線分までの最短距離をまとめて求める。
+    distance_point_to_line_segment と同じ計算を区間全体で 1 回の配列演算にしたもの。
+
+    Returns:
+    --------
+    ndarray, shape=(end_idx - start_idx - 1,)
+    """
+    line_start = positions[start_idx]
+    line_end = positions[end_idx]
+    points = positions[start_idx + 1:end_idx]
+    line_vec = line_end - line_start
+    point_vec = points - line_start
+    line_length = np.linalg.norm(line_vec)
+
+    # 線分の長さがほぼ0の場合は、点から始点への距離を返す
+    if line_length < 1e-6:
+        return np.linalg.norm(point_vec, axis=1)
+
+    # 射影の割合 (線分のパラメータ t) を [0, 1] に制限して射影点を求める
+    t = point_vec @ line_vec / (line_length * line_length)
+    t = np.clip(t, 0, 1)
+    projection = line_start + t[:, None] * line_vec
+    return np.linalg.norm(points - projection, axis=1)
+
+
+def find_max_distance_point(positions, start_idx, end_idx):
+    """2つのキーフレーム間で線分から最も遠い点のインデックスと距離 (間に点がなければ None, 0.0)"""
+    if end_idx - start_idx <= 1:  # 間に点がない場合
+        return None, 0.0
+    distances = segment_distances(positions, start_idx, end_idx)
+    # 最大値に近い点だけを、元と同じ 1 点ずつの計算で比べる (同じ距離なら先の点)
+    candidates = np.flatnonzero(distances >= distances.max() - _REFINE_TOLERANCE) + start_idx + 1
+    max_distance = 0.0
+    max_distance_idx = None
+    for i in candidates:
+        distance = distance_point_to_line_segment(positions[i], positions[start_idx], positions[end_idx])
+        if distance > max_distance:
+            max_distance = distance
+            max_distance_idx = int(i)
+    return max_distance_idx, max_distance
+
+
+def slerp_deviation(quaternions, start_idx, end_idx):
+    """
+    start_idx と end_idx の間の各フレーム (start_idx+1 .. end_idx-1) の姿勢が、
+    両端の姿勢を SLERP で補間した姿勢 (interpolate_quaternions と同じ) からずれている角度 [rad]。
+    区間の全フレームをまとめて計算する。
+
+    Parameters:
+    -----------
+    quaternions : ndarray, shape=(N, 4)
+        姿勢 (RotationQX, RotationQY, RotationQZ, RotationQW の順)
+
+    Returns:
+    --------
+    ndarray, shape=(end_idx - start_idx - 1,)
+    """
+    from scipy.spatial.transform import Rotation as R
+    key_rots = R.from_quat(quaternions[[start_idx, end_idx]])
+    # Slerp と同じく、始点からの相対回転の回転ベクトルをフレームの時刻の割合だけ進める
+    rotvec = (key_rots[0].inv() * key_rots[1]).as_rotvec()
+    u = np.arange(1, end_idx - start_idx) / (end_idx - start_idx)
+    interpolated = key_rots[0] * R.from_rotvec(u[:, None] * rotvec)
+    actual = R.from_quat(quaternions[start_idx + 1:end_idx])
+    return (interpolated.inv() * actual).magnitude()
+
+
+def pose_segment_errors(positions, quaternions, start_idx, end_idx, rotation_weight=DEFAULT_ROTATION_WEIGHT):
+    """区間の各フレームの誤差 = 線分からの距離 + rotation_weight * SLERP からの角度のずれ"""
+    return (segment_distances(positions, start_idx, end_idx)
+            + rotation_weight * slerp_deviation(quaternions, start_idx, end_idx))
+
+
+def find_max_pose_error_point(positions, quaternions, start_idx, end_idx, rotation_weight=DEFAULT_ROTATION_WEIGHT):
+    """pose_segment_errors が最大のフレームとその誤差 (間に点がない、または誤差が 0 なら None, 0.0)"""
+    if end_idx - start_idx <= 1:
+        return None, 0.0
+    errors = pose_segment_errors(positions, quaternions, start_idx, end_idx, rotation_weight)
+    i = int(np.argmax(errors))
+    if not errors[i] > 0.0:
+        return None, 0.0
+    return start_idx + 1 + i, float(errors[i])
+
+
+def _max_error_point_func(positions, quaternions, rotation_weight):
+    # 区間 (start_idx, end_idx) -> (最も誤差の大きいフレーム, その誤差)
+    positions = np.asarray(positions, dtype=float)
+    if quaternions is None:
+        return partial(find_max_distance_point, positions)
+    quaternions = np.asarray(quaternions, dtype=float)
+    return lambda start_idx, end_idx: find_max_pose_error_point(positions, quaternions, start_idx, end_idx,
+                                                                rotation_weight)
+
+
+def extract_keyframes(positions, initial_keyframes, threshold=0.1, max_depth=10,
+                      quaternions=None, rotation_weight=DEFAULT_ROTATION_WEIGHT):
+    """
+    キーフレーム間で線分から最も遠い点が threshold より遠ければキーフレームに加えることを、max_depth 回まで繰り返す。
+
+    深さごとに全区間を調べ直しても、分割されなかった区間は次の深さでも分割されないので、
+    ここでは分割してできた区間だけを作業スタックに積んで調べる。各区間の距離は segment_distances で一度に求める。
+
+    Parameters:
+    -----------
+    positions : ndarray, shape=(N, 3)
+        位置
+    initial_keyframes : list of int
+        最初のキーフレーム (昇順)
+    threshold : float
+        線分からの距離がこれより大きい点があれば、その区間を分割する
+    max_depth : int
+        分割を繰り返す最大の深さ
+    quaternions : ndarray, shape=(N, 4), optional
+        指定すると、誤差に姿勢のずれも含める (pose_segment_errors)。threshold もその誤差に対する値になる。
+    rotation_weight : float, optional
+        姿勢のずれ [rad] の重み (default: DEFAULT_ROTATION_WEIGHT)
+
+    Returns:
+    --------
+    list of int
+        キーフレーム (点を追加した場合は昇順)
+    """
+    keyframes = list(initial_keyframes)
+    if max_depth <= 0:
+        return keyframes
+
+    max_error_point = _max_error_point_func(positions, quaternions, rotation_weight)
+    added = []
+    # (区間の始点, 終点, その区間を調べる深さ)
+    stack = [(keyframes[i], keyframes[i + 1], 1) for i in range(len(keyframes) - 1)]
+    while stack:
+        start_idx, end_idx, depth = stack.pop()
+        max_dist_idx, max_distance = max_error_point(start_idx, end_idx)
+        if max_dist_idx is not None and max_distance > threshold:
+            added.append(max_dist_idx)
+            if depth < max_depth:
+                stack.append((start_idx, max_dist_idx, depth + 1))
+                stack.append((max_dist_idx, end_idx, depth + 1))
+
+    if not added:
+        return keyframes
+    return sorted(keyframes + added)
+
+
+# select_keyframes の結果。キーフレームを 1 つずつ増やしたときの誤差の変化 (rate-distortion curve) を表す。
+#   initial : 最初のキーフレーム (昇順)
+#   order   : 追加したフレーム (追加した順)
+#   errors  : errors[j] は order[:j] まで追加したときの最大誤差 (len(order) + 1 個)
+KeyframeCurve = namedtuple('KeyframeCurve', ['initial', 'order', 'errors'])
+
+
+def keyframe_curve(positions, initial_keyframes=None, budget=None, error_target=None,
+                   quaternions=None, rotation_weight=DEFAULT_ROTATION_WEIGHT):
+    """
+    最も誤差の大きい区間を max-heap から取り出して分割することを繰り返し、キーフレームを 1 つずつ増やす。
+    区間の誤差は、その区間の点から両端を結ぶ線分までの距離の最大値 (quaternions を指定した場合は pose_segment_errors の最大値)。
+
+    1 回の実行で、キーフレームの数ごとの誤差 (rate-distortion curve) が全て求まる。
+    分割した 2 区間の距離を計算し、heap に積むだけなので、k 個追加するのに O(n log k) 程度で済む。
+
+    Parameters:
+    -----------
+    positions : ndarray, shape=(N, 3)
+        位置
+    initial_keyframes : list of int, optional
+        最初のキーフレーム (default: [0, N-1])
+    budget : int, optional
+        キーフレームの数 (最初のキーフレームを含む) がこれに達したら止める
+    error_target : float, optional
+        最大誤差がこれ以下になったら止める
+        (budget と error_target を両方省略すると、誤差が 0 になるまで続ける)
+    quaternions, rotation_weight : optional
+        extract_keyframes と同じ (姿勢のずれも誤差に含める)
+
+    Returns:
+    --------
+    KeyframeCurve
+    """
+    max_error_point = _max_error_point_func(positions, quaternions, rotation_weight)
+    if initial_keyframes is None:
+        initial_keyframes = [0, len(positions) - 1]
+    initial = sorted(set(int(i) for i in initial_keyframes))
+
+    heap = []
+
+    def push(start_idx, end_idx):
+        idx, error = max_error_point(start_idx, end_idx)
+        if idx is not None:
+            heapq.heappush(heap, (-error, start_idx, end_idx, idx))
+
+    for start_idx, end_idx in zip(initial[:-1], initial[1:]):
+        push(start_idx, end_idx)
+
+    order = []
+    errors = [-heap[0][0] if heap else 0.0]
+    while heap:
+        if budget is not None and len(initial) + len(order) >= budget:
+            break
+        if error_target is not None and errors[-1] <= error_target:
+            break
+        _, start_idx, end_idx, idx = heapq.heappop(heap)
+        order.append(idx)
+        push(start_idx, idx)
+        push(idx, end_idx)
+        errors.append(-heap[0][0] if heap else 0.0)
+    return KeyframeCurve(initial, order, np.array(errors))
+
+
+def keyframes_at(curve, budget):
+    """keyframe_curve の結果から、キーフレームを budget 個にしたときのキーフレーム (昇順) と最大誤差を返す"""
+    n_added = min(max(budget - len(curve.initial), 0), len(curve.order))
+    return sorted(curve.initial + curve.order[:n_added]), float(curve.errors[n_added])
+
+
+def select_keyframes(positions, budget=None, error_target=None, initial_keyframes=None,
+                     quaternions=None, rotation_weight=DEFAULT_ROTATION_WEIGHT):
+    """
+    キーフレームの数 (budget) または最大誤差 (error_target) を指定してキーフレームを選ぶ。
+    両方指定した場合は、先にどちらかを満たしたところで止める。
+    quaternions を指定すると、姿勢のずれも誤差に含める (extract_keyframes と同じ)。
+
+    Returns:
+    --------
+    (keyframes, error)
+        キーフレーム (昇順) とそのときの最大誤差
+    """
+    if budget is None and error_target is None:
+        raise ValueError("budget か error_target のどちらかを指定してください")
+    curve = keyframe_curve(positions, initial_keyframes, budget=budget, error_target=error_target,
+                           quaternions=quaternions, rotation_weight=rotation_weight)
+    return keyframes_at(curve, len(curve.initial) + len(curve.order))
+
+
+def _frame_segments(keyframe_indices):
+    # キーフレームの範囲内の各フレームについて (フレーム, 区間の番号, 区間の始点からのフレーム数, 区間のフレーム数)。
+    # キーフレーム上のフレームは、そこから始まる区間に入れる (最後のキーフレームだけは最後の区間の終点)。
+    keys = np.asarray(keyframe_indices)
+    frames = np.arange(keys[0], keys[-1] + 1)
+    seg = np.minimum(np.searchsorted(keys, frames, side='right') - 1, len(keys) - 2)
+    return frames, seg, frames - keys[seg], keys[seg + 1] - keys[seg]
+
+
+def interpolate_positions(positions, keyframe_indices):
+    """
+    キーフレームの位置を線形補間して全フレームの位置を求める。
+    区間ごとに、区間の割合 t を np.linspace(0, 1, n + 1) と同じ計算で求め、A + t * (B - A) とする。
+
+    Parameters:
+    -----------
+    positions : ndarray, shape=(N, 3)
+        位置
+    keyframe_indices : list of int
+        キーフレーム (重複なしの昇順、2 個以上)
+
+    Returns:
+    --------
+    ndarray, shape=(N, 3)
+        最初のキーフレームより前と最後のキーフレームより後は 0
+    """
+    positions = np.asarray(positions, dtype=float)
+    out = np.zeros_like(positions)
+    if len(keyframe_indices) < 2:
+        return out
+    frames, seg, offset, length = _frame_segments(keyframe_indices)
+    keys = np.asarray(keyframe_indices)
+    A = positions[keys[seg]]
+    B = positions[keys[seg + 1]]
+    # np.linspace(0, 1, n + 1) は j * (1 / n) で、最後だけ 1.0
+    t = np.where(offset == length, 1.0, offset * (1.0 / length))
+    out[frames] = A + t[:, None] * (B - A)
+    return out
+
+
+def project_positions(positions, keyframe_indices):
+    """
+    各フレームの元の位置を、そのフレームが入るキーフレーム区間の線分に射影した位置を求める。
+    フレームの時刻はそのままで、位置だけが線分上に乗る (線分上をどの速さで進むかは元の動きに従う)。
+    射影の計算は distance_point_to_line_segment と同じ (t を [0, 1] に制限し、線分がほぼ長さ 0 なら始点)。
+
+    Parameters:
+    -----------
+    positions : ndarray, shape=(N, 3)
+        位置
+    keyframe_indices : list of int
+        キーフレーム (重複なしの昇順、2 個以上)
+
+    Returns:
+    --------
+    ndarray, shape=(N, 3)
+        最初のキーフレームより前と最後のキーフレームより後は 0
+    """
+    positions = np.asarray(positions, dtype=float)
+    out = np.zeros_like(positions)
+    if len(keyframe_indices) < 2:
+        return out
+    frames, seg, _, _ = _frame_segments(keyframe_indices)
+    keys = np.asarray(keyframe_indices)
+    A = positions[keys[seg]]
+    B = positions[keys[seg + 1]]
+    line_vec = B - A
+    line_length_sq = np.einsum('ij,ij->i', line_vec, line_vec)
+    # 線分がほぼ長さ 0 の区間は始点に置く (0 除算を避けるため分母は 1 にしておく)
+    degenerate = line_length_sq < 1e-12
+    t = np.einsum('ij,ij->i', positions[frames] - A, line_vec) / np.where(degenerate, 1.0, line_length_sq)
+    t = np.where(degenerate, 0.0, np.clip(t, 0, 1))
+    out[frames] = A + t[:, None] * line_vec
+    # キーフレーム上のフレームはキーフレームの位置そのものにする
+    out[keys] = positions[keys]
+    return out
+
+
+def interpolate_quaternions(quaternions, keyframe_indices):
+    """
+    キーフレームの姿勢を SLERP で補間して全フレームの姿勢を求める。
+    区間ごとに scipy の Slerp で補間したものと同じ値になる
+    (区間の始点の姿勢に、相対回転の回転ベクトルを割合だけ進めたものを掛ける)。
+    全区間の全フレームを 1 回の Rotation の演算で求める。
+
+    Parameters:
+    -----------
+    quaternions : ndarray, shape=(N, 4)
+        姿勢 (RotationQX, RotationQY, RotationQZ, RotationQW の順)
+    keyframe_indices : list of int
+        キーフレーム (重複なしの昇順、2 個以上)
+
+    Returns:
+    --------
+    ndarray, shape=(N, 4)
+        最初のキーフレームより前と最後のキーフレームより後は 0
+    """
+    from scipy.spatial.transform import Rotation as R
+    quaternions = np.asarray(quaternions, dtype=float)
+    out = np.zeros_like(quaternions)
+    if len(keyframe_indices) < 2:
+        return out
+    frames, seg, offset, length = _frame_segments(keyframe_indices)
+    key_rots = R.from_quat(quaternions[np.asarray(keyframe_indices)])
+    rotvecs = (key_rots[:-1].inv() * key_rots[1:]).as_rotvec()
+    alpha = offset / length
+    out[frames] = (key_rots[seg] * R.from_rotvec(rotvecs[seg] * alpha[:, None])).as_quat()
+    return out
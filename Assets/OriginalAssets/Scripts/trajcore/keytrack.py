@@ -0,0 +1,139 @@
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from trajcore.loader import LOAD_COLUMNS, POSITION_SLICE, ROTATION_SLICE, TIME_COL, TRIAL_COL
+
+# キーフレームだけで軌跡を表す形式と、その任意のフレームでの評価。
+# 補間した 720 行の CSV (*_pos_linear_rot_slerp.csv) の代わりにキーフレームの値だけを保存し、
+# 使うときに必要なフレームだけを二分探索と線形補間 / SLERP で求める (1 フレームあたり O(log k))。
+
+# キーフレームで表した軌跡
+#   frames      : キーフレームのフレーム番号 (重複なしの昇順, shape=(k,))
+#   times       : キーフレームの time (shape=(k,))
+#   positions   : キーフレームの位置 (shape=(k, 3))
+#   quaternions : キーフレームの姿勢 (RotationQX, RotationQY, RotationQZ, RotationQW の順, shape=(k, 4))
+#   n_frames    : 元の軌跡のフレーム数
+#   trial       : Trial 列の値
+KeyframeTrack = namedtuple('KeyframeTrack', ['frames', 'times', 'positions', 'quaternions', 'n_frames', 'trial'])
+
+
+def make_track(recording, keyframes):
+    """
+    読み込んだ軌跡 (LOAD_COLUMNS の順の配列) のキーフレームの値から KeyframeTrack を作る。
+
+    Parameters:
+    -----------
+    recording : ndarray, shape=(N, len(LOAD_COLUMNS))
+        trajcore.loader.load_recording などで読み込んだ 1 trial 分の配列
+    keyframes : list of int
+        キーフレーム (範囲外は最後のフレームにし、重複を除いて昇順にする)
+    """
+    recording = np.asarray(recording, dtype=float)
+    n_frames = len(recording)
+    frames = np.unique(np.minimum(np.asarray(keyframes, dtype=int), n_frames - 1))
+    if len(frames) < 2:
+        raise ValueError("キーフレームは 2 つ以上必要です")
+    rows = recording[frames]
+    return KeyframeTrack(frames, rows[:, TIME_COL], rows[:, POSITION_SLICE], rows[:, ROTATION_SLICE],
+                         n_frames, float(recording[0, TRIAL_COL]))
+
+
+def _locate(track, frames):
+    # 各フレームが入るキーフレーム区間 (キーフレーム上のフレームはそこから始まる区間、最後のキーフレームだけは最後の区間)
+    frames = np.clip(np.asarray(frames, dtype=float), track.frames[0], track.frames[-1])
+    seg = np.minimum(np.searchsorted(track.frames, frames, side='right') - 1, len(track.frames) - 2)
+    start = track.frames[seg]
+    length = track.frames[seg + 1] - start
+    return frames, seg, frames - start, length
+
+
+def evaluate(track, frames):
+    """
+    任意のフレーム (小数でもよい) での位置と姿勢を求める。
+    キーフレームの範囲外のフレームは最初 / 最後のキーフレームの値になる。
+
+    整数のフレームでは trajcore.keyframes.interpolate_positions / interpolate_quaternions
+    (KeyFrame.py の apply_keyframe_interpolation) と同じ値になる。
+
+    Parameters:
+    -----------
+    track : KeyframeTrack
+    frames : array_like, shape=(M,)
+        評価するフレーム
+
+    Returns:
+    --------
+    positions : ndarray, shape=(M, 3)
+    quaternions : ndarray, shape=(M, 4)
+    """
+    from scipy.spatial.transform import Rotation as R
+
+    frames, seg, offset, length = _locate(track, frames)
+    A = track.positions[seg]
+    B = track.positions[seg + 1]
+    # interpolate_positions と同じく、区間の割合を np.linspace(0, 1, n + 1) と同じ計算で求める
+    t = np.where(offset == length, 1.0, offset * (1.0 / length))
+    positions = A + t[:, None] * (B - A)
+
+    key_rots = R.from_quat(track.quaternions)
+    rotvecs = (key_rots[:-1].inv() * key_rots[1:]).as_rotvec()
+    alpha = offset / length
+    quaternions = (key_rots[seg] * R.from_rotvec(rotvecs[seg] * alpha[:, None])).as_quat()
+    return positions, quaternions
+
+
+def evaluate_times(track, frames):
+    """任意のフレームでの time (キーフレームの time を線形補間する)"""
+    frames, seg, offset, length = _locate(track, frames)
+    t = offset / length
+    return track.times[seg] + t * (track.times[seg + 1] - track.times[seg])
+
+
+def to_recording(track, frames=None):
+    """
+    KeyframeTrack を LOAD_COLUMNS の順の配列に戻す (スコア関数にそのまま渡せる)。
+
+    Parameters:
+    -----------
+    frames : array_like, optional
+        評価するフレーム (default: キーフレームの範囲の全フレーム)
+
+    Returns:
+    --------
+    ndarray, shape=(M, len(LOAD_COLUMNS))
+    """
+    if frames is None:
+        frames = np.arange(track.frames[0], track.frames[-1] + 1)
+    positions, quaternions = evaluate(track, frames)
+    out = np.empty((len(positions), len(LOAD_COLUMNS)))
+    out[:, TRIAL_COL] = track.trial
+    out[:, TIME_COL] = evaluate_times(track, frames)
+    out[:, POSITION_SLICE] = positions
+    out[:, ROTATION_SLICE] = quaternions
+    return out
+
+
+def resample_track(track, length):
+    """キーフレームの範囲を length フレームに等間隔に取り直した配列 (LOAD_COLUMNS の順)"""
+    return to_recording(track, np.linspace(track.frames[0], track.frames[-1], length))
+
+
+def save_track(path, track):
+    """KeyframeTrack を .npz に保存する (書き終えてから置き換える)"""
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, frames=track.frames.astype(np.int32), times=track.times, positions=track.positions,
+                 quaternions=track.quaternions, n_frames=track.n_frames, trial=track.trial)
+    os.replace(tmp_path, path)
+
+
+def load_track(path):
+    """save_track で保存した KeyframeTrack を読み込む"""
+    with np.load(path, allow_pickle=False) as f:
+        return KeyframeTrack(f['frames'].astype(int), f['times'], f['positions'], f['quaternions'],
+                             int(f['n_frames']), float(f['trial']))
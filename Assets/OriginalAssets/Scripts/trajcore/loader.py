@@ -0,0 +1,249 @@
+import numpy as np
+
+# FileOperation.cs が書き出す列のうち、解析で使う列
+LOAD_COLUMNS = ['Trial', 'time',
+                'PositionX', 'PositionY', 'PositionZ',
+                'RotationQX', 'RotationQY', 'RotationQZ', 'RotationQW']
+TRIAL_COL = 0
+TIME_COL = 1
+POSITION_SLICE = slice(2, 5)
+ROTATION_SLICE = slice(5, 9)
+POSITION_COLUMNS = LOAD_COLUMNS[POSITION_SLICE]
+ROTATION_COLUMNS = LOAD_COLUMNS[ROTATION_SLICE]
+
+# 各スコア関数が使う列 (Exp*.py / trajcore の関数名)
+METRIC_COLUMNS = {
+    'calc_euclidean_score': POSITION_COLUMNS,
+    'calc_dtw_euclidean_score': POSITION_COLUMNS,
+    'calc_dtw_quaternion_score': POSITION_COLUMNS + ROTATION_COLUMNS,
+    'get_dtw_path_length_with_resized_test': POSITION_COLUMNS,
+    'get_length_of_array': POSITION_COLUMNS,
+    'calculate_position_euclidean_distance': POSITION_COLUMNS,
+    'calculate_vector_dot_product': POSITION_COLUMNS,
+    'segment_vector_cosines': POSITION_COLUMNS,
+}
+
+
+def columns_for_metrics(metrics):
+    """
+    使うスコア関数 (関数そのもの、または関数名) のリストから、読み込む必要のある列を求める。
+
+    Returns:
+    --------
+    list of str
+        LOAD_COLUMNS の順に並べた列名
+    """
+    needed = set()
+    for metric in metrics:
+        name = metric if isinstance(metric, str) else metric.__name__
+        if name not in METRIC_COLUMNS:
+            raise ValueError(f"列の対応が登録されていないスコア関数です: {name}")
+        needed.update(METRIC_COLUMNS[name])
+    return [col for col in LOAD_COLUMNS if col in needed]
+
+
+def column_selector(columns, available=LOAD_COLUMNS):
+    """
+    available の列から columns を取り出すためのインデックスを返す。
+    列が連続していれば slice を返すので、取り出した配列はコピーではなくビューになる。
+    """
+    idx = [available.index(col) for col in columns]
+    if idx == list(range(idx[0], idx[0] + len(idx))):
+        return slice(idx[0], idx[0] + len(idx))
+    return idx
+
+
+def _column_indices(header, columns):
+    """ヘッダー行から読み込む列の位置を求める"""
+    names = [name.strip() for name in header.split(',')]
+    try:
+        return [names.index(col) for col in columns]
+    except ValueError as e:
+        raise ValueError(f"必要な列がヘッダーにありません: {e}") from None
+
+
+def _data_lines(lines):
+    """空行と、trial の区切りとして書かれる ',,,,' だけの行を取り除く"""
+    return [line for line in lines if line and line[0] != ',']
+
+
+def find_trial_starts(trial, time):
+    """
+    Trial 列が変わった行、または time が巻き戻った行を trial の開始とみなし、その行番号を返す。
+
+    Returns:
+    --------
+    ndarray of int
+        各 trial の先頭行のインデックス (先頭の 0 を含む)
+    """
+    if len(trial) == 0:
+        return np.zeros(0, dtype=int)
+    changed = (np.diff(trial) != 0) | (np.diff(time) < 0)
+    return np.concatenate([[0], np.flatnonzero(changed) + 1])
+
+
+def load_recording(path, columns=None):
+    """
+    Unity (FileOperation.cs) が記録した軌跡 CSV を読み込む関数。
+
+    BOM 付きの UTF-8、末尾の空列 (',,,0.21' など)、trial 間の空行に対応し、
+    Trial, time と位置・姿勢の 7 列だけを float 配列として読み込む。
+    DataFrame は作らない。
+
+    Parameters:
+    -----------
+    path : str
+        CSV ファイルのパス
+    columns : list of str, optional
+        読み込む列 (default: LOAD_COLUMNS)。columns_for_metrics で求めた列を渡すと、
+        それ以外の列は数値に変換しない。trial 境界の検出のため Trial と time は常に読む。
+
+    Returns:
+    --------
+    data : ndarray, shape=(N, len(columns))
+        columns の順の値。空行は取り除かれ、行番号は有効な行だけで数える。
+    trial_starts : ndarray of int
+        各 trial の先頭行のインデックス
+    """
+    if columns is None:
+        columns = LOAD_COLUMNS
+    parse_columns = _parse_columns(columns)
+
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        lines = f.read().splitlines()
+
+    if not lines:
+        raise ValueError(f"空のファイルです: {path}")
+
+    usecols = _column_indices(lines[0], parse_columns)
+    body = _data_lines(lines[1:])
+    if not body:
+        return np.empty((0, len(columns))), np.zeros(0, dtype=int)
+
+    data = _parse_lines(body, usecols, path)
+    trial_starts = find_trial_starts(data[:, 0], data[:, 1])
+    return _project(data, columns, parse_columns), trial_starts
+
+
+def _parse_columns(columns):
+    """trial 境界の検出のため、Trial と time を先頭に加えた読み込み列"""
+    return ['Trial', 'time'] + [col for col in columns if col not in ('Trial', 'time')]
+
+
+def _parse_lines(lines, usecols, path):
+    try:
+        return np.loadtxt(lines, delimiter=',', usecols=usecols, dtype=np.float64, ndmin=2)
+    except ValueError as e:
+        raise ValueError(f"{path} の読み込みに失敗しました: {e}") from None
+
+
+def _project(data, columns, parse_columns):
+    if list(columns) != parse_columns:
+        return data[:, column_selector(columns, parse_columns)]
+    return data
+
+
+def iter_trials(path, columns=None, chunk_bytes=1 << 16):
+    """
+    複数の trial を含む記録ファイルを少しずつ読み込み、trial を 1 つずつ返すジェネレータ。
+
+    trial の区切りは load_recording と同じく、Trial 列が変わった行または time が巻き戻った行。
+    1 つの trial を読み終えた時点でその trial を返すので、ファイル全体の読み込みを待たずに
+    スコアの計算を始められ、メモリに載るのは常に 1 trial 分だけになる。
+
+    Parameters:
+    -----------
+    path : str
+        CSV ファイルのパス
+    columns : list of str, optional
+        読み込む列 (default: LOAD_COLUMNS)
+    chunk_bytes : int, optional
+        1 回に読み込む大きさの目安 (default: 64KB)
+
+    Yields:
+    -------
+    ndarray, shape=(N_trial, len(columns))
+        1 trial 分の値。split_trials(*load_recording(path, columns)) の各要素と同じ。
+    """
+    if columns is None:
+        columns = LOAD_COLUMNS
+    parse_columns = _parse_columns(columns)
+
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        header = f.readline().rstrip('\r\n')
+        if not header:
+            raise ValueError(f"空のファイルです: {path}")
+        usecols = _column_indices(header, parse_columns)
+        trial_idx, time_idx = usecols[0], usecols[1]
+        maxsplit = max(trial_idx, time_idx) + 1
+
+        buffer = []
+        prev_trial = prev_time = None
+        while True:
+            chunk = f.readlines(chunk_bytes)
+            if not chunk:
+                break
+            for line in chunk:
+                line = line.rstrip('\r\n')
+                if not line or line[0] == ',':
+                    continue
+                fields = line.split(',', maxsplit)
+                trial, time = float(fields[trial_idx]), float(fields[time_idx])
+                if buffer and (trial != prev_trial or time < prev_time):
+                    yield _project(_parse_lines(buffer, usecols, path), columns, parse_columns)
+                    buffer = []
+                buffer.append(line)
+                prev_trial, prev_time = trial, time
+
+        if buffer:
+            yield _project(_parse_lines(buffer, usecols, path), columns, parse_columns)
+
+
+def load_frame(path, columns=None):
+    """
+    load_recording で読み込んだ列だけの DataFrame を返す関数。
+    df['PositionX'] のように列名で扱う既存のスコア関数に渡すときに使う。
+    """
+    import pandas as pd
+
+    if columns is None:
+        columns = LOAD_COLUMNS
+    data, _ = load_recording(path, columns)
+    return pd.DataFrame(data, columns=list(columns))
+
+
+def load_table(path):
+    """
+    全ての列 (frameDiff など解析で使わない列も) を DataFrame で読み込む関数。
+    補間や平滑化した値を書き戻して、元と同じ列の CSV を保存するときに使う。
+    load_recording と同じく BOM, 空行, trial の区切りの行を取り除くので、行は load_recording と一致する。
+    """
+    import io
+
+    import pandas as pd
+
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        lines = f.read().splitlines()
+    if not lines:
+        raise ValueError(f"空のファイルです: {path}")
+    return pd.read_csv(io.StringIO('\n'.join([lines[0]] + _data_lines(lines[1:]))))
+
+
+def expand_columns(data, columns):
+    """
+    columns の順に読み込んだ配列を LOAD_COLUMNS の順の配列にする (読み込んでいない列は NaN)。
+    columns_for_metrics の列だけを読み込んで trajcore.metrics のスコア関数に渡すときに使う。
+    """
+    data = np.asarray(data, dtype=float)
+    if list(columns) == LOAD_COLUMNS:
+        return data
+    out = np.full((len(data), len(LOAD_COLUMNS)), np.nan)
+    out[:, [LOAD_COLUMNS.index(col) for col in columns]] = data
+    return out
+
+
+def split_trials(data, trial_starts):
+    """load_recording の結果を trial ごとの配列 (コピーではなくビュー) のリストに分ける"""
+    if len(data) == 0:
+        return []
+    return np.split(data, trial_starts[1:])
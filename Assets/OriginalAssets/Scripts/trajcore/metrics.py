@@ -0,0 +1,133 @@
+from collections import namedtuple
+
+import numpy as np
+
+from trajcore.dtw import dtw_sw
+from trajcore.dtwcache import cached_dtw
+from trajcore.loader import POSITION_SLICE, ROTATION_SLICE
+from trajcore.resample import resize_to_720
+
+DEFAULT_DTW_PARAMS = {'winlen': 12, 'alpha': 0.5}
+
+# Exp*.py のスコア関数を、読み込んだ配列 (LOAD_COLUMNS の順) と DTW パスから計算できるようにしたもの。
+# DTW を使うスコアは自分では DTW を計算せず、runner が整列 (alignment) ごとに 1 回だけ求めたパスを受け取る。
+#   func      : func(model, test, path) -> float
+#   alignment : None (DTW を使わない), 'position' (座標で DTW), 'position_resized' (テストを720フレームにしてから DTW)
+#   dtw       : 元のスクリプトで指定していた DTW のパラメータ (DEFAULT_DTW_PARAMS を上書きする)
+Metric = namedtuple('Metric', ['func', 'alignment', 'dtw'])
+
+
+def euclidean_score(model, test, path=None):
+    """同じフレーム同士の座標のユークリッド距離の平均 (テストは720フレームにリサイズ)。Exp10 の calc_euclidean_score。"""
+    model_arr = model[:, POSITION_SLICE]
+    test_arr = resize_to_720(test[:, POSITION_SLICE])
+    min_len = min(len(model_arr), len(test_arr))
+    if min_len == 0:
+        return np.nan
+    dists = np.linalg.norm(model_arr[:min_len] - test_arr[:min_len], axis=1)
+    return np.mean(dists)
+
+
+def dtw_euclidean_score(model, test, path):
+    """DTW パスに沿った座標のユークリッド距離の平均。calc_dtw_euclidean_score。"""
+    path0, path1 = path
+    dists = np.linalg.norm(model[path0, POSITION_SLICE] - test[path1, POSITION_SLICE], axis=1)
+    return np.mean(dists)
+
+
+def dtw_quaternion_score(model, test, path):
+    """DTW パスに沿ったクォータニオンの内積の絶対値の平均。calc_dtw_quaternion_score。"""
+    path0, path1 = path
+    if len(path0) == 0:
+        return np.nan
+    dots = np.abs(np.sum(model[path0, ROTATION_SLICE] * test[path1, ROTATION_SLICE], axis=1))
+    return np.mean(dots)
+
+
+def dtw_path_length(model, test, path):
+    """DTW パスの長さ。get_dtw_path_length_with_resized_test。"""
+    return len(path[0])
+
+
+def array_length(model, test, path=None):
+    """テストの行数。get_length_of_array。"""
+    return test.shape[0]
+
+
+# 名前は Exp*.py の関数名と trajcore.loader.METRIC_COLUMNS に合わせる
+METRICS = {
+    'calc_euclidean_score': Metric(euclidean_score, None, {}),
+    'calc_dtw_euclidean_score': Metric(dtw_euclidean_score, 'position', {}),
+    'calc_dtw_quaternion_score': Metric(dtw_quaternion_score, 'position', {'window': 'sakoe-chiba', 'factor': 300}),
+    'get_dtw_path_length_with_resized_test': Metric(dtw_path_length, 'position_resized', {}),
+    'get_length_of_array': Metric(array_length, None, {}),
+}
+
+
+def get_metric(name):
+    try:
+        return METRICS[name]
+    except KeyError:
+        raise ValueError(f"不明なスコア関数です: {name} (使えるもの: {sorted(METRICS)})") from None
+
+
+def dtw_params(name, *overrides):
+    """スコア関数 name の DTW パラメータ (DEFAULT_DTW_PARAMS, スコア関数の既定, overrides の順に上書きする)"""
+    params = dict(DEFAULT_DTW_PARAMS, **get_metric(name).dtw)
+    for override in overrides:
+        params.update(override)
+    return params
+
+
+def align(model, test, alignment, dtw_params, cache=None):
+    """
+    model と test の DTW パスを求める (結果は trajcore.dtwcache にキャッシュされる)。
+
+    Parameters:
+    -----------
+    model, test : ndarray
+        LOAD_COLUMNS の順の配列
+    alignment : str
+        'position' または 'position_resized'
+    dtw_params : dict
+        winlen, alpha と dtw_sw のキーワード引数 (window, factor など)
+
+    Returns:
+    --------
+    (path0, path1)
+    """
+    model_pos = np.asarray(model[:, POSITION_SLICE])
+    test_pos = np.asarray(test[:, POSITION_SLICE])
+    if alignment == 'position_resized':
+        test_pos = resize_to_720(test_pos)
+    elif alignment != 'position':
+        raise ValueError(f"不明な整列方法です: {alignment}")
+
+    params = dict(dtw_params)
+    winlen = params.pop('winlen')
+    alpha = params.pop('alpha')
+    Ax, Ay, Az = model_pos[:, 0], model_pos[:, 1], model_pos[:, 2]
+    Bx, By, Bz = test_pos[:, 0], test_pos[:, 1], test_pos[:, 2]
+    _, path = cached_dtw(dtw_sw, Ax, Ay, Az, Bx, By, Bz, winlen, alpha, cache=cache, **params)
+    return path
+
+
+def compute_score(name, model, test, dtw=None, cache=None):
+    """
+    1 組の見本とテストのスコアを 1 つ計算する (runner を使わずに Exp*.py から呼ぶとき用)。
+
+    Parameters:
+    -----------
+    name : str
+        METRICS の名前
+    model, test : ndarray
+        LOAD_COLUMNS の順の配列 (trajcore.loader.expand_columns で作ったものでもよい)
+    dtw : dict, optional
+        このスコアの DTW パラメータを上書きする (例: {'window': 'sakoe-chiba', 'factor': 300})
+    """
+    metric = get_metric(name)
+    path = None
+    if metric.alignment is not None:
+        path = align(model, test, metric.alignment, dtw_params(name, dtw or {}), cache=cache)
+    return metric.func(model, test, path)
+
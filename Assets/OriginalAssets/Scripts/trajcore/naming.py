@@ -0,0 +1,73 @@
+import fnmatch
+import os
+import re
+
+# '1-3pp_Te13', 'dtfk_Tr1', '_Te3', 'Auto1_Te1', 'te1', 'tr1kirokumisu' など
+_TRIAL_FILE_RE = re.compile(r'^(?:(?P<name>.*)_)?(?P<kind>[Tt][Rr]|[Tt][Ee])(?P<num>\d+)(?P<suffix>\D.*)?$')
+
+# 見本のフォルダに書き出される、見本から作ったファイル (見本として読み込まない)
+DERIVED_PATTERNS = (
+    '*_rot_slerp.csv',        # KeyFrame.py / trajcore.compress の補間結果
+    'keyframe_summary.csv',   # trajcore.compress の要約
+    'keyframe*.csv',          # Exp1_Model のキーフレーム補間の結果
+    '*_sigma*.csv',           # trajcore.smoothing.smooth_files の平滑化結果
+    'smoothing*.csv',         # B-sprine.py の平滑化結果
+    'bspline*.csv',           # B-sprine.py の B-スプライン近似の結果
+)
+
+
+def is_derived_file(path, extra_patterns=()):
+    """見本から作ったファイル (DERIVED_PATTERNS または extra_patterns にファイル名が一致する) かどうか"""
+    name = os.path.basename(path)
+    return any(fnmatch.fnmatch(name, pattern) for pattern in (*DERIVED_PATTERNS, *extra_patterns))
+
+
+def parse_recording_name(path, root=None):
+    """
+    File/ 以下の記録ファイルのパスから、条件・参加者・Tr/Te・番号を取り出す関数。
+
+    対応している命名規則:
+        Ozaki/User/1-3pp_Te13.csv   -> participant='1-3pp', kind='Te', number=13
+        Demo/dtfk_Tr1.csv           -> participant='dtfk',  kind='Tr', number=1
+        Exp7/Exp7_6/_Te3.csv        -> participant='',      kind='Te', number=3 (condition='Exp7_6')
+        Exp1/Exp1_1to3/tr1kirokumisu.csv -> kind='Tr', number=1, suffix='kirokumisu'
+        Ozaki/Model/100.csv         -> kind='Model', participant='100'
+
+    Parameters:
+    -----------
+    path : str
+        記録ファイルのパス
+    root : str, optional
+        File/ ディレクトリのパス。指定すると study (root 直下のフォルダ名) を求める。
+
+    Returns:
+    --------
+    dict
+        {'path', 'study', 'condition', 'participant', 'kind', 'number', 'suffix'}
+        kind は 'Tr', 'Te', 'Model' のいずれか。Tr/Te でも見本フォルダでもなければ 'Other'。
+    """
+    rel = os.path.relpath(path, root) if root else path
+    parts = rel.replace('\\', '/').split('/')
+    stem = os.path.splitext(parts[-1])[0]
+    condition = parts[-2] if len(parts) >= 2 else ''
+    study = parts[0] if root and len(parts) >= 2 else ''
+
+    info = {
+        'path': path,
+        'study': study,
+        'condition': condition,
+        'participant': stem,
+        'kind': 'Other',
+        'number': None,
+        'suffix': '',
+    }
+
+    m = _TRIAL_FILE_RE.match(stem)
+    if m:
+        info['participant'] = m.group('name') or ''
+        info['kind'] = m.group('kind').capitalize()
+        info['number'] = int(m.group('num'))
+        info['suffix'] = m.group('suffix') or ''
+    elif 'model' in condition.lower():
+        info['kind'] = 'Model'
+    return info
@@ -0,0 +1,396 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from trajcore.loader import POSITION_SLICE
+from trajcore.resample import resize_to_720
+
+# DTW の整列図をファイルに書き出す処理。
+# スコアの計算中には描かず、計算が終わったあとに別の段階としてまとめて描く (描かない場合は呼ばなければよい)。
+# pyplot は使わず matplotlib.figure.Figure に直接描いて Agg で保存するので、
+# GUI のウィンドウは開かず、ワーカープロセスで並列に描ける。
+
+PLOT_KINDS = ('alignment', 'costmatrix')
+
+
+def _palette():
+    # seaborn.color_palette() の既定値 (matplotlib の色の順番) と同じ
+    import matplotlib
+    return matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
+
+
+def _new_figure(figsize):
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _save(fig, out_path):
+    # 途中で止まっても壊れた画像が残らないよう、一時ファイルに書いてから置き換える
+    out_dir = os.path.dirname(out_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    fmt = os.path.splitext(out_path)[1].lstrip('.') or 'png'
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    fig.savefig(tmp_path, format=fmt)
+    os.replace(tmp_path, out_path)
+
+
+def plot_alignment(ref_signal, estimated_signal, path, ax=None, **kwargs):
+    """
+    DTW のパスで対応づけた 2 つの系列を描く (Exp*.py の plot_alignment と同じ図)。
+    model を上半分、user を下半分に描き、パスの対応を線で結ぶ。
+
+    Parameters:
+    -----------
+    ref_signal, estimated_signal : array-like
+        見本と学習者の系列
+    path : (path0, path1)
+        DTW のパス
+    ax : matplotlib.axes.Axes, optional
+        描く先 (省略すると pyplot の現在の Axes)
+    **kwargs : step, offset, linewidths, colors (Exp*.py の plot_alignment と同じ)
+    """
+    if ax is None:
+        import matplotlib.pyplot as plt
+        ax = plt.gca()
+    palette = _palette()
+
+    step = kwargs.get('step', 2)
+    linewidths = kwargs.get('linewidths', [3, 3, 0.5])
+    colors = kwargs.get('colors', [palette[0], palette[1], 'k', 'k', 'k', 'k'])
+
+    ref_signal = np.asarray(ref_signal)
+    estimated_signal = np.asarray(estimated_signal)
+
+    # 上下に分割して実際の値を表示するために、Y軸の範囲を設定
+    ref_min = min(np.nanmin(ref_signal), np.nanmin(estimated_signal))
+    ref_max = max(np.nanmax(ref_signal), np.nanmax(estimated_signal))
+    est_min, est_max = ref_min, ref_max
+
+    # 範囲がゼロまたは無効な場合のデフォルト値
+    range_ref = ref_max - ref_min
+    range_est = est_max - est_min
+    if np.isnan(range_ref) or range_ref <= 1e-10:
+        range_ref = 1.0
+    if np.isnan(range_est) or range_est <= 1e-10:
+        range_est = 1.0
+
+    # 中心線の上に参照信号、下に推定信号を置く (どちらも値が大きいほど上)
+    center_line = 0
+    ref_signal_shifted = center_line + (ref_signal - ref_min) + range_ref * 0.1
+    est_signal_shifted = center_line - range_est * 1.1 + (estimated_signal - est_min)
+
+    ax.axhline(y=center_line, color='gray', linestyle='--', alpha=0.5)
+    ax.plot(ref_signal_shifted, color=palette[1], lw=linewidths[0], label='model')
+    ax.plot(est_signal_shifted, color=palette[0], lw=linewidths[1], label='user')
+    ax.legend(fontsize=5)
+
+    # Y軸ラベルを両側に表示 (左は user, 右は model の元の値)
+    ax2 = ax.twinx()
+    y_min = center_line - range_est * 1.5
+    y_max = center_line + range_ref * 1.5
+    if np.isnan(y_min) or np.isinf(y_min):
+        y_min = -1.0
+    if np.isnan(y_max) or np.isinf(y_max):
+        y_max = 1.0
+    ax.set_ylim(y_min, y_max)
+    ax2.set_ylim(y_min, y_max)
+
+    ref_ticks = np.linspace(ref_min, ref_max, 5)
+    est_ticks = np.linspace(est_min, est_max, 5)
+    ref_tick_pos = center_line + (ref_ticks - ref_min) + range_ref * 0.1
+    est_tick_pos = center_line - range_est * 1.1 + (est_ticks - est_min)
+    if not np.any(np.isnan(ref_tick_pos)) and not np.any(np.isnan(est_tick_pos)):
+        ax.set_yticks(est_tick_pos)
+        ax.set_yticklabels([f"{t:.2f}" for t in est_ticks])
+        ax.set_ylabel('User', color=palette[0])
+        ax.tick_params(axis='y', colors=palette[0])
+        ax2.set_yticks(ref_tick_pos)
+        ax2.set_yticklabels([f"{t:.2f}" for t in ref_ticks])
+        ax2.set_ylabel('Model', color=palette[1])
+        ax2.tick_params(axis='y', colors=palette[1])
+
+    # DTWパスの描画 (step 個おきの対応を、step * 4 ごとに 4 色を順に使って結ぶ)
+    # 対応ごとに plot すると数百個の Line2D になって遅いので、同じ色の線分は 1 つの LineCollection にまとめる
+    from matplotlib.collections import LineCollection
+    path0, path1 = np.asarray(path[0], dtype=int), np.asarray(path[1], dtype=int)
+    drawn = np.arange(len(path0)) % step == 0
+    drawn &= (path0 < len(ref_signal_shifted)) & (path1 < len(est_signal_shifted))
+    group = (np.arange(len(path0)) // step) % 4
+    segments_by_color = {}
+    for k in range(4):
+        sel = np.flatnonzero(drawn & (group == k))
+        segments = np.empty((len(sel), 2, 2))
+        segments[:, 0, 0] = path0[sel]
+        segments[:, 0, 1] = ref_signal_shifted[path0[sel]]
+        segments[:, 1, 0] = path1[sel]
+        segments[:, 1, 1] = est_signal_shifted[path1[sel]]
+        segments_by_color.setdefault(colors[2 + k], []).append(segments)
+    for color, segments in segments_by_color.items():
+        ax2.add_collection(LineCollection(np.concatenate(segments), colors=color, linewidths=linewidths[2],
+                                          capstyle='projecting'),
+                           autolim=False)
+
+
+COSTMATRIX_MODES = ('full', 'pooled', 'band')
+BATCH_COSTMATRIX_MODE = 'pooled'  # render_plots で描くときの既定の mode
+POOLINGS = ('max', 'min', 'mean')
+
+
+def _block_starts(n, blocks):
+    # 0..n を blocks 個 (n より多くはしない) のほぼ同じ長さの区間に分けたときの各区間の先頭
+    return np.unique(np.linspace(0, n, min(n, blocks) + 1).astype(int))[:-1]
+
+
+def _band_limits(path, shape, band):
+    # 行 i ごとに、パスから縦横 band セル以内の列の範囲 [lo, hi) を求める
+    from numpy.lib.stride_tricks import sliding_window_view
+    path0, path1 = np.asarray(path[0], dtype=int), np.asarray(path[1], dtype=int)
+    lo = np.full(shape[0], shape[1], dtype=int)
+    hi = np.zeros(shape[0], dtype=int)
+    np.minimum.at(lo, path0, path1)
+    np.maximum.at(hi, path0, path1 + 1)
+    # パスが通らない行 (パスが途中で終わっている場合など) は、直前の行の範囲を使う
+    filled = np.maximum.accumulate(np.where(hi > 0, np.arange(shape[0]), 0))
+    lo, hi = lo[filled], hi[filled]
+    # 前後 band 行の範囲も含める (パスが縦に進む所でも帯の幅が細くならないように)
+    lo = sliding_window_view(np.pad(lo, band, mode='edge'), 2 * band + 1).min(axis=1)
+    hi = sliding_window_view(np.pad(hi, band, mode='edge'), 2 * band + 1).max(axis=1)
+    return np.clip(lo - band, 0, shape[1]), np.clip(hi + band, 0, shape[1])
+
+
+def pool_matrix(matrix, shape, pooling='max', limits=None):
+    """
+    行列を shape (行数, 列数) 以下のブロックに分け、ブロックごとに 1 つの値にまとめる。
+    inf と NaN (sakoe-chiba の窓の外など) は無視し、有効な値がないブロックは NaN にする。
+    一度に読むのは 1 ブロック行分だけなので、大きな行列でも作業用のメモリは増えない。
+
+    Parameters:
+    -----------
+    matrix : ndarray, shape=(N, M)
+        コスト行列
+    shape : (int, int)
+        まとめたあとの最大の大きさ
+    pooling : str
+        'max', 'min', 'mean' のどれか
+    limits : (lo, hi), optional
+        行ごとに使う列の範囲 [lo, hi)。範囲外のセルは無視し、範囲内の列だけを読む。
+
+    Returns:
+    --------
+    (pooled, row_starts, col_starts)
+        pooled は shape=(len(row_starts), len(col_starts)) の配列
+    """
+    if pooling not in POOLINGS:
+        raise ValueError(f"不明な pooling です: {pooling} (使えるもの: {POOLINGS})")
+    n, m = matrix.shape
+    row_starts = _block_starts(n, shape[0])
+    col_starts = _block_starts(m, shape[1])
+    row_ends = np.r_[row_starts[1:], n]
+    pooled = np.full((len(row_starts), len(col_starts)), np.nan)
+
+    for r, (r0, r1) in enumerate(zip(row_starts, row_ends)):
+        c0, c1 = 0, m
+        if limits is not None:
+            c0, c1 = limits[0][r0:r1].min(), limits[1][r0:r1].max()
+            if c0 >= c1:
+                continue
+        strip = np.asarray(matrix[r0:r1, c0:c1], dtype=float)
+        valid = np.isfinite(strip)
+        if limits is not None:
+            cols = np.arange(c0, c1)
+            valid &= (cols >= limits[0][r0:r1, None]) & (cols < limits[1][r0:r1, None])
+
+        # この区間に含まれる列ブロックだけを集計する
+        first = np.searchsorted(col_starts, c0, side='right') - 1
+        last = np.searchsorted(col_starts, c1, side='left')
+        starts = np.maximum(col_starts[first:last], c0) - c0
+        if pooling == 'mean':
+            sums = np.add.reduceat(np.where(valid, strip, 0.0).sum(axis=0), starts)
+            counts = np.add.reduceat(valid.sum(axis=0), starts)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                pooled[r, first:last] = np.where(counts > 0, sums / counts, np.nan)
+        else:
+            ufunc = np.fmax if pooling == 'max' else np.fmin
+            column = ufunc.reduce(np.where(valid, strip, np.nan), axis=0)
+            pooled[r, first:last] = ufunc.reduceat(column, starts)
+    return pooled, row_starts, col_starts
+
+
+def plot_costmatrix(matrix, path, ax=None, mode='full', pooling='max', resolution=None, band=20):
+    """
+    コスト行列を描く (Exp*.py の plot_costmatrix と同じ向き: 横軸が見本、縦軸がテスト)。
+
+    長い記録では行列が数百万セルになり、そのまま imshow すると描画に時間とメモリがかかるので、
+    mode='pooled' では画面の解像度程度までブロックごとにまとめて (pooling して) から描く。
+    行列が解像度より小さい場合は、まとめずにそのまま描く ('full' と同じ図)。
+    既定は元の plot_costmatrix と同じ 'full'。render_plots で描く図は BATCH_COSTMATRIX_MODE ('pooled') になる。
+
+    Parameters:
+    -----------
+    matrix : ndarray, shape=(N, M)
+        コスト行列 (局所コストまたは累積コスト)
+    path : (path0, path1)
+        DTW のパス
+    ax : matplotlib.axes.Axes, optional
+        描く先 (省略すると pyplot の現在の Axes)
+    mode : str, optional
+        'full'   : 行列全体をそのまま描く (元の plot_costmatrix, default)
+        'pooled' : 行列全体を resolution までまとめて描く
+        'band'   : パスから band セル以内だけをまとめて描き、パスを重ねる
+    pooling : str, optional
+        ブロックのまとめ方 'max', 'min', 'mean' (default: 'max')
+    resolution : (int, int), optional
+        まとめたあとの最大の大きさ (横, 縦) (default: ax の大きさ [pixel])
+    band : int, optional
+        mode='band' のときに描くパスからの幅 [セル] (default: 20)
+    """
+    if ax is None:
+        import matplotlib.pyplot as plt
+        ax = plt.gca()
+    if mode not in COSTMATRIX_MODES:
+        raise ValueError(f"不明な mode です: {mode} (使えるもの: {COSTMATRIX_MODES})")
+    n, m = matrix.shape
+
+    if mode == 'full':
+        image = ax.imshow(matrix.T, cmap='viridis', origin='lower', interpolation='none')
+    else:
+        if resolution is None:
+            bbox = ax.get_window_extent()
+            resolution = (max(int(bbox.width), 1), max(int(bbox.height), 1))
+        limits = _band_limits(path, matrix.shape, band) if mode == 'band' else None
+        pooled, _, _ = pool_matrix(matrix, (resolution[0], resolution[1]), pooling, limits)
+        # まとめた画像を元の行列の座標に合わせて描く
+        image = ax.imshow(np.ma.masked_invalid(pooled.T), cmap='viridis', origin='lower', interpolation='none',
+                          extent=(-0.5, n - 0.5, -0.5, m - 0.5), aspect='equal')
+        if mode == 'band':
+            ax.plot(path[0], path[1], color='w', lw=0.8)
+    ax.figure.colorbar(image, ax=ax)
+    ax.set_xlim((-0.5, n - 0.5))
+    ax.set_ylim((-0.5, m - 0.5))
+
+
+def save_alignment(out_path, ref_signal, estimated_signal, path, title=None, figsize=(10, 4), **kwargs):
+    """plot_alignment の図を out_path に保存する"""
+    fig = _new_figure(figsize)
+    ax = fig.add_subplot()
+    plot_alignment(ref_signal, estimated_signal, path, ax=ax, **kwargs)
+    if title:
+        ax.set_title(title)
+    _save(fig, out_path)
+
+
+def save_costmatrix(out_path, matrix, path, title=None, figsize=(10, 8), **kwargs):
+    """plot_costmatrix の図を out_path に保存する (kwargs は plot_costmatrix の mode, pooling など)"""
+    fig = _new_figure(figsize)
+    ax = fig.add_subplot()
+    plot_costmatrix(matrix, path, ax=ax, **kwargs)
+    if title:
+        ax.set_title(title)
+    _save(fig, out_path)
+
+
+def plot_job(model_path, test_path, out_path, kind='alignment', alignment='position', dtw=None, title=None,
+             options=None):
+    """
+    render_plots に渡す図 1 枚分の指定を作る。
+
+    Parameters:
+    -----------
+    model_path, test_path : str
+        見本とテストの CSV
+    out_path : str
+        保存先 (拡張子で形式が決まる)
+    kind : str
+        'alignment' (X座標の整列図) または 'costmatrix' (コスト行列)
+    alignment : str
+        'position' または 'position_resized' (trajcore.metrics.align と同じ)
+    dtw : dict, optional
+        DTW のパラメータ (default: trajcore.metrics.DEFAULT_DTW_PARAMS)
+    title : str, optional
+        図のタイトル
+    options : dict, optional
+        描画関数に渡すオプション (kind='costmatrix' なら plot_costmatrix の mode, pooling, band など。
+        mode を省略すると BATCH_COSTMATRIX_MODE)
+    """
+    if kind not in PLOT_KINDS:
+        raise ValueError(f"不明な図の種類です: {kind} (使えるもの: {PLOT_KINDS})")
+    return {'model_path': model_path, 'test_path': test_path, 'out_path': out_path,
+            'kind': kind, 'alignment': alignment, 'dtw': dtw, 'title': title, 'options': options or {}}
+
+
+def render_plot(job):
+    """
+    plot_job で作った指定に従って図を 1 枚描く。ワーカープロセスから呼ばれる。
+    DTW パスは trajcore.dtwcache から読むので、スコアを計算したあとなら DTW は再計算されない。
+
+    Returns:
+    --------
+    str or None
+        保存したファイル。失敗した場合は None。
+    """
+    from trajcore.cache import load_recording_cached
+    from trajcore.dtw import dtw_sw
+    from trajcore.metrics import DEFAULT_DTW_PARAMS, align
+
+    try:
+        model, _ = load_recording_cached(job['model_path'])
+        test, _ = load_recording_cached(job['test_path'])
+        dtw = dict(DEFAULT_DTW_PARAMS, **(job['dtw'] or {}))
+        model_pos = model[:, POSITION_SLICE]
+        test_pos = test[:, POSITION_SLICE]
+        if job['alignment'] == 'position_resized':
+            test_pos = resize_to_720(test_pos)
+
+        if job['kind'] == 'alignment':
+            path = align(model, test, job['alignment'], dtw)
+            save_alignment(job['out_path'], model_pos[:, 0], test_pos[:, 0], path, title=job['title'],
+                           **job['options'])
+        else:
+            # コスト行列はキャッシュしていないので、ここで DTW を計算する
+            params = dict(dtw)
+            winlen = params.pop('winlen')
+            alpha = params.pop('alpha')
+            _, cost_matrix, _, path = dtw_sw(model_pos[:, 0], model_pos[:, 1], model_pos[:, 2],
+                                             test_pos[:, 0], test_pos[:, 1], test_pos[:, 2],
+                                             winlen, alpha, **params)
+            options = dict({'mode': BATCH_COSTMATRIX_MODE}, **job['options'])
+            save_costmatrix(job['out_path'], cost_matrix, path, title=job['title'], **options)
+    except Exception as e:
+        print(f"図の作成に失敗: {job['out_path']} ({e})")
+        return None
+    return job['out_path']
+
+
+def render_plots(jobs, workers=1, overwrite=False):
+    """
+    図をまとめてファイルに描く。
+
+    Parameters:
+    -----------
+    jobs : list of dict
+        plot_job の返り値のリスト
+    workers : int, optional
+        並列に描くプロセス数 (default: 1)
+    overwrite : bool, optional
+        False の場合、既にある図は描かない (default: False)
+
+    Returns:
+    --------
+    list of str
+        保存したファイル
+    """
+    pending = [job for job in jobs if overwrite or not os.path.exists(job['out_path'])]
+    print(f"図を {len(pending)} 枚描きます ({len(jobs) - len(pending)} 枚は作成済み)")
+    if workers <= 1 or len(pending) <= 1:
+        written = [render_plot(job) for job in pending]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            written = list(executor.map(render_plot, pending))
+    written = [p for p in written if p is not None]
+    print(f"図を {len(written)} 枚保存しました")
+    return written
@@ -0,0 +1,60 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from trajcore.cache import load_recording_cached
+
+
+def prefetch(items, load=load_recording_cached, depth=4, workers=4):
+    """
+    items を先読みしながら 1 つずつ返すジェネレータ。
+
+    呼び出し側が現在のデータでスコアを計算している間に、次の depth 件をスレッドプールで読み込む。
+    ファイルの読み込みや解析は GIL を解放するため、DTW などの計算と重ねて待ち時間を隠せる。
+    先読みは最大 depth 件までなので、メモリ使用量も depth 件分に抑えられる。
+
+    Parameters:
+    -----------
+    items : iterable
+        読み込む対象 (ファイルパスや catalog のエントリなど)
+    load : callable, optional
+        item を受け取って読み込んだデータを返す関数 (default: load_recording_cached)
+    depth : int, optional
+        先読みする件数の上限 (default: 4)
+    workers : int, optional
+        読み込みに使うスレッド数 (default: 4)
+
+    Yields:
+    -------
+    (item, data, error)
+        読み込みに成功した場合は error が None、失敗した場合は data が None で error に例外が入る。
+        順序は items と同じ。
+    """
+    items = iter(items)
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit_next():
+            for item in items:
+                pending.append((item, executor.submit(load, item)))
+                return True
+            return False
+
+        for _ in range(max(depth, 1)):
+            if not submit_next():
+                break
+
+        try:
+            while pending:
+                item, future = pending.popleft()
+                # 1 件取り出したら 1 件追加して、先読みの件数を一定に保つ
+                submit_next()
+                try:
+                    data = future.result()
+                except Exception as e:
+                    yield item, None, e
+                else:
+                    yield item, data, None
+        finally:
+            # 途中で打ち切られた場合は、まだ始まっていない読み込みを取り消す
+            for _, future in pending:
+                future.cancel()
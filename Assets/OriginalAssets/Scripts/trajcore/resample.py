@@ -0,0 +1,44 @@
+import numpy as np
+
+RESAMPLE_LENGTH = 720
+
+
+def resize_to_720(arr):
+    """arr: shape=(N, 3)のnumpy配列を720フレームにリサイズ"""
+    n = arr.shape[0]
+    if n == RESAMPLE_LENGTH:
+        return arr
+    elif n < 2:
+        # 1フレームしかない場合は全て同じ値で埋める
+        return np.tile(arr, (RESAMPLE_LENGTH, 1))
+    elif n < RESAMPLE_LENGTH:
+        # 線形補間
+        return resample_linear(arr, RESAMPLE_LENGTH)
+    else:
+        # 間引き
+        idxs = np.linspace(0, n - 1, RESAMPLE_LENGTH).astype(int)
+        return arr[idxs]
+
+
+def resample_linear(arr, length):
+    """
+    arr (shape=(N, D)) を、最初と最後のフレームを保ったまま length フレームに線形補間する。
+
+    Parameters:
+    -----------
+    arr : ndarray, shape=(N, D)
+        時系列 (N >= 2)
+    length : int
+        補間後のフレーム数
+
+    Returns:
+    --------
+    ndarray, shape=(length, D)
+    """
+    arr = np.asarray(arr)
+    x_old = np.linspace(0, 1, arr.shape[0])
+    x_new = np.linspace(0, 1, length)
+    out = np.empty((length, arr.shape[1]))
+    for i in range(arr.shape[1]):
+        out[:, i] = np.interp(x_new, x_old, arr[:, i])
+    return out
@@ -0,0 +1,329 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from trajcore.cache import load_recording_cached
+from trajcore.metrics import align, dtw_params, get_metric
+from trajcore.plotting import PLOT_KINDS, plot_job, render_plots
+from trajcore.sink import ResultSink
+
+RESULT_COLUMNS = ['Dataset', 'Model', 'Test', 'Metric', 'Score']
+RESULT_KEY_COLUMNS = ['Dataset', 'Model', 'Test', 'Metric']
+
+
+def load_config(path):
+    """
+    実験の設定 (JSON) を読み込む。
+
+    設定の例 (configs/exp10_dtw_score.json):
+        {
+          "datasets": [
+            {
+              "name": "Ozaki",
+              "model_dir": "Assets/OriginalAssets/File/Ozaki/Model",
+              "test_dir": "Assets/OriginalAssets/File/Ozaki/User",
+              "models": ["1"],
+              "test_pattern": "1-3pp_Te{num}",
+              "test_range": [1, 21]
+            }
+          ],
+          "metrics": ["calc_dtw_euclidean_score"],
+          "dtw": {"winlen": 12, "alpha": 0.5},
+          "output": {"path": "Assets/OriginalAssets/File/Exp10_Result/dtw_score.csv", "format": "wide"},
+          "workers": 4
+        }
+
+    datasets の各項目:
+        model_dir, test_dir : 見本とテストのフォルダ。test_dir には {model} を含めてもよい。
+        models       : 見本のファイル名 (拡張子なし) のリスト
+        test_pattern : テストのファイル名 (拡張子なし)。{model} と {num} を置き換える。(default: "{model}_Te{num}")
+        test_nums / test_range : テスト番号のリスト、または range() の引数
+        metrics      : この dataset だけ使うスコア (省略すると全体の metrics)
+    metrics の各項目は trajcore.metrics.METRICS の名前、または
+        {"name": ..., "label": 出力での名前, "dtw": このスコアだけの DTW パラメータ}
+    dtw は全スコア共通の DTW パラメータ (winlen, alpha, window, factor)。
+    output.format は "long" (Dataset, Model, Test, Metric, Score の縦長の表) または
+        "wide" (Test x 見本 の表。dataset とスコアが 1 つずつの場合のみ)。
+    plots (省略可) を指定すると、スコアを計算したあとに DTW の図を画像ファイルに保存する:
+        {"dir": 保存先, "kinds": ["alignment", "costmatrix"], "format": "png", "workers": 4, "overwrite": false,
+         "costmatrix": {"mode": "band", "pooling": "max", "band": 20}}
+        (kinds の既定は ["alignment"]。kind と同じ名前の項目は描画関数に渡すオプション)。
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    validate_config(config)
+    return config
+
+
+def _metric_specs(config, metrics):
+    specs = []
+    for item in metrics:
+        if isinstance(item, str):
+            item = {'name': item}
+        metric = get_metric(item['name'])
+        dtw = None
+        if metric.alignment is not None:
+            dtw = dtw_params(item['name'], config.get('dtw', {}), item.get('dtw', {}))
+        specs.append({'label': item.get('label', item['name']), 'name': item['name'],
+                      'alignment': metric.alignment, 'dtw': dtw})
+    return specs
+
+
+def _test_numbers(dataset):
+    if 'test_nums' in dataset:
+        return list(dataset['test_nums'])
+    return list(range(*dataset['test_range']))
+
+
+def validate_config(config):
+    """設定の誤りを実行前に ValueError で知らせる"""
+    if not config.get('datasets'):
+        raise ValueError("datasets が空です")
+    if 'output' not in config or 'path' not in config['output']:
+        raise ValueError("output.path を指定してください")
+    for dataset in config['datasets']:
+        for key in ('name', 'model_dir', 'test_dir', 'models'):
+            if key not in dataset:
+                raise ValueError(f"dataset に {key} がありません: {dataset}")
+        if 'test_nums' not in dataset and 'test_range' not in dataset:
+            raise ValueError(f"dataset {dataset['name']} に test_nums または test_range を指定してください")
+        metrics = dataset.get('metrics', config.get('metrics'))
+        if not metrics:
+            raise ValueError(f"dataset {dataset['name']} で使う metrics がありません")
+        _metric_specs(config, metrics)
+
+    output_format = config['output'].get('format', 'long')
+    if output_format not in ('long', 'wide'):
+        raise ValueError(f"output.format は long または wide です: {output_format}")
+    if output_format == 'wide':
+        labels = {spec['label'] for dataset in config['datasets']
+                  for spec in _metric_specs(config, dataset.get('metrics', config.get('metrics')))}
+        if len(config['datasets']) != 1 or len(labels) != 1:
+            raise ValueError("output.format が wide の場合、dataset とスコアは 1 つずつにしてください")
+
+    if 'plots' in config:
+        if 'dir' not in config['plots']:
+            raise ValueError("plots.dir を指定してください")
+        for kind in config['plots'].get('kinds', ['alignment']):
+            if kind not in PLOT_KINDS:
+                raise ValueError(f"plots.kinds に不明な図の種類があります: {kind} (使えるもの: {PLOT_KINDS})")
+
+
+def plan(config):
+    """
+    設定から実行する仕事の一覧を作る。
+
+    同じ (見本, テスト) の組は、複数の dataset やスコアで使われても 1 つの仕事にまとめる。
+    仕事の中では、同じ整列方法と DTW パラメータを使うスコアで DTW パスを共有する。
+
+    Returns:
+    --------
+    list of dict
+        {'model_path', 'test_path', 'metrics': {label: spec}, 'targets': [(dataset, model, test, label), ...]}
+    """
+    jobs = {}
+    for dataset in config['datasets']:
+        specs = _metric_specs(config, dataset.get('metrics', config.get('metrics')))
+        pattern = dataset.get('test_pattern', '{model}_Te{num}')
+        for model in dataset['models']:
+            model_path = f"{dataset['model_dir']}/{model}.csv"
+            test_dir = dataset['test_dir'].format(model=model)
+            for num in _test_numbers(dataset):
+                test_path = f"{test_dir}/{pattern.format(model=model, num=num)}.csv"
+                job = jobs.setdefault((model_path, test_path), {
+                    'model_path': model_path, 'test_path': test_path, 'metrics': {}, 'targets': []})
+                for spec in specs:
+                    job['metrics'].setdefault(spec['label'], spec)
+                    job['targets'].append((dataset['name'], model, f'Test{num}', spec['label']))
+    return list(jobs.values())
+
+
+def check_inputs(config, jobs):
+    """
+    見本またはテストのファイルが 1 つも見つからない dataset があれば ValueError にする。
+    (パスやファイル名のパターンの誤りで、全てのスコアが NaN のまま保存されるのを防ぐ。
+    一部のファイルだけがない場合は、そのスコアだけを NaN にして続ける)
+    """
+    for dataset in config['datasets']:
+        dataset_jobs = [job for job in jobs if any(t[0] == dataset['name'] for t in job['targets'])]
+        for key, label in (('model_path', '見本'), ('test_path', 'テスト')):
+            paths = sorted({job[key] for job in dataset_jobs})
+            if not any(os.path.exists(path) for path in paths):
+                raise ValueError(f"dataset {dataset['name']} の{label}のファイルが 1 つも見つかりません "
+                                 f"(例: {paths[0]})。model_dir, test_dir, test_pattern を確認してください")
+
+
+def _alignment_key(spec):
+    if spec['alignment'] is None:
+        return None
+    return (spec['alignment'], tuple(sorted(spec['dtw'].items())))
+
+
+def run_pair(model_path, test_path, specs):
+    """
+    1 組の見本とテストを 1 回ずつ読み込み、整列ごとに 1 回だけ DTW を計算して、全スコアを返す。
+    ワーカープロセスから呼ばれる。
+
+    Returns:
+    --------
+    dict
+        {label: score}。読み込みや計算に失敗したスコアは NaN。
+    """
+    try:
+        model, _ = load_recording_cached(model_path)
+        test, _ = load_recording_cached(test_path)
+    except Exception as e:
+        print(f"ファイル読み込み失敗: {model_path}, {test_path} ({e})")
+        return {spec['label']: np.nan for spec in specs}
+
+    paths = {}
+    scores = {}
+    for spec in specs:
+        try:
+            key = _alignment_key(spec)
+            if key is not None and key not in paths:
+                paths[key] = align(model, test, spec['alignment'], spec['dtw'])
+            scores[spec['label']] = get_metric(spec['name']).func(model, test, paths.get(key))
+        except Exception as e:
+            print(f"スコアの計算に失敗: {test_path} {spec['label']} ({e})")
+            scores[spec['label']] = np.nan
+    return scores
+
+
+def _stem(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def plot_jobs(config, jobs):
+    """
+    config の plots に従って、各 (見本, テスト) の組の DTW の図の指定を作る。
+    組の中で整列方法と DTW パラメータが違うスコアがあれば、それぞれの図を作る。
+    """
+    plots = config['plots']
+    kinds = plots.get('kinds', ['alignment'])
+    fmt = plots.get('format', 'png')
+    out = []
+    for job in jobs:
+        alignments = {}
+        for spec in job['metrics'].values():
+            key = _alignment_key(spec)
+            if key is not None:
+                alignments.setdefault(key, spec)
+        model, test = _stem(job['model_path']), _stem(job['test_path'])
+        for spec in alignments.values():
+            for kind in kinds:
+                out_path = f"{plots['dir']}/{model}_{test}_{spec['alignment']}_{kind}.{fmt}"
+                out.append(plot_job(job['model_path'], job['test_path'], out_path, kind=kind,
+                                    alignment=spec['alignment'], dtw=spec['dtw'],
+                                    title=f"{model} - {test} DTW Alignment", options=plots.get(kind)))
+    return out
+
+
+def _to_wide(config, jobs):
+    dataset = config['datasets'][0]
+    test_names = [f'Test{num}' for num in _test_numbers(dataset)]
+    model_names = [str(model) for model in dataset['models']]
+
+    def reshape(df_scores):
+        # 1行目に「Test」, 2列目以降にモデル名
+        df_out = df_scores.pivot(index='Test', columns='Model', values='Score')
+        df_out = df_out.reindex(index=test_names, columns=model_names)
+        return df_out.rename_axis(index='Test', columns=None).reset_index()
+
+    return reshape
+
+
+def run(config, workers=None, resume=True, dry_run=False, plots=True):
+    """
+    設定に従って全ての (見本, テスト) の組のスコアを計算し、output に保存する。
+
+    Parameters:
+    -----------
+    config : dict
+        load_config() の返り値
+    workers : int, optional
+        並列に計算するプロセス数 (default: config の workers、なければ 1)
+    resume : bool, optional
+        前回途中で止まった結果があれば、計算済みのスコアを飛ばす (default: True)
+    dry_run : bool, optional
+        計画だけを表示して終了する
+    plots : bool, optional
+        False の場合、config に plots があっても図を描かない (default: True)
+    """
+    jobs = plan(config)
+    check_inputs(config, jobs)
+    if workers is None:
+        workers = config.get('workers', 1)
+
+    sink = None
+    if not dry_run:
+        sink = ResultSink(config['output']['path'], key_columns=RESULT_KEY_COLUMNS,
+                          columns=RESULT_COLUMNS, resume=resume)
+
+    # 計算済みのスコアを除き、残ったスコアだけを計算する
+    pending = []
+    for job in jobs:
+        targets = [t for t in job['targets']
+                   if sink is None or not sink.done(Dataset=t[0], Model=t[1], Test=t[2], Metric=t[3])]
+        if targets:
+            labels = {t[3] for t in targets}
+            specs = [spec for label, spec in job['metrics'].items() if label in labels]
+            pending.append((job, targets, specs))
+
+    n_files = len({p for job, _, _ in pending for p in (job['model_path'], job['test_path'])})
+    n_alignments = sum(len({_alignment_key(s) for s in specs} - {None}) for _, _, specs in pending)
+    n_scores = sum(len(targets) for _, targets, _ in pending)
+    print(f"{len(pending)} 組 (ファイル {n_files} 件, DTW {n_alignments} 回, スコア {n_scores} 件) を "
+          f"{workers} プロセスで計算します ({len(jobs) - len(pending)} 組は計算済み)")
+    plots = plots and 'plots' in config
+    if dry_run:
+        for job, targets, specs in pending:
+            print(f"  {job['model_path']} x {job['test_path']}: {[s['label'] for s in specs]}")
+        if plots:
+            print(f"図 {len(plot_jobs(config, jobs))} 枚を {config['plots']['dir']} に保存します")
+        return
+
+    def write(targets, scores):
+        sink.append([{'Dataset': d, 'Model': m, 'Test': t, 'Metric': label, 'Score': scores[label]}
+                     for d, m, t, label in targets])
+        for d, m, t, label in targets:
+            print(f"{t} {m} {label}: {scores[label]}")
+
+    if workers <= 1:
+        for job, targets, specs in pending:
+            write(targets, run_pair(job['model_path'], job['test_path'], specs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(run_pair, job['model_path'], job['test_path'], specs): targets
+                       for job, targets, specs in pending}
+            for future in as_completed(futures):
+                write(futures[future], future.result())
+
+    if config['output'].get('format', 'long') == 'wide':
+        sink.finalize(reshape=_to_wide(config, jobs))
+    else:
+        sink.finalize()
+
+    # 図はスコアを保存したあとに別の段階として描く (DTW パスはキャッシュから読む)
+    if plots:
+        render_plots(plot_jobs(config, jobs), workers=config['plots'].get('workers', workers),
+                     overwrite=config['plots'].get('overwrite', False))
+
+
+if __name__ == "__main__":
+    # 使い方 (リポジトリのルートで実行):
+    #   PYTHONPATH=Assets/OriginalAssets/Scripts python -m trajcore.runner Assets/OriginalAssets/Scripts/configs/exp10_dtw_score.json --workers 4
+    import argparse
+
+    parser = argparse.ArgumentParser(description="設定ファイルに従って見本とテストのスコアを計算する")
+    parser.add_argument('config', help="設定ファイル (JSON)")
+    parser.add_argument('--workers', type=int, default=None, help="並列に計算するプロセス数")
+    parser.add_argument('--no-resume', action='store_true', help="途中の結果を使わずに最初から計算する")
+    parser.add_argument('--dry-run', action='store_true', help="計画だけを表示する")
+    parser.add_argument('--no-plots', action='store_true', help="設定に plots があっても図を描かない")
+    args = parser.parse_args()
+
+    run(load_config(args.config), workers=args.workers, resume=not args.no_resume, dry_run=args.dry_run,
+        plots=not args.no_plots)
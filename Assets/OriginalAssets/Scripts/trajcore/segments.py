@@ -0,0 +1,133 @@
+import numpy as np
+
+POSITION_COLS = ['PositionX', 'PositionY', 'PositionZ']
+
+
+def fixed_interval_boundaries(frame_interval=90, max_frame=719):
+    """
+    一定フレーム間隔の区間境界を作成する関数。
+    Exp7-2.py の calculate_keyframe_vector_errors と同じ区切り方
+    (start, start + frame_interval - 1) を返す。
+
+    Returns:
+    --------
+    ndarray, shape=(S, 2)
+        各区間の [StartFrame, EndFrame]
+    """
+    starts = np.arange(0, max_frame, frame_interval)
+    return np.stack([starts, starts + frame_interval - 1], axis=1)
+
+
+def keyframe_boundaries(keyframes):
+    """
+    任意のキーフレーム番号のリストから区間境界を作成する関数。
+    隣り合うキーフレーム同士を始点・終点とする。
+
+    Returns:
+    --------
+    ndarray, shape=(S, 2)
+        各区間の [StartFrame, EndFrame]
+    """
+    kf = np.unique(np.asarray(keyframes, dtype=int))
+    return np.stack([kf[:-1], kf[1:]], axis=1)
+
+
+def stack_positions(positions_list):
+    """
+    長さの異なる位置配列 (N_i, 3) のリストを NaN 埋めで (N_tests, T_max, 3) にまとめる。
+
+    Returns:
+    --------
+    stacked : ndarray, shape=(N_tests, T_max, 3)
+    lengths : ndarray, shape=(N_tests,)
+        各テストの有効フレーム数
+    """
+    lengths = np.array([len(p) for p in positions_list], dtype=int)
+    t_max = lengths.max() if len(lengths) > 0 else 0
+    stacked = np.full((len(positions_list), t_max, 3), np.nan)
+    for k, p in enumerate(positions_list):
+        stacked[k, :lengths[k]] = p
+    return stacked, lengths
+
+
+def _segment_vectors(positions, boundaries):
+    """(..., T, 3) の位置配列から各区間の始点→終点ベクトル (..., S, 3) を取り出す"""
+    t = positions.shape[-2]
+    starts = np.clip(boundaries[:, 0], 0, max(t - 1, 0))
+    ends = np.clip(boundaries[:, 1], 0, max(t - 1, 0))
+    return positions[..., ends, :] - positions[..., starts, :]
+
+
+def _normalize_vectors(vectors):
+    """ノルムが 0 のベクトルはそのまま残して正規化する (Exp7-2.py と同じ扱い)"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    safe = np.where(norms > 0, norms, 1.0)
+    return vectors / safe
+
+
+def segment_vector_cosines(model_pos, test_positions, boundaries):
+    """
+    見本と全テストの区間ベクトル間の内積 (正規化後 = コサイン類似度) を一括で計算する関数。
+
+    Parameters:
+    -----------
+    model_pos : array-like, shape=(T_model, 3)
+        見本の位置データ
+    test_positions : list of array-like (各 shape=(T_i, 3)) または ndarray, shape=(N_tests, T, 3)
+        学習者の位置データ
+    boundaries : array-like, shape=(S, 2)
+        各区間の [StartFrame, EndFrame] (fixed_interval_boundaries / keyframe_boundaries で作成)
+
+    Returns:
+    --------
+    ndarray, shape=(N_tests, S)
+        各テスト・各区間の VecDistance。
+        始点・終点のフレームが見本またはテストに存在しない区間は NaN。
+    """
+    model_pos = np.asarray(model_pos, dtype=float)
+    boundaries = np.asarray(boundaries, dtype=int).reshape(-1, 2)
+
+    if isinstance(test_positions, np.ndarray) and test_positions.ndim == 3:
+        tests = test_positions.astype(float, copy=False)
+        lengths = np.full(len(tests), tests.shape[1], dtype=int)
+    else:
+        tests, lengths = stack_positions([np.asarray(p, dtype=float) for p in test_positions])
+
+    model_vec = _normalize_vectors(_segment_vectors(model_pos, boundaries))   # (S, 3)
+    test_vec = _normalize_vectors(_segment_vectors(tests, boundaries))        # (N, S, 3)
+    cosines = np.einsum('sk,nsk->ns', model_vec, test_vec)
+
+    # フレームが存在しない区間は NaN
+    valid = (boundaries[None, :, 0] < lengths[:, None]) & (boundaries[None, :, 1] < lengths[:, None])
+    valid &= (boundaries[:, 0] < len(model_pos)) & (boundaries[:, 1] < len(model_pos))
+    valid &= (boundaries[:, 0] >= 0)
+    cosines[~valid] = np.nan
+    return cosines
+
+
+def segment_vector_records(exp_num, test_nums, model_pos, test_positions, boundaries):
+    """
+    segment_vector_cosines の結果を Exp7-2.py の出力と同じ形式の行リストにする関数。
+
+    Returns:
+    --------
+    list of dict
+        [{'ExpNum': int, 'TestNum': int, 'StartFrame': int, 'EndFrame': int, 'VecDistance': float}, ...]
+    """
+    boundaries = np.asarray(boundaries, dtype=int).reshape(-1, 2)
+    cosines = segment_vector_cosines(model_pos, test_positions, boundaries)
+
+    records = []
+    for k, test_num in enumerate(test_nums):
+        for s, (start_frame, end_frame) in enumerate(boundaries):
+            value = cosines[k, s]
+            if np.isnan(value):
+                print(f"    Warning: Frame index {start_frame} or {end_frame} out of bounds after filtering. Skipping segment {start_frame}-{end_frame}.")
+            records.append({
+                'ExpNum': exp_num,
+                'TestNum': test_num,
+                'StartFrame': int(start_frame),
+                'EndFrame': int(end_frame),
+                'VecDistance': value
+            })
+    return records
@@ -0,0 +1,167 @@
+import csv
+import math
+import os
+
+PARTIAL_SUFFIX = '.partial'
+
+
+class ResultSink:
+    """
+    スコアの計算が終わるたびに結果の行を CSV に追記し、最後にまとめて出力ファイルに置き換えるクラス。
+
+    行はまず {output_path}.partial に追記し、書き込むたびにディスクに反映させる。
+    途中で止まっても、それまでの結果は .partial に残り、次回は resume=True (既定) で
+    そこから再開できる (key_columns が同じ行はすでに計算済みとして done() が True を返す)。
+    finalize() で .partial を出力ファイルに置き換えるため、出力ファイルが書きかけになることはない。
+
+    Parameters:
+    -----------
+    output_path : str
+        最終的な出力ファイルのパス
+    key_columns : list of str
+        1 組の計算 (例: 実験番号とテスト番号) を表す列。再開時にこの列の値で計算済みかを判定する。
+    columns : list of str, optional
+        出力する列の順番 (default: 最初に追記した行のキーの順)
+    resume : bool, optional
+        .partial が残っていれば続きから再開する (default: True)。False なら最初からやり直す。
+
+    Examples:
+    ---------
+    >>> sink = ResultSink('Assets/OriginalAssets/File/Exp7_results.csv', key_columns=['ExpNum', 'TestNum'])
+    >>> for test_num in range(1, 7):
+    ...     if sink.done(ExpNum=6, TestNum=test_num):
+    ...         continue
+    ...     sink.append({'ExpNum': 6, 'TestNum': test_num, 'Result': score(test_num)})
+    >>> sink.finalize()
+    """
+
+    def __init__(self, output_path, key_columns, columns=None, resume=True):
+        self.output_path = output_path
+        self.partial_path = output_path + PARTIAL_SUFFIX
+        self.key_columns = list(key_columns)
+        self.columns = list(columns) if columns is not None else None
+        self._done = set()
+        self._file = None
+        self._writer = None
+
+        output_dir = os.path.dirname(output_path)
+        if output_dir and not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+            print(f"Created directory: {output_dir}")
+
+        if resume and os.path.exists(self.partial_path):
+            self._resume()
+        elif os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+    def _resume(self):
+        # 書きかけの最後の行 (改行で終わっていない行) は捨てる
+        with open(self.partial_path, 'rb+') as f:
+            content = f.read()
+            if content and not content.endswith(b'\n'):
+                f.truncate(content.rfind(b'\n') + 1)
+
+        with open(self.partial_path, 'r', newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                return
+            if self.columns is not None and header != self.columns:
+                raise ValueError(f"{self.partial_path} の列 {header} が指定された列 {self.columns} と一致しません")
+            missing = [col for col in self.key_columns if col not in header]
+            if missing:
+                raise ValueError(f"{self.partial_path} に列 {missing} がありません")
+            self.columns = header
+            key_indices = [header.index(col) for col in self.key_columns]
+            for row in reader:
+                if row:
+                    self._done.add(tuple(row[i] for i in key_indices))
+        print(f"{self.partial_path} から再開します ({len(self._done)} 件は計算済み)")
+
+    @staticmethod
+    def _format(value):
+        # pandas の to_csv と同じく、欠損値は空欄にする
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return ''
+        return str(value)
+
+    def _key(self, row):
+        return tuple(self._format(row[col]) for col in self.key_columns)
+
+    def done(self, **key):
+        """key_columns の値がすべて一致する行がすでに書き込まれていれば True"""
+        return self._key(key) in self._done
+
+    def __len__(self):
+        return len(self._done)
+
+    def append(self, rows):
+        """
+        行 (dict) または行のリストを追記する。
+        まとめて渡した行は 1 回の書き込みでディスクに反映する。
+        """
+        if isinstance(rows, dict):
+            rows = [rows]
+        if not rows:
+            return
+
+        if self._file is None:
+            if self.columns is None:
+                self.columns = list(rows[0].keys())
+            new_file = not os.path.exists(self.partial_path) or os.path.getsize(self.partial_path) == 0
+            self._file = open(self.partial_path, 'a', newline='', encoding='utf-8-sig')
+            self._writer = csv.writer(self._file, lineterminator='\n')
+            if new_file:
+                self._writer.writerow(self.columns)
+
+        for row in rows:
+            self._writer.writerow([self._format(row.get(col)) for col in self.columns])
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        for row in rows:
+            self._done.add(self._key(row))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def finalize(self, reshape=None):
+        """
+        .partial を出力ファイルに置き換える。
+
+        Parameters:
+        -----------
+        reshape : callable, optional
+            .partial を読み込んだ DataFrame (key_columns は文字列のまま) を受け取り、
+            出力する DataFrame を返す関数。ワイド形式に並べ替える場合などに使う。
+            省略した場合は .partial をそのまま出力ファイルにする。
+
+        Returns:
+        --------
+        bool
+            出力ファイルを書き出した場合 True
+        """
+        self.close()
+        if not os.path.exists(self.partial_path) or os.path.getsize(self.partial_path) == 0:
+            print(f"\nNo results were generated for {self.output_path}.")
+            return False
+
+        try:
+            if reshape is None:
+                os.replace(self.partial_path, self.output_path)
+            else:
+                import pandas as pd
+
+                df = pd.read_csv(self.partial_path, dtype={col: str for col in self.key_columns},
+                                 float_precision='round_trip')
+                tmp = f'{self.output_path}.{os.getpid()}.tmp'
+                reshape(df).to_csv(tmp, index=False, encoding='utf-8-sig')
+                os.replace(tmp, self.output_path)
+                os.remove(self.partial_path)
+        except Exception as e:
+            print(f"\nError saving results to {self.output_path}: {e}")
+            return False
+        print(f"\nResults successfully saved to {self.output_path}")
+        return True
@@ -0,0 +1,276 @@
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from trajcore.loader import LOAD_COLUMNS, POSITION_SLICE, ROTATION_SLICE, TIME_COL, load_recording, load_table
+from trajcore.naming import is_derived_file
+
+# 見本の軌跡の平滑化。
+# B-sprine.py の gaussian_filter1d による平滑化の代わりに、位置と姿勢の 7 列をまとめて
+# 最小二乗の 3 次 B-スプラインで近似する。近似したスプラインは少ない係数で軌跡を表し、
+# 任意の時刻での値と微分 (速度・角速度) を差分を取らずに求められる。
+# gaussian_filter1d による平滑化も、フォルダ内の全ファイルを複数の sigma でまとめて行えるようにする。
+
+DEFAULT_N_KNOTS = 40  # 内部ノットの数 (720 フレーム = 8 秒なら 0.2 秒に 1 つ)
+POSE_SLICE = slice(POSITION_SLICE.start, ROTATION_SLICE.stop)  # 位置と姿勢の 7 列
+DEFAULT_SIGMAS = (5, 60, 200)  # B-sprine.py と同じ
+
+
+def continuous_quaternions(quaternions):
+    """
+    q と -q は同じ姿勢なので、隣のフレームとの内積が負にならないように符号をそろえる。
+    (符号が飛ぶとスプラインがその間を通って近似が崩れるため、近似の前に行う)
+    """
+    quaternions = np.array(quaternions, dtype=float)
+    flips = np.sum(quaternions[1:] * quaternions[:-1], axis=1) < 0
+    sign = np.where(np.concatenate([[False], np.cumsum(flips) % 2 == 1]), -1.0, 1.0)
+    return quaternions * sign[:, None]
+
+
+def lsq_knots(x, n_knots=DEFAULT_N_KNOTS, k=3):
+    """x の範囲に等間隔の内部ノットを n_knots 個置き、両端を k + 1 重にしたノット列"""
+    interior = np.linspace(x[0], x[-1], n_knots + 2)[1:-1]
+    return np.concatenate([np.repeat(x[0], k + 1), interior, np.repeat(x[-1], k + 1)])
+
+
+def fit_pose_spline(recording, n_knots=DEFAULT_N_KNOTS, k=3):
+    """
+    読み込んだ軌跡 (LOAD_COLUMNS の順の配列) の位置と姿勢の 7 列を、time を変数とする
+    最小二乗の B-スプラインで近似する。7 列は 1 回の最小二乗でまとめて解く。
+
+    Parameters:
+    -----------
+    recording : ndarray, shape=(N, len(LOAD_COLUMNS))
+        1 trial 分の配列 (time は減少しないこと。同じ time の行は平均してから近似する)
+    n_knots : int, optional
+        内部ノットの数。少ないほど滑らかになる (default: DEFAULT_N_KNOTS)
+    k : int, optional
+        次数 (default: 3)
+
+    Returns:
+    --------
+    scipy.interpolate.BSpline
+        spline(t) は shape=(len(t), 7) (PositionX..Z, RotationQX..QW)。
+        姿勢の列は正規化されていないので、値は evaluate_pose_spline で求める。
+    """
+    from scipy.interpolate import make_lsq_spline
+
+    recording = np.asarray(recording, dtype=float)
+    x = recording[:, TIME_COL]
+    if not np.all(np.isfinite(recording[:, [TIME_COL]])) or not np.all(np.isfinite(recording[:, POSE_SLICE])):
+        raise ValueError("time または位置・姿勢に NaN があります (trial の区切りの空行は load_recording で除いてください)")
+    if np.any(np.diff(x) < 0):
+        raise ValueError("time が減少しているため B-スプラインで近似できません (1 trial 分の配列を渡してください)")
+    values = np.empty((len(x), 7))
+    values[:, :3] = recording[:, POSITION_SLICE]
+    values[:, 3:] = continuous_quaternions(recording[:, ROTATION_SLICE])
+
+    # FileOperation.cs は最初の行を time=0 で 2 回書くので、同じ time の行は平均して 1 行にする
+    x, first, counts = np.unique(x, return_index=True, return_counts=True)
+    values = np.add.reduceat(values, first, axis=0) / counts[:, None]
+    if len(x) < n_knots + k + 1:
+        raise ValueError(f"フレーム数 ({len(x)}) が係数の数 ({n_knots + k + 1}) より少ないため近似できません")
+    return make_lsq_spline(x, values, lsq_knots(x, n_knots, k), k=k)
+
+
+def evaluate_pose_spline(spline, times):
+    """
+    近似したスプラインの任意の時刻での位置と姿勢 (正規化したクォータニオン)。
+
+    Returns:
+    --------
+    positions : ndarray, shape=(M, 3)
+    quaternions : ndarray, shape=(M, 4)
+    """
+    values = spline(np.asarray(times, dtype=float))
+    quaternions = values[:, 3:]
+    return values[:, :3], quaternions / np.linalg.norm(quaternions, axis=1, keepdims=True)
+
+
+def pose_velocities(spline, times):
+    """
+    スプラインの微分から、任意の時刻での速度と角速度を求める (差分は使わない)。
+
+    角速度は正規化したクォータニオン n の微分 n' から ω = 2 vec(n' ⊗ conj(n)) で求める (ワールド座標)。
+
+    Returns:
+    --------
+    velocities : ndarray, shape=(M, 3)
+        位置の時間微分 [m/s]
+    angular_velocities : ndarray, shape=(M, 3)
+        角速度ベクトル [rad/s]
+    """
+    times = np.asarray(times, dtype=float)
+    values = spline(times)
+    derivatives = spline(times, nu=1)
+    q, dq = values[:, 3:], derivatives[:, 3:]
+    norm = np.linalg.norm(q, axis=1, keepdims=True)
+    n = q / norm
+    # 正規化 n = q / |q| の微分
+    dn = dq / norm - n * np.sum(n * dq, axis=1, keepdims=True) / norm
+    nv, nw = n[:, :3], n[:, 3:]
+    dv, dw = dn[:, :3], dn[:, 3:]
+    angular_velocities = 2 * (nw * dv - dw * nv - np.cross(dv, nv))
+    return derivatives[:, :3], angular_velocities
+
+
+def spline_to_recording(spline, recording):
+    """recording の各フレームの time でスプラインを評価し、位置と姿勢を置き換えた配列を返す"""
+    out = np.array(recording, dtype=float)
+    out[:, POSITION_SLICE], out[:, ROTATION_SLICE] = evaluate_pose_spline(spline, out[:, TIME_COL])
+    return out
+
+
+def save_pose_spline(path, spline):
+    """近似したスプラインのノットと係数を .npz に保存する (書き終えてから置き換える)"""
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, t=spline.t, c=spline.c, k=spline.k)
+    os.replace(tmp_path, path)
+
+
+def load_pose_spline(path):
+    """save_pose_spline で保存したスプラインを読み込む"""
+    from scipy.interpolate import BSpline
+
+    with np.load(path, allow_pickle=False) as f:
+        return BSpline(f['t'], f['c'], int(f['k']))
+
+
+def smooth_csv_bspline(input_file, output_file, n_knots=DEFAULT_N_KNOTS, k=3):
+    """
+    CSV の位置と姿勢を B-スプラインで近似した値に置き換えて output_file に保存する。
+    他の列はそのまま残す。
+
+    Returns:
+    --------
+    scipy.interpolate.BSpline
+        近似したスプライン
+    """
+    # trial の区切りの空行は load_recording / load_table で除く (NaN の行を近似に入れない)
+    recording, _ = load_recording(input_file)
+    df = load_table(input_file)
+    spline = fit_pose_spline(recording, n_knots=n_knots, k=k)
+    smoothed = spline_to_recording(spline, recording)
+    df_output = df.copy()
+    df_output[LOAD_COLUMNS[POSE_SLICE]] = smoothed[:, POSE_SLICE]
+    df_output.to_csv(output_file, index=False, float_format='%.6f')
+    print(f"{input_file} を B-スプライン (内部ノット {n_knots} 個) で近似し、{output_file} に保存しました。")
+    return spline
+
+
+def gaussian_smooth(recording, sigma):
+    """
+    位置と姿勢の 7 列を gaussian_filter1d で平滑化した配列を返す (7 列を axis=0 で 1 回のフィルタで処理する)。
+    姿勢は符号をそろえてから平滑化し、最後に正規化する。
+    """
+    from scipy.ndimage import gaussian_filter1d
+
+    out = np.array(recording, dtype=float)
+    values = np.empty((len(out), 7))
+    values[:, :3] = out[:, POSITION_SLICE]
+    values[:, 3:] = continuous_quaternions(out[:, ROTATION_SLICE])
+    smoothed = gaussian_filter1d(values, sigma, axis=0)
+    quaternions = smoothed[:, 3:]
+    out[:, POSITION_SLICE] = smoothed[:, :3]
+    out[:, ROTATION_SLICE] = quaternions / np.linalg.norm(quaternions, axis=1, keepdims=True)
+    return out
+
+
+def smoothed_path_for(input_path, out_dir, sigma):
+    """平滑化した CSV のファイル名 ({元の名前}_sigma{sigma}.csv)"""
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(out_dir, f"{stem}_sigma{sigma:g}.csv")
+
+
+def smooth_file(job):
+    """
+    1 つの CSV を読み込み、job['sigmas'] の全ての sigma で平滑化したものをそれぞれ書き出す。
+    ワーカープロセスから呼ばれる。
+
+    Parameters:
+    -----------
+    job : dict
+        'input_path' (元の CSV), 'out_dir' (保存先), 'sigmas' (sigma のリスト)
+
+    Returns:
+    --------
+    list of str
+        保存したファイル (失敗した場合は空)
+    """
+    written = []
+    try:
+        recording, _ = load_recording(job['input_path'])
+        df = load_table(job['input_path'])
+        os.makedirs(job['out_dir'], exist_ok=True)
+        for sigma in job['sigmas']:
+            smoothed = gaussian_smooth(recording, sigma)
+            df_output = df.copy()
+            df_output[LOAD_COLUMNS[POSE_SLICE]] = smoothed[:, POSE_SLICE]
+            out_path = smoothed_path_for(job['input_path'], job['out_dir'], sigma)
+            tmp_path = f"{out_path}.{os.getpid()}.tmp"
+            df_output.to_csv(tmp_path, index=False, float_format='%.6f')
+            os.replace(tmp_path, out_path)
+            written.append(out_path)
+    except Exception as e:
+        print(f"平滑化に失敗: {job['input_path']} ({e})")
+    return written
+
+
+def smooth_files(input_dir, out_dir, sigmas=DEFAULT_SIGMAS, pattern='*.csv', workers=1):
+    """
+    input_dir の全ての CSV を、sigmas の全ての値で平滑化して out_dir に保存する。
+    各ファイルは 1 回だけ読み込み、sigma ごとに 1 回フィルタをかける。
+
+    Parameters:
+    -----------
+    input_dir : str
+        元の CSV のフォルダ
+    out_dir : str
+        保存先 (ファイル名は smoothed_path_for)
+    sigmas : list of float, optional
+        gaussian_filter1d の標準偏差 (default: DEFAULT_SIGMAS)
+    pattern : str, optional
+        元のファイル名のパターン (default: '*.csv')。
+        見本から作ったファイル (trajcore.naming.DERIVED_PATTERNS) は一致しても除く。
+    workers : int, optional
+        並列に処理するプロセス数 (default: 1)
+
+    Returns:
+    --------
+    list of str
+        保存したファイル
+    """
+    # 出力先が同じフォルダでも、前回書き出した CSV やキーフレームの補間結果などは平滑化しない
+    input_paths = [p for p in sorted(glob.glob(os.path.join(input_dir, pattern))) if not is_derived_file(p)]
+    jobs = [{'input_path': p, 'out_dir': out_dir, 'sigmas': list(sigmas)} for p in input_paths]
+    print(f"{len(jobs)} 件のファイルを sigma={list(sigmas)} で {workers} プロセスで平滑化します")
+    if workers <= 1 or len(jobs) <= 1:
+        results = [smooth_file(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(smooth_file, jobs))
+    written = [p for paths in results for p in paths]
+    print(f"{len(written)} 件の平滑化したファイルを {out_dir} に保存しました")
+    return written
+
+
+if __name__ == "__main__":
+    # 使い方 (リポジトリのルートで実行):
+    #   PYTHONPATH=Assets/OriginalAssets/Scripts python -m trajcore.smoothing Assets/OriginalAssets/File/Exp1/Exp1_Model Assets/OriginalAssets/File/Exp1/Exp1_Smoothed --sigmas 5 60 200 --workers 4
+    import argparse
+
+    parser = argparse.ArgumentParser(description="フォルダ内の全ての CSV を複数の sigma でガウス平滑化する")
+    parser.add_argument('input_dir', help="元の CSV のフォルダ")
+    parser.add_argument('out_dir', help="平滑化した CSV の保存先")
+    parser.add_argument('--sigmas', type=float, nargs='+', default=list(DEFAULT_SIGMAS), help="平滑化の標準偏差")
+    parser.add_argument('--pattern', default='*.csv', help="元のファイル名のパターン")
+    parser.add_argument('--workers', type=int, default=1, help="並列に処理するプロセス数")
+    args = parser.parse_args()
+
+    smooth_files(args.input_dir, args.out_dir, sigmas=args.sigmas, pattern=args.pattern, workers=args.workers)
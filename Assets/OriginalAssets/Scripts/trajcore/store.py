@@ -0,0 +1,161 @@
+import glob
+import json
+import os
+
+import numpy as np
+
+from trajcore.loader import LOAD_COLUMNS, load_recording
+from trajcore.naming import parse_recording_name
+
+STORE_DTYPE = np.float32
+
+
+def find_recordings(root):
+    """root 以下の記録 CSV を列挙する (.meta は対象外)。順序はパス順で固定。"""
+    paths = glob.glob(os.path.join(root, '**', '*.csv'), recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p))
+
+
+def pack_recordings(root, out_base, paths=None):
+    """
+    root 以下の記録をすべて 1 つの float32 配列ファイルにまとめ、索引を書き出す関数。
+
+    出力:
+        {out_base}.npy        : 全記録を縦に連結した配列, shape=(N_total, 9), 列は LOAD_COLUMNS
+        {out_base}.index.json : 各記録のオフセット・行数・trial 境界・条件・参加者・Tr/Te 番号
+
+    必要な列を持たない CSV (結果ファイルなど) は読み飛ばす。
+
+    Parameters:
+    -----------
+    root : str
+        まとめる study のフォルダ (例: 'Assets/OriginalAssets/File/Ozaki/User')
+    out_base : str
+        出力ファイル名 (拡張子なし)
+    paths : list of str, optional
+        まとめるファイルのリスト (default: root 以下の全 CSV)
+
+    Returns:
+    --------
+    PackedStore
+    """
+    if paths is None:
+        paths = find_recordings(root)
+
+    arrays = []
+    records = []
+    offset = 0
+    for path in paths:
+        try:
+            data, trial_starts = load_recording(path)
+        except ValueError as e:
+            print(f"  Skip: {path} ({e})")
+            continue
+        info = parse_recording_name(path, root)
+        info['path'] = os.path.relpath(path, root).replace('\\', '/')
+        info['offset'] = offset
+        info['length'] = len(data)
+        info['trial_starts'] = trial_starts.tolist()
+        records.append(info)
+        arrays.append(data.astype(STORE_DTYPE))
+        offset += len(data)
+
+    packed = np.concatenate(arrays) if arrays else np.empty((0, len(LOAD_COLUMNS)), dtype=STORE_DTYPE)
+
+    out_dir = os.path.dirname(out_base)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    # 途中で止まっても壊れたストアが残らないよう、書き終えてから置き換える
+    tmp_npy = f'{out_base}.npy.tmp'
+    tmp_index = f'{out_base}.index.json.tmp'
+    with open(tmp_npy, 'wb') as f:
+        np.save(f, packed)
+    with open(tmp_index, 'w', encoding='utf-8') as f:
+        json.dump({'columns': LOAD_COLUMNS, 'root': os.path.abspath(root), 'recordings': records},
+                  f, ensure_ascii=False)
+    os.replace(tmp_npy, f'{out_base}.npy')
+    os.replace(tmp_index, f'{out_base}.index.json')
+
+    print(f"{len(records)} 件の記録を {out_base}.npy にまとめました ({packed.nbytes / 1e6:.1f} MB)")
+    return PackedStore(out_base)
+
+
+class PackedStore:
+    """
+    pack_recordings で作ったストアを読み込むクラス。
+
+    配列は memmap で 1 回だけ開き、記録や trial はそのスライス (コピーなし) として返す。
+    trajcore.codec.save_quantized で量子化したストアは整数のままメモリに読み込み、
+    get() のたびに記録単位で復元する (この場合は復元した配列のコピーを返す)。
+
+    Examples:
+    ---------
+    >>> store = PackedStore('Assets/OriginalAssets/File/Ozaki_User')
+    >>> for rec in store.find(kind='Te', participant='1-3pp'):
+    ...     test_pos = store.get(rec)[:, 2:5]
+    """
+
+    def __init__(self, base):
+        self.base = base
+        with open(f'{base}.index.json', 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        self.columns = index['columns']
+        self.root = index['root']
+        self.records = index['recordings']
+        self.codec = index.get('codec')
+        if self.codec is None:
+            self.data = np.load(f'{base}.npy', mmap_mode='r')
+            self._codes = None
+        else:
+            from trajcore.codec import load_codes
+
+            self.data = None
+            self._codes = load_codes(f'{base}.npz')
+        self._by_path = {rec['path']: i for i, rec in enumerate(self.records)}
+
+    def __len__(self):
+        return len(self.records)
+
+    def _record(self, key):
+        if isinstance(key, dict):
+            return key
+        if isinstance(key, str):
+            return self.records[self._by_path[key.replace('\\', '/')]]
+        return self.records[key]
+
+    def get(self, key):
+        """記録全体を返す。key は records の番号、root からの相対パス、または records の要素。"""
+        rec = self._record(key)
+        if self._codes is not None:
+            from trajcore.codec import decode
+
+            return decode(self._codes, self.codec, rec['offset'], rec['offset'] + rec['length'])
+        return self.data[rec['offset']:rec['offset'] + rec['length']]
+
+    def trial_starts(self, key):
+        return np.asarray(self._record(key)['trial_starts'], dtype=int)
+
+    def trials(self, key):
+        """記録を trial ごとのスライスのリストにして返す"""
+        rec = self._record(key)
+        data = self.get(rec)
+        bounds = rec['trial_starts'][1:] + [rec['length']]
+        return [data[start:end] for start, end in zip(rec['trial_starts'], bounds)]
+
+    def find(self, **criteria):
+        """
+        索引の項目で記録を絞り込む。
+        例: store.find(kind='Te', condition='Exp7_6'), store.find(number=3)
+        """
+        return [rec for rec in self.records
+                if all(rec.get(key) == value for key, value in criteria.items())]
+
+
+if __name__ == "__main__":
+    # 使い方: python -m trajcore.store Assets/OriginalAssets/File/Ozaki/User Assets/OriginalAssets/File/Ozaki_User
+    import sys
+
+    if len(sys.argv) != 3:
+        print("usage: python -m trajcore.store <study_dir> <out_base>")
+        sys.exit(1)
+    pack_recordings(sys.argv[1], sys.argv[2])